@@ -1,9 +1,13 @@
-import json
-import requests
-from datetime import datetime, timedelta
-from collections import defaultdict
+import os
+
 from omnidimension import Client
 
+from alerts.dispatcher import VoiceAlertDispatcher, call_payload
+from alerts.expiry_index import get_expiry_index, group_expiries_by_month
+from alerts.restock_index import RESTOCK_PATH, get_restock_index
+from ingestion.inventory_schema import placement_label
+from telemetry.metrics import REGISTRY, span
+
 # OmniDimension credentials
 OMNI_API_KEY = "#####################################"
 AGENT_ID = 2428
@@ -11,47 +15,49 @@ PHONE_NUMBER = "+919080221016"
 
 # Path to your inventory dataset
 DATA_PATH = "data/processed/output.jsonl"
+# Stage timings and alert outcomes, for node_exporter's textfile collector
+METRICS_PATH = os.getenv("ALERT_METRICS_PATH", "data/metrics/alert_weekly.prom")
 
 # Initialize client
 client = Client(OMNI_API_KEY)
 
-def load_inventory():
+def load_expiry_index():
     try:
-        with open(DATA_PATH, "r", encoding="utf-8") as f:
-            return [json.loads(line) for line in f]
+        return get_expiry_index(DATA_PATH)
     except Exception as e:
         print(f"❌ Failed to load inventory: {e}")
-        return []
+        return None
 
-def is_valid_date(date_str):
+def load_restock_index():
     try:
-        datetime.strptime(date_str, "%m/%d/%Y")
-        return True
-    except ValueError:
-        return False
-
-def group_expiries_by_month(inventory):
-    now = datetime.now()
-    next_month = now + timedelta(days=32)
-    expiry_map = defaultdict(list)
-
-    for item in inventory:
-        try:
-            date_str = item.get("Expiration_Date", "")
-            if not is_valid_date(date_str):
-                continue
-            date = datetime.strptime(date_str, "%m/%d/%Y")
-            if now <= date <= next_month:
-                month_key = date.strftime("%B %Y")
-                expiry_map[month_key].append(item)
-        except Exception:
-            continue
-
-    return expiry_map
-
-def generate_alert_text(monthly_expiries):
+        return get_restock_index(RESTOCK_PATH)
+    except FileNotFoundError:
+        print(f"⚠️ No restock view at {RESTOCK_PATH}; skipping low-stock items.")
+        return None
+
+def generate_restock_text(restock):
+    if restock is None or not restock.locations:
+        return ""
+    parts = [f"\n{len(restock.locations)} items need restocking. The most urgent are:"]
+    for itm in restock.locations[:10]:
+        cover = "no recent sales" if itm["Days_Of_Cover"] is None else f"about {itm['Days_Of_Cover']:g} days of stock left"
+        parts.append(
+            f"- {itm['Name']} (ID: {itm['Item_ID']}) at {itm['Warehouse_Location']}, "
+            f"{placement_label(itm)}, "
+            f"{itm['Stock_Quantity']} units against a reorder level of {itm['Reorder_Level']}, {cover}. "
+            f"Suggested order: {itm['Reorder_Quantity']} units."
+        )
+    if len(restock.locations) > 10:
+        parts.append(f"...and {len(restock.locations) - 10} more items.")
+    return " ".join(parts)
+
+def generate_alert_text(monthly_expiries, restock=None):
+    restock_text = generate_restock_text(restock)
     if not monthly_expiries:
-        return "Hello. This is your weekly inventory update. No items are expiring in the next two months. Thank you."
+        opening = "Hello. This is your weekly inventory update. No items are expiring in the next two months."
+        if not restock_text:
+            return f"{opening} Thank you."
+        return f"{opening} {restock_text} Please review your inventory dashboard for full details. Thank you."
 
     parts = ["Hello. This is your Inventory Assistant. Here's your weekly expiry report."]
     
@@ -60,48 +66,53 @@ def generate_alert_text(monthly_expiries):
         for itm in items[:10]:
             parts.append(
                 f"- {itm['Name']} (ID: {itm['Item_ID']}) at {itm['Warehouse_Location']}, "
-                f"Aisle {itm.get('Aisle', 'N/A')} Shelf {itm.get('Shelf', 'N/A')}, "
-                f"Quantity left: {itm.get('Stock_Quantity', 'N/A')}"
+                f"{placement_label(itm)}, "
+                f"Quantity left: {itm['Stock_Quantity']}"
             )
         if len(items) > 10:
             parts.append(f"...and {len(items) - 10} more items.")
 
+    if restock_text:
+        parts.append(restock_text)
     parts.append("Please review your inventory dashboard for full details. Thank you.")
     return " ".join(parts)
 
 def send_voice_alert(agent_id, phone_number, message):
-    url = "https://backend.omnidim.io/api/v1/calls/dispatch"
-    headers = {
-        "Authorization": f"Bearer {OMNI_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "agent_id": agent_id,
-        "to_number": phone_number,
-        "call_context": {
-            "message": message
-        }
-    }
-
     print(f"\n📞 Dispatching voice alert to {phone_number}...")
-    response = requests.post(url, json=payload, headers=headers)
-    if response.status_code == 200:
+    dispatcher = VoiceAlertDispatcher(OMNI_API_KEY)
+    try:
+        result = dispatcher.dispatch_sync([call_payload(agent_id, phone_number, message)])[0]
+    finally:
+        dispatcher.close()
+    if result["status"] == "sent":
         print("✅ Voice alert sent successfully.")
+    elif result["status"] in ("pending", "sending"):
+        # Another dispatcher holds it, or it is waiting for one; it stays queued in the outbox
+        print(f"⏳ Voice alert still queued ({result['status']}); it will be sent from the outbox.")
     else:
-        print(f"❌ Failed to send voice alert ({response.status_code}): {response.text}")
+        print(f"❌ Failed to send voice alert after {result.get('attempts', 0)} attempts: {result.get('error')}")
 
 def main():
     print("🔎 Processing inventory for expiry alerts...")
-    inventory = load_inventory()
-    if not inventory:
-        print("❌ No valid inventory loaded.")
-        return
-
-    monthly_expiries = group_expiries_by_month(inventory)
-    message = generate_alert_text(monthly_expiries)
-
-    print(f"\n📤 Final voice message:\n{message[:500]}{'...' if len(message) > 500 else ''}")
-    send_voice_alert(AGENT_ID, PHONE_NUMBER, message)
+    try:
+        with span("alert_weekly", "load_index"):
+            expiry_index = load_expiry_index()
+        if not expiry_index:
+            print("❌ No valid inventory loaded.")
+            return
+
+        with span("alert_weekly", "group_expiries"):
+            monthly_expiries = group_expiries_by_month(expiry_index)
+        with span("alert_weekly", "load_restock"):
+            restock = load_restock_index()
+        with span("alert_weekly", "render_message"):
+            message = generate_alert_text(monthly_expiries, restock)
+
+        print(f"\n📤 Final voice message:\n{message[:500]}{'...' if len(message) > 500 else ''}")
+        with span("alert_weekly", "send"):
+            send_voice_alert(AGENT_ID, PHONE_NUMBER, message)
+    finally:
+        REGISTRY.write_textfile(METRICS_PATH)
 
 if __name__ == "__main__":
     main()
@@ -1,9 +1,8 @@
 # alerts/detect_expiring_items.py
-import json
+from alerts.expiry_index import get_expiry_index
 
 def get_expiring_items(filepath="data/processed/output.jsonl"):
-    with open(filepath, "r") as f:
-        return [json.loads(line) for line in f if json.loads(line).get("Expiring_Soon")]
+    return get_expiry_index(filepath).expiring_soon()
 
 if __name__ == "__main__":
     items = get_expiring_items()
@@ -0,0 +1,318 @@
+# alerts/dispatcher.py
+import asyncio
+import fcntl
+import hashlib
+import json
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import httpx
+
+from telemetry.metrics import ALERT_ATTEMPTS, ALERTS, STAGE_SECONDS, span
+
+DISPATCH_URL = os.getenv("OMNI_DISPATCH_URL", "https://backend.omnidim.io/api/v1/calls/dispatch")
+OUTBOX_PATH = "data/alerts/outbox.jsonl"
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+# Errors retrying cannot fix: the request itself is malformed
+PERMANENT_ERRORS = (httpx.UnsupportedProtocol, httpx.InvalidURL, httpx.LocalProtocolError)
+# How long a claimed alert is reserved for its dispatcher; renewed before every retry wait
+LEASE_SECONDS = float(os.getenv("OMNI_ALERT_LEASE_SECONDS", "300"))
+
+def key_fingerprint(api_key: str) -> str:
+    """
+    Short, non-reversible id of an API key, recorded with each alert instead of the key itself.
+    """
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+def call_payload(agent_id, phone_number, message):
+    """
+    Request body for the OmniDimension call-dispatch endpoint.
+    """
+    return {
+        "agent_id": agent_id,
+        "to_number": phone_number,
+        "call_context": {
+            "message": message
+        }
+    }
+
+class TokenBucket:
+    """
+    Async token bucket: at most `rate` acquisitions per second, with bursts up to `capacity`.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = None
+
+    async def acquire(self):
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class Outbox:
+    """
+    Durable, append-only JSONL log of alert states (pending / sending / sent / failed), shared
+    by every process that sends alerts. The latest line per alert id wins; the file is compacted
+    on load once it is mostly history.
+
+    Each operation holds an exclusive flock on `<path>.lock` and first reads the lines other
+    processes appended, so state is never stale. An alert is delivered only by the dispatcher
+    that claimed it: claiming records it as "sending" with a lease, and other processes skip
+    it until the lease expires (the claimant crashed before recording an outcome). Alerts carry
+    the fingerprint of the API key they were queued with and are only claimed with that key.
+    """
+
+    def __init__(self, path: str = OUTBOX_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.state = {}
+        self.offset = 0
+        self.inode = None
+        self.lines = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._locked():
+            if self.lines > 2 * len(self.state):
+                self._compact()
+
+    @contextmanager
+    def _locked(self):
+        with self.lock, open(self.path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        # Read what other processes appended since the last call; start over if the file was compacted
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if st.st_ino != self.inode or st.st_size < self.offset:
+            self.state, self.offset, self.inode, self.lines = {}, 0, st.st_ino, 0
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # partial line still being written
+                self.offset += len(line)
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn write from a crash
+                self.state[entry["id"]] = entry
+                self.lines += 1
+
+    def _compact(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in self.state.values():
+                f.write(json.dumps(entry) + "\n")
+        os.replace(tmp_path, self.path)
+        st = os.stat(self.path)
+        self.offset, self.inode, self.lines = st.st_size, st.st_ino, len(self.state)
+
+    def _append(self, entries: list[dict]):
+        with open(self.path, "ab") as f:
+            for entry in entries:
+                f.write((json.dumps(entry) + "\n").encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        self._refresh()
+
+    def _entry(self, alert_id: str, status: str, **fields) -> dict:
+        return {**self.state.get(alert_id, {}), **fields, "id": alert_id, "status": status, "updated": time.time()}
+
+    def record(self, alert_id: str, status: str, **fields) -> dict:
+        with self._locked():
+            self._append([self._entry(alert_id, status, **fields)])
+            return dict(self.state[alert_id])
+
+    def claim(self, owner: str, lease_seconds: float = LEASE_SECONDS, key_id: str | None = None) -> list[dict]:
+        """
+        Mark every pending alert, and every "sending" one whose lease has expired, as being
+        sent by `owner`, and return them. Alerts another dispatcher holds are left to it, as are
+        alerts queued under an API key other than `key_id` (entries without one are anyone's).
+        """
+        now = time.time()
+        with self._locked():
+            claimable = [
+                e for e in self.state.values()
+                if (e["status"] == "pending" or (e["status"] == "sending" and e.get("lease_until", 0) < now))
+                and e.get("key_id") in (None, key_id)
+            ]
+            claimed = [
+                self._entry(e["id"], "sending", owner=owner, lease_until=now + lease_seconds) for e in claimable
+            ]
+            if claimed:
+                self._append(claimed)
+            return [dict(self.state[e["id"]]) for e in claimed]
+
+    def renew(self, alert_id: str, owner: str, lease_seconds: float = LEASE_SECONDS) -> bool:
+        """
+        Extend `owner`'s lease on an alert it is sending; False if it no longer holds it.
+        """
+        with self._locked():
+            entry = self.state.get(alert_id)
+            if entry is None or entry["status"] != "sending" or entry.get("owner") != owner:
+                return False
+            self._append([self._entry(alert_id, "sending", lease_until=time.time() + lease_seconds)])
+            return True
+
+    def get(self, alert_id: str) -> dict | None:
+        with self._locked():
+            entry = self.state.get(alert_id)
+            return dict(entry) if entry is not None else None
+
+    def pending(self) -> list[dict]:
+        with self._locked():
+            return [dict(e) for e in self.state.values() if e["status"] in ("pending", "sending")]
+
+    def recent(self, n: int = 10) -> list[dict]:
+        with self._locked():
+            return sorted(self.state.values(), key=lambda e: e["updated"], reverse=True)[:n]
+
+class VoiceAlertDispatcher:
+    """
+    Sends voice-alert requests from a background event loop over one pooled HTTP client,
+    with bounded concurrency, token-bucket rate limiting and exponential-backoff retries.
+    Every alert goes through the outbox first, so alerts left pending by a crash are
+    delivered on the next dispatch (by a dispatcher with the same API key), and is sent only by
+    the dispatcher that claimed it there, so processes sharing the outbox never place the same
+    call twice. The claim is renewed before every retry wait, and a server's Retry-After is
+    capped so that one wait never outlasts a lease.
+    """
+
+    def __init__(self, api_key: str, url: str = DISPATCH_URL, max_concurrency: int = 8,
+                 rate_per_sec: float = 5.0, max_retries: int = 4, backoff_base: float = 0.5,
+                 timeout: float = 10.0, outbox: Outbox | None = None, lease_seconds: float = LEASE_SECONDS):
+        self.api_key = api_key
+        self.key_id = key_fingerprint(api_key)
+        self.lease_seconds = lease_seconds
+        self.url = url
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.timeout = timeout
+        self.bucket = TokenBucket(rate_per_sec)
+        self.outbox = outbox or Outbox()
+        self.client = None
+        self.semaphore = None
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="voice-alert-dispatcher", daemon=True)
+        self.thread.start()
+
+    def _ensure_client(self):
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency),
+                headers={"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"},
+            )
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    def _backoff(self, attempt: int, response=None) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = float(retry_after)
+        else:
+            delay = self.backoff_base * (2 ** attempt) * (0.5 + random.random())
+        # The renewed lease has to cover the wait and the next request
+        return min(delay, max(0.0, self.lease_seconds - 2 * self.timeout))
+
+    async def _deliver(self, entry: dict) -> dict:
+        queued = time.perf_counter()
+        async with self.semaphore:
+            STAGE_SECONDS.observe(time.perf_counter() - queued, component="alerts", stage="queue")
+            started = time.perf_counter()
+            last_error = None
+            for attempt in range(self.max_retries + 1):
+                with span("alerts", "rate_limit"):
+                    await self.bucket.acquire()
+                response = None
+                ALERT_ATTEMPTS.inc()
+                try:
+                    with span("alerts", "http_call"):
+                        response = await self.client.post(entry["url"], json=entry["payload"])
+                    if response.status_code < 400:
+                        return await self._record_outcome(
+                            entry, "sent", started, attempts=attempt + 1,
+                            status_code=response.status_code, response=response.text[:500],
+                        )
+                    last_error = f"{response.status_code}: {response.text[:500]}"
+                    if response.status_code not in RETRYABLE_STATUS:
+                        break
+                except PERMANENT_ERRORS as e:
+                    last_error = f"{type(e).__name__}: {e}"
+                    break
+                except httpx.TransportError as e:
+                    last_error = f"{type(e).__name__}: {e}"
+                if attempt < self.max_retries:
+                    if not await asyncio.to_thread(self.outbox.renew, entry["id"], self.owner, self.lease_seconds):
+                        # The lease lapsed and another dispatcher took the alert over; leave it to them
+                        return await asyncio.to_thread(self.outbox.get, entry["id"])
+                    await asyncio.sleep(self._backoff(attempt, response))
+            return await self._record_outcome(
+                entry, "failed", started, attempts=attempt + 1,
+                status_code=response.status_code if response is not None else None, error=last_error,
+            )
+
+    async def _record_outcome(self, entry: dict, status: str, started: float, **fields) -> dict:
+        STAGE_SECONDS.observe(time.perf_counter() - started, component="alerts", stage="deliver")
+        ALERTS.inc(status=status)
+        return await asyncio.to_thread(self.outbox.record, entry["id"], status, **fields)
+
+    async def dispatch(self, payloads: list[dict], url: str | None = None) -> list[dict]:
+        """
+        Queue `payloads` in the outbox, then claim and deliver every pending alert concurrently.
+        Returns the outbox entries for the given payloads, in order; an alert another
+        dispatcher claimed first is returned as "sending". The outbox's blocking, flock'd file
+        I/O runs in worker threads, off the event loop.
+        """
+        self._ensure_client()
+        ids = []
+        for payload in payloads:
+            alert_id = uuid.uuid4().hex
+            await asyncio.to_thread(
+                self.outbox.record, alert_id, "pending",
+                url=url or self.url, payload=payload, key_id=self.key_id, created=time.time(),
+            )
+            ids.append(alert_id)
+        entries = await asyncio.to_thread(self.outbox.claim, self.owner, self.lease_seconds, self.key_id)
+        await asyncio.gather(*(self._deliver(entry) for entry in entries))
+        return [await asyncio.to_thread(self.outbox.get, alert_id) for alert_id in ids]
+
+    def submit(self, payloads: list[dict], url: str | None = None):
+        """
+        Schedule a dispatch on the background loop without blocking; returns a concurrent.futures.Future.
+        """
+        return asyncio.run_coroutine_threadsafe(self.dispatch(payloads, url), self.loop)
+
+    def dispatch_sync(self, payloads: list[dict], url: str | None = None) -> list[dict]:
+        return self.submit(payloads, url).result()
+
+    def close(self):
+        if self.client is not None:
+            asyncio.run_coroutine_threadsafe(self.client.aclose(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
@@ -0,0 +1,130 @@
+# alerts/expiry_index.py
+import threading
+from datetime import datetime, time, timedelta
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from ingestion.columnar_store import load_table, snapshot_version
+
+DATA_PATH = "data/processed/output.jsonl"
+DATE_FORMAT = "%m/%d/%Y"
+
+def _parse_ordinal(date_str) -> int:
+    try:
+        return datetime.strptime(date_str, DATE_FORMAT).toordinal()
+    except (TypeError, ValueError):
+        return -1
+
+def _expiry_ordinals(column) -> np.ndarray:
+    """
+    Day ordinals for an Expiration_Date column, -1 where the date is missing or invalid.
+    The column is dictionary-encoded first, so each distinct date string is parsed exactly once
+    (Arrow's own strptime silently rolls dates like 2/29/2025 over into March).
+    """
+    column = column.combine_chunks() if isinstance(column, pa.ChunkedArray) else column
+    if not pa.types.is_dictionary(column.type):
+        column = column.cast(pa.string()).dictionary_encode()
+    lookup = np.array([_parse_ordinal(v) for v in column.dictionary.to_pylist()] + [-1], dtype=np.int64)
+    # Null entries point at the trailing -1
+    indices = pc.fill_null(column.indices, len(lookup) - 1).to_numpy()
+    return lookup[indices]
+
+class ExpiryIndex:
+    """
+    Inventory records sorted by expiration date for fast range queries.
+    Dates are parsed once per distinct value into day ordinals; records with a missing or
+    invalid date are kept out of the sorted array and counted in `invalid_dates`.
+    Only the rows a query returns are materialised as dicts.
+    """
+
+    def __init__(self, table):
+        if not isinstance(table, pa.Table):
+            table = pa.Table.from_pylist(list(table))
+        self.table = table
+        if "Expiration_Date" in table.column_names and table.num_rows:
+            ordinals = _expiry_ordinals(table["Expiration_Date"])
+        else:
+            ordinals = np.full(table.num_rows, -1, dtype=np.int64)
+        valid = np.flatnonzero(ordinals >= 0)
+        self.invalid_dates = table.num_rows - len(valid)
+        self.order = valid[np.argsort(ordinals[valid], kind="stable")]
+        self.ordinals = ordinals[self.order]
+        self.flagged = None
+
+    def __len__(self):
+        return self.table.num_rows
+
+    def _take(self, rows) -> list[dict]:
+        if len(rows) == 0:
+            return []
+        return self.table.take(pa.array(rows, type=pa.int64())).to_pylist()
+
+    def _bounds(self, start: datetime, end: datetime) -> tuple[int, int]:
+        # Dates are midnights, so a start later than 00:00 excludes that day itself
+        first = start.toordinal() if start.time() == time.min else start.toordinal() + 1
+        lo = int(np.searchsorted(self.ordinals, first, side="left"))
+        hi = int(np.searchsorted(self.ordinals, end.toordinal(), side="right"))
+        return lo, hi
+
+    def between(self, start: datetime, end: datetime) -> list[dict]:
+        """
+        Records whose expiration date (taken as midnight) falls within [start, end], in date order.
+        """
+        lo, hi = self._bounds(start, end)
+        return self._take(self.order[lo:hi])
+
+    def expiring_within(self, days: int, now: datetime | None = None) -> list[dict]:
+        now = now or datetime.now()
+        return self.between(now, now + timedelta(days=days))
+
+    def group_by_month(self, start: datetime, end: datetime) -> dict[str, list[dict]]:
+        """
+        Records expiring within [start, end], grouped by "Month YYYY" in chronological order.
+        """
+        lo, hi = self._bounds(start, end)
+        groups = {}
+        labels = {}
+        for ordinal, rec in zip(self.ordinals[lo:hi].tolist(), self._take(self.order[lo:hi])):
+            if ordinal not in labels:
+                labels[ordinal] = datetime.fromordinal(ordinal).strftime("%B %Y")
+            groups.setdefault(labels[ordinal], []).append(rec)
+        return groups
+
+    def expiring_soon(self) -> list[dict]:
+        """
+        Records flagged Expiring_Soon by the ingestor, in file order.
+        """
+        if self.flagged is None:
+            if "Expiring_Soon" in self.table.column_names:
+                mask = pc.fill_null(self.table["Expiring_Soon"], False)
+                self.flagged = self.table.filter(mask).to_pylist()
+            else:
+                self.flagged = []
+        return self.flagged
+
+def group_expiries_by_month(index: ExpiryIndex, days: int = 32, now: datetime | None = None) -> dict[str, list[dict]]:
+    """
+    Items expiring between now and now + `days`, grouped by month (the voice alert window).
+    """
+    now = now or datetime.now()
+    return index.group_by_month(now, now + timedelta(days=days))
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+def get_expiry_index(path: str = DATA_PATH) -> ExpiryIndex:
+    """
+    Shared ExpiryIndex for `path`, rebuilt only when the JSONL or its Arrow snapshot changes.
+    """
+    version = snapshot_version(path)
+    if version == (None, None):
+        raise FileNotFoundError(f"No processed inventory at {path}")
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        index = ExpiryIndex(load_table(path))
+        _cache[path] = (version, index)
+        return index
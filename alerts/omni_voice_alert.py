@@ -1,7 +1,6 @@
 # alerts/omni_voice_alert.py
 
-import requests
-import json
+from alerts.dispatcher import VoiceAlertDispatcher
 
 # 🔐 Hardcoded Omni API key (for demo purposes ONLY)
 API_KEY = "#####################################"
@@ -10,27 +9,30 @@ OMNI_API_URL = "https://backend.omnidim.io/api/v1/voice/call"
 # 📞 Replace with real warehouse manager phone number (include country code)
 WAREHOUSE_MANAGER_PHONE = "+919080221016"  # Change this for your test/demo
 
-def send_voice_alert(item):
+def voice_payload(item):
     message = f"📦 Alert! {item['Name']} is expiring on {item['Expiration_Date']} at {item['Warehouse_Location']}."
-    
-    payload = {
+    return {
         "phone": WAREHOUSE_MANAGER_PHONE,
         "text": message,
         "speaker": "female",     # or "male"
         "voice": "en-US"         # en-IN also works
     }
 
-    headers = {
-        "Authorization": f"Bearer {API_KEY}",
-        "Content-Type": "application/json"
-    }
-
+def send_voice_alerts(items):
+    """
+    Send one alert per item concurrently over a pooled, rate-limited client instead of serial posts.
+    """
+    dispatcher = VoiceAlertDispatcher(API_KEY, url=OMNI_API_URL)
     try:
-        res = requests.post(OMNI_API_URL, headers=headers, data=json.dumps(payload))
-        if res.ok:
+        results = dispatcher.dispatch_sync([voice_payload(item) for item in items])
+    finally:
+        dispatcher.close()
+    for item, result in zip(items, results):
+        if result["status"] == "sent":
             print(f"📞 Alert sent: {item['Name']} expiring on {item['Expiration_Date']}")
         else:
-            print(f"❌ Error: {res.status_code} - {res.text}")
-    except Exception as e:
-        print("❌ Failed to send voice alert:", e)
+            print(f"❌ Error: {result.get('error')}")
+    return results
 
+def send_voice_alert(item):
+    return send_voice_alerts([item])[0]
@@ -0,0 +1,109 @@
+# alerts/restock_index.py
+import json
+import os
+import threading
+from collections import defaultdict
+
+RESTOCK_PATH = "data/processed/restock.json"
+# Sales_Volume is read as units sold over this many days when estimating sales velocity
+SALES_WINDOW_DAYS = int(os.getenv("RESTOCK_SALES_WINDOW_DAYS", "30"))
+# Locations with fewer days of cover than this are flagged even above their reorder level
+COVER_HORIZON_DAYS = int(os.getenv("RESTOCK_COVER_DAYS", "7"))
+
+def days_of_cover(stock, sales_volume, window_days: int = SALES_WINDOW_DAYS):
+    """
+    Days until `stock` runs out at the average daily sales rate, or None when nothing sells.
+    """
+    if not sales_volume or sales_volume <= 0 or stock is None:
+        return None
+    return round(stock * window_days / sales_volume, 1)
+
+def is_low_cover(stock, sales_volume, horizon_days: int = COVER_HORIZON_DAYS,
+                 window_days: int = SALES_WINDOW_DAYS) -> bool:
+    cover = days_of_cover(stock, sales_volume, window_days)
+    return cover is not None and cover <= horizon_days
+
+def _cover_key(rec: dict):
+    # Ascending days of cover; products that never sell sort last
+    cover = rec.get("Days_Of_Cover")
+    return (cover is None, cover if cover is not None else 0.0, rec.get("Name") or "")
+
+def write_restock(locations, products, path: str = RESTOCK_PATH) -> str:
+    """
+    Write the restock view (flagged locations, every product's summary) to a temp file and
+    rename it into place, so readers never see a partial file.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "sales_window_days": SALES_WINDOW_DAYS,
+            "cover_horizon_days": COVER_HORIZON_DAYS,
+            "locations": sorted(locations, key=_cover_key),
+            "products": sorted(products, key=_cover_key),
+        }, f)
+    os.replace(tmp_path, path)
+    return path
+
+class RestockIndex:
+    """
+    The restock view maintained by the Pathway ingestor: every product/location at or below
+    its reorder level or running out within COVER_HORIZON_DAYS, plus a per-product summary
+    (total stock, days of cover, locations below reorder), with lookups by product name.
+    Both lists are sorted by days of cover, most urgent first.
+    """
+
+    def __init__(self, locations: list[dict], products: list[dict]):
+        self.locations = sorted(locations, key=_cover_key)
+        self.products = sorted(products, key=_cover_key)
+        self.locations_by_name = defaultdict(list)
+        for rec in self.locations:
+            self.locations_by_name[str(rec.get("Name", "")).lower()].append(rec)
+        self.product_by_name = {str(rec.get("Name", "")).lower(): rec for rec in self.products}
+
+    @classmethod
+    def load(cls, path: str = RESTOCK_PATH) -> "RestockIndex":
+        with open(path, "r", encoding="utf-8") as f:
+            view = json.load(f)
+        return cls(view["locations"], view["products"])
+
+    def __len__(self):
+        return len(self.locations)
+
+    def below_reorder(self) -> list[dict]:
+        return [rec for rec in self.locations if rec["Below_Reorder"]]
+
+    def low_cover(self, days: int = COVER_HORIZON_DAYS) -> list[dict]:
+        return [rec for rec in self.locations if rec["Days_Of_Cover"] is not None and rec["Days_Of_Cover"] <= days]
+
+    def for_product(self, name: str) -> tuple[dict | None, list[dict]]:
+        """
+        (summary, flagged locations) of one product; (None, []) if it is not in the inventory.
+        """
+        key = name.lower()
+        return self.product_by_name.get(key), self.locations_by_name.get(key, [])
+
+def restock_version(path: str = RESTOCK_PATH):
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        return None
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+def get_restock_index(path: str = RESTOCK_PATH) -> RestockIndex:
+    """
+    Shared RestockIndex for `path`, reloaded only when the file changes.
+    """
+    version = restock_version(path)
+    if version is None:
+        raise FileNotFoundError(f"No restock view at {path}; run the Pathway ingestor")
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        index = RestockIndex.load(path)
+        _cache[path] = (version, index)
+        return index
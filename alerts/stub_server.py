@@ -0,0 +1,58 @@
+# alerts/stub_server.py
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def make_handler(fail_first=0, latency=0.0):
+    """
+    Handler that records every request body and answers 503 to the first `fail_first` requests.
+    """
+    state = {"count": 0, "requests": []}
+    lock = threading.Lock()
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            with lock:
+                state["count"] += 1
+                count = state["count"]
+                state["requests"].append({"path": self.path, "body": json.loads(body or b"{}")})
+            time.sleep(latency)
+            status = 503 if count <= fail_first else 200
+            reply = json.dumps({"ok": status == 200, "request": count}).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(reply)))
+            self.end_headers()
+            self.wfile.write(reply)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler, state
+
+def start_stub_server(port=0, fail_first=0, latency=0.0):
+    """
+    Start a local stand-in for the OmniDimension API in a daemon thread.
+    Returns (server, url, state); point the dispatcher at `url` and inspect `state["requests"]`.
+    """
+    handler, state = make_handler(fail_first, latency)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/api/v1/calls/dispatch", state
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stub of the OmniDimension call-dispatch API.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fail-first", type=int, default=0, help="Answer 503 to this many requests first.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before each reply.")
+    args = parser.parse_args()
+
+    server, url, _ = start_stub_server(args.port, args.fail_first, args.latency)
+    print(f"📞 Stub dispatch API listening on {url} (set OMNI_DISPATCH_URL to use it)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,106 @@
+# benchmarks/ann_benchmark.py
+"""
+Recall-vs-latency report for the FAISS index types in vectorstore/ann_index.py against the
+exact flat baseline.
+
+Vectors are the saved inventory embeddings (the current index file of vectorstore/faiss_index). Use --scale
+to grow the collection synthetically (jittered copies of the real vectors) and see how each
+index behaves at 10x-1000x today's SKU count. Queries are held-out jittered vectors, and
+recall@k is measured against the flat index's exact top-k.
+
+Run from the repo root:
+    python -m benchmarks.ann_benchmark --scale 1000 --queries 500
+"""
+import argparse
+import os
+import time
+
+import faiss
+import numpy as np
+
+from vectorstore.ann_index import build_index, default_nlist, set_search_params
+from vectorstore.embed_and_store import VECTOR_INDEX_PATH
+from vectorstore.index_store import index_file, is_store
+
+NPROBE_SWEEP = (1, 2, 4, 8, 16, 32, 64)
+EF_SEARCH_SWEEP = (16, 32, 64, 128, 256)
+
+def load_vectors(index_path: str = VECTOR_INDEX_PATH) -> np.ndarray:
+    index = faiss.read_index(index_file(index_path) if is_store(index_path) else os.path.join(index_path, "index.faiss"))
+    return index.reconstruct_n(0, index.ntotal)
+
+def jitter(base: np.ndarray, n: int, rng, noise: float = 0.5) -> np.ndarray:
+    """
+    `n` synthetic vectors: random base vectors plus Gaussian noise (`noise` times the per-dimension std), re-normalised.
+    """
+    picks = base[rng.integers(0, len(base), n)]
+    out = picks + rng.normal(0, noise * base.std(), picks.shape).astype(np.float32)
+    faiss.normalize_L2(out)
+    return out
+
+def measure(index, queries: np.ndarray, truth: np.ndarray, k: int) -> dict:
+    """
+    recall@k against `truth`, per-query p50/p95 latency (single-query calls, as the app issues them) and batch QPS.
+    """
+    latencies = []
+    found = np.empty((len(queries), k), dtype=np.int64)
+    threads = faiss.omp_get_max_threads()
+    faiss.omp_set_num_threads(1)  # single-threaded, like one Streamlit request
+    for i, q in enumerate(queries):
+        started = time.perf_counter()
+        _, ids = index.search(q[None, :], k)
+        latencies.append(time.perf_counter() - started)
+        found[i] = ids[0]
+    faiss.omp_set_num_threads(threads)
+    started = time.perf_counter()
+    index.search(queries, k)
+    batch_seconds = time.perf_counter() - started
+    hits = sum(len(np.intersect1d(f, t)) for f, t in zip(found, truth))
+    p50, p95 = np.percentile(np.array(latencies) * 1000, [50, 95])
+    return {"recall": hits / truth.size, "p50_ms": p50, "p95_ms": p95, "qps": len(queries) / batch_seconds}
+
+def index_megabytes(index) -> float:
+    return faiss.serialize_index(index).nbytes / 1e6
+
+def print_row(label: str, build_seconds: float, size_mb: float, m: dict):
+    print(f"{label:<28}{build_seconds:>9.2f}{size_mb:>10.1f}{m['recall']:>9.3f}{m['p50_ms']:>9.3f}{m['p95_ms']:>9.3f}{m['qps']:>11.0f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare FAISS flat, IVF-Flat, HNSW and IVF-PQ indexes.")
+    parser.add_argument("--index", default=VECTOR_INDEX_PATH)
+    parser.add_argument("--scale", type=int, default=1, help="Grow the collection to scale x the saved vectors.")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--types", default="ivf,hnsw,ivfpq")
+    parser.add_argument("--pq-m", type=int, default=48)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    base = load_vectors(args.index)
+    vectors = base if args.scale <= 1 else np.vstack([base, jitter(base, len(base) * (args.scale - 1), rng)])
+    queries = jitter(base, args.queries, rng)
+    print(f"🧪 {len(vectors)} vectors x {vectors.shape[1]} dims, {len(queries)} queries, recall@{args.k} vs flat")
+    print(f"{'index':<28}{'build s':>9}{'size MB':>10}{'recall':>9}{'p50 ms':>9}{'p95 ms':>9}{'batch qps':>11}")
+
+    started = time.perf_counter()
+    flat = build_index(vectors, "flat")
+    build_seconds = time.perf_counter() - started
+    _, truth = flat.search(queries, args.k)
+    print_row("flat (exact)", build_seconds, index_megabytes(flat), measure(flat, queries, truth, args.k))
+
+    for index_type in args.types.split(","):
+        started = time.perf_counter()
+        index = build_index(vectors, index_type, pq_m=args.pq_m, seed=args.seed)
+        build_seconds = time.perf_counter() - started
+        size_mb = index_megabytes(index)
+        if index_type == "hnsw":
+            for ef in EF_SEARCH_SWEEP:
+                set_search_params(index, ef_search=ef)
+                print_row(f"hnsw efSearch={ef}", build_seconds, size_mb, measure(index, queries, truth, args.k))
+        else:
+            nlist = default_nlist(len(vectors))
+            for nprobe in (p for p in NPROBE_SWEEP if p <= nlist):
+                set_search_params(index, nprobe=nprobe)
+                print_row(f"{index_type} nlist={nlist} nprobe={nprobe}", build_seconds, size_mb,
+                          measure(index, queries, truth, args.k))
@@ -0,0 +1,97 @@
+# benchmarks/context_benchmark.py
+"""
+Prompt size / latency benchmark for the LLM context: the old "stuff" prompt (every retrieved
+document's full text) against the compact, deduplicated, token-budgeted table from
+qa/context_builder.py.
+
+Contexts come from BM25 over the processed inventory, so no embedding model is needed.
+Without --ollama only prompt sizes are reported (estimated tokens). With --ollama each prompt
+is sent to /api/generate with num_predict=1, and Ollama's own prompt_eval_count and
+prompt_eval_duration give the real prompt tokens and prefill time; the first question of each
+variant is a warm-up and is not counted.
+
+Run from the repo root:
+    python -m benchmarks.context_benchmark --k 5 --queries 50
+    python -m benchmarks.context_benchmark --ollama http://localhost:11434 --model phi3
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.retrieval_benchmark import generate_queries
+from ingestion.columnar_store import DATA_PATH, load_records
+from langchain.docstore.document import Document
+from qa.context_builder import DEFAULT_TOKEN_BUDGET, KEEP_ALIVE, build_context, build_prompt, estimate_tokens
+from qa.hybrid_retriever import BM25Index
+from vectorstore.embed_and_store import render_document
+
+# The prompt rag_qa.py used with RetrievalQA's "stuff" chain
+STUFF_TEMPLATE = """
+You are an inventory assistant AI. Use the context to answer the user query.
+If the answer is not in the context, say you don't know.
+
+Context:
+{context}
+
+Question: {question}
+Answer:
+"""
+
+def stuff_prompt(question: str, docs) -> str:
+    return STUFF_TEMPLATE.format(context="\n\n".join(doc.page_content for doc in docs), question=question)
+
+def prompt_eval(http, model: str, prompt: str, keep_alive=None) -> tuple[int, float, float]:
+    """
+    (prompt tokens, prefill seconds, wall seconds) for one single-token generation.
+    """
+    payload = {"model": model, "prompt": prompt, "stream": False, "options": {"num_predict": 1}}
+    if keep_alive is not None:
+        payload["keep_alive"] = keep_alive
+    started = time.perf_counter()
+    response = http.post("/api/generate", json=payload)
+    response.raise_for_status()
+    body = response.json()
+    return body.get("prompt_eval_count", 0), body.get("prompt_eval_duration", 0) / 1e9, time.perf_counter() - started
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare stuffed vs compact LLM context size and prefill latency.")
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--k", type=int, default=5, help="Documents retrieved per question")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--budget", type=int, default=DEFAULT_TOKEN_BUDGET, help="Context token budget")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--ollama", help="Ollama base URL; measure real prompt tokens and latency")
+    parser.add_argument("--model", default="phi3")
+    args = parser.parse_args()
+
+    records = load_records(args.data)
+    bm25 = BM25Index([Document(page_content=render_document(rec), metadata=rec) for rec in records])
+    queries = [query for _, query, _ in generate_queries(records, args.queries, args.seed)]
+    contexts = [[doc for doc, _ in bm25.search(q, args.k)] for q in queries]
+    print(f"🧪 {len(queries)} questions, {args.k} documents each, budget {args.budget} tokens")
+
+    variants = {
+        "stuff": [stuff_prompt(q, docs) for q, docs in zip(queries, contexts)],
+        "compact": [build_prompt(q, docs, args.budget) for q, docs in zip(queries, contexts)],
+    }
+    stats = [build_context(docs, args.budget)[1] for docs in contexts]
+    print(
+        f"🧹 compact table: {sum(s['merged'] for s in stats)} duplicate rows merged, "
+        f"{sum(s['cut'] for s in stats)} rows cut by the budget"
+    )
+    print(f"\n{'prompt':<10}{'chars':>10}{'est tokens':>12}")
+    for name, prompts in variants.items():
+        print(f"{name:<10}{np.mean([len(p) for p in prompts]):>10.0f}{np.mean([estimate_tokens(p) for p in prompts]):>12.0f}")
+
+    if args.ollama:
+        import httpx
+
+        print(f"\n⏱️  {args.model} at {args.ollama} (mean over questions, first one excluded as warm-up)")
+        print(f"{'prompt':<10}{'tokens':>10}{'prefill ms':>12}{'p50 ms':>10}{'p95 ms':>10}")
+        with httpx.Client(base_url=args.ollama.rstrip("/"), timeout=300.0) as http:
+            for name, prompts in variants.items():
+                keep_alive = KEEP_ALIVE if name == "compact" else None
+                rows = np.array([prompt_eval(http, args.model, p, keep_alive) for p in prompts])[1:]
+                p50, p95 = np.percentile(rows[:, 2] * 1000, [50, 95])
+                print(f"{name:<10}{rows[:, 0].mean():>10.0f}{rows[:, 1].mean() * 1000:>12.1f}{p50:>10.1f}{p95:>10.1f}")
@@ -0,0 +1,375 @@
+# benchmarks/pipeline_benchmark.py
+"""
+End-to-end performance suite: time every stage of the pipeline on synthetic inventories of
+increasing size and write the numbers as JSON, for comparison between commits.
+
+Stages, per size:
+    generate     synthetic upload CSV + processed JSONL (benchmarks/synthetic_data.py)
+    csv_ingest   Pathway static ingest of the CSV (ingestion/pathway_ingestor.py); skipped without pathway
+    snapshot     JSONL -> Arrow snapshot, then reading the records back (ingestion/columnar_store.py)
+    embed        encoder throughput on --embed-sample documents, uncached
+    index_build  FAISS build (--index-type) over up to --max-index-rows vectors
+    retrieval    p50/p95/p99 of dense, BM25 and hybrid retrieval
+    qa           p50/p95/p99 of the whole question path (router, embedding, retrieval, prompt,
+                 LLM) against a local stub LLM that speaks Ollama's streaming /api/generate
+
+Only --embed-sample documents go through the encoder; the index is filled up to its size with
+jittered copies of those vectors (see ann_benchmark.py), so the index and retrieval numbers
+measure speed, not answer quality (retrieval_benchmark.py covers quality). --embeddings hash
+swaps the MiniLM encoder for a deterministic hashing embedder, for machines without the model.
+
+Run from the repo root:
+    python -m benchmarks.pipeline_benchmark --sizes 1k,100k,1m
+    python -m benchmarks.pipeline_benchmark --sizes 1k,100k --compare benchmarks/results/<baseline>.json
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import subprocess
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import numpy as np
+
+from benchmarks.ann_benchmark import jitter
+from benchmarks.retrieval_benchmark import generate_queries
+from benchmarks.synthetic_data import InventoryProfile, format_size, parse_size, write_inventory_csv, write_processed_jsonl
+from ingestion.columnar_store import jsonl_to_snapshot, load_records, snapshot_path_for
+from langchain.docstore.document import Document
+from langchain.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+from qa.context_builder import build_prompt
+from qa.hybrid_retriever import build_hybrid_retriever
+from qa.query_router import InventoryIndex, route_query
+from vectorstore.ann_index import INDEX_TYPES, build_index, describe_index
+from vectorstore.embed_and_store import render_document
+from vectorstore.embedding_cache import EMBEDDING_DIM
+
+DEFAULT_SIZES = "1k,100k"
+DEFAULT_WORKDIR = "data/bench"
+RESULTS_DIR = "benchmarks/results"
+DEFAULT_EMBED_SAMPLE = 2_000
+DEFAULT_MAX_INDEX_ROWS = 1_000_000
+DEFAULT_QUERIES = 200
+DEFAULT_QA_QUESTIONS = 50
+DEFAULT_REGRESSION_THRESHOLD = 0.2
+# Metrics compared by --compare; everything else in the results is context
+LOWER_IS_BETTER = ("seconds", "p50_ms", "p95_ms", "p99_ms")
+HIGHER_IS_BETTER = ("rows_per_s", "docs_per_s")
+
+def latency_summary(seconds: list[float]) -> dict:
+    ms = np.asarray(seconds) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"n": len(ms), "mean_ms": float(ms.mean()), "p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99)}
+
+class HashEmbeddings(Embeddings):
+    """
+    Deterministic unit vectors seeded from a hash of the text: no model, constant cost per text.
+    """
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self.embed_query(t) for t in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(EMBEDDING_DIM).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+def load_encoder(kind: str) -> Embeddings:
+    if kind == "hash":
+        return HashEmbeddings()
+    from vectorstore.embedding_cache import get_embeddings
+
+    # The raw encoder: cache hits from earlier runs would hide the real throughput
+    return get_embeddings().base
+
+class StubLLM:
+    """
+    Local stand-in for Ollama's streaming /api/generate: `tokens` chunks, `token_ms` apart,
+    after `prefill_ms` per 1000 prompt characters. Runs in a background thread.
+    """
+
+    def __init__(self, tokens: int = 40, token_ms: float = 5.0, prefill_ms: float = 20.0):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                time.sleep(stub.prefill_ms * len(body.get("prompt", "")) / 1000 / 1000)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.end_headers()
+                for i in range(stub.tokens):
+                    time.sleep(stub.token_ms / 1000)
+                    self.wfile.write(json.dumps({"response": f"tok{i} ", "done": False}).encode() + b"\n")
+                    self.wfile.flush()
+                self.wfile.write(json.dumps({"response": "", "done": True}).encode() + b"\n")
+
+            def log_message(self, *args):
+                pass
+
+        self.tokens = tokens
+        self.token_ms = token_ms
+        self.prefill_ms = prefill_ms
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, name="stub-llm", daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+
+def stage_generate(workdir: str, rows: int, seed: int, profile: InventoryProfile) -> dict:
+    label = format_size(rows)
+    csv_path = os.path.join(workdir, f"inventory_{label}.csv")
+    jsonl_path = os.path.join(workdir, f"output_{label}.jsonl")
+    started = time.perf_counter()
+    write_inventory_csv(csv_path, rows, seed, profile)
+    write_processed_jsonl(jsonl_path, rows, seed, profile)
+    seconds = time.perf_counter() - started
+    return {
+        "seconds": seconds, "csv_mb": os.path.getsize(csv_path) / 1e6, "jsonl_mb": os.path.getsize(jsonl_path) / 1e6,
+        "csv_path": csv_path, "jsonl_path": jsonl_path,
+    }
+
+def stage_csv_ingest(csv_path: str, rows: int, workdir: str) -> dict:
+    try:
+        import pathway as pw
+        from pathway.internals.parse_graph import G
+
+        from ingestion.pathway_ingestor import JsonlOutputSink, build_output_table, read_inventory_csv
+    except ImportError as e:
+        return {"skipped": f"{type(e).__name__}: {e}"}
+    out_path = os.path.join(workdir, "ingest_output.jsonl")
+    # Each run builds a fresh dataflow; earlier sizes' sinks must not run again
+    G.clear()
+    started = time.perf_counter()
+    sink = JsonlOutputSink(out_path)
+    pw.io.subscribe(build_output_table(read_inventory_csv(csv_path, "static")), on_change=sink.on_change, on_end=sink.on_end)
+    pw.run()
+    seconds = time.perf_counter() - started
+    G.clear()
+    return {"seconds": seconds, "rows_per_s": rows / seconds}
+
+def stage_snapshot(jsonl_path: str, rows: int) -> tuple[dict, list[dict]]:
+    started = time.perf_counter()
+    jsonl_to_snapshot(jsonl_path)
+    write_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    records = load_records(jsonl_path)
+    read_seconds = time.perf_counter() - started
+    return {
+        "seconds": write_seconds + read_seconds, "write_s": write_seconds, "read_s": read_seconds,
+        "rows_per_s": rows / (write_seconds + read_seconds),
+    }, records
+
+def stage_embed(encoder: Embeddings, docs: list[Document], batch_size: int = 256) -> tuple[dict, np.ndarray]:
+    texts = [doc.page_content for doc in docs]
+    started = time.perf_counter()
+    vectors = []
+    for i in range(0, len(texts), batch_size):
+        vectors.extend(encoder.embed_documents(texts[i:i + batch_size]))
+    seconds = time.perf_counter() - started
+    return {"seconds": seconds, "docs": len(texts), "docs_per_s": len(texts) / seconds}, np.asarray(vectors, dtype=np.float32)
+
+def stage_index_build(sample_vectors: np.ndarray, n: int, index_type: str, seed: int) -> tuple[dict, object]:
+    rng = np.random.default_rng(seed)
+    if n > len(sample_vectors):
+        extra = jitter(sample_vectors, n - len(sample_vectors), rng)
+        vectors = np.concatenate([sample_vectors, extra])
+    else:
+        vectors = sample_vectors[:n]
+    started = time.perf_counter()
+    index = build_index(vectors, index_type)
+    seconds = time.perf_counter() - started
+    return {"seconds": seconds, "vectors": n, "rows_per_s": n / seconds, **describe_index(index)}, index
+
+def stage_retrieval(retriever, encoder: Embeddings, queries: list[str]) -> dict:
+    vectorstore = retriever.vectorstore
+    vectors = encoder.embed_documents(queries)
+    dense, lexical, hybrid = [], [], []
+    for query, vector in zip(queries, vectors):
+        started = time.perf_counter()
+        vectorstore.similarity_search_by_vector(vector, k=retriever.fetch_k)
+        dense.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        retriever.lexical.search(query, retriever.fetch_k)
+        lexical.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        retriever.batch_retrieve([query], [vector])
+        hybrid.append(time.perf_counter() - started)
+    return {"dense": latency_summary(dense), "bm25": latency_summary(lexical), "hybrid": latency_summary(hybrid)}
+
+def stage_qa(retriever, encoder: Embeddings, inventory: InventoryIndex, questions: list[str], llm: StubLLM) -> dict:
+    """
+    The QA service's question path, timed per step, with the LLM call streamed from the stub.
+    """
+    steps = {name: [] for name in ("router", "embed", "retrieval", "prompt", "llm_ttft", "llm", "rag_total", "total")}
+    routed = 0
+    with httpx.Client(base_url=llm.url, timeout=60.0) as http:
+        for question in questions:
+            t0 = time.perf_counter()
+            result = route_query(question, inventory)
+            t1 = time.perf_counter()
+            steps["router"].append(t1 - t0)
+            if result is not None:
+                routed += 1
+                steps["total"].append(t1 - t0)
+                continue
+            vector = encoder.embed_query(question)
+            t2 = time.perf_counter()
+            docs = retriever.batch_retrieve([question], [vector])[0]
+            t3 = time.perf_counter()
+            prompt = build_prompt(question, docs)
+            t4 = time.perf_counter()
+            first = None
+            with http.stream("POST", "/api/generate", json={"model": "stub", "prompt": prompt, "stream": True}) as response:
+                for line in response.iter_lines():
+                    if line and first is None:
+                        first = time.perf_counter()
+                    if line and json.loads(line).get("done"):
+                        break
+            t5 = time.perf_counter()
+            for name, seconds in (("embed", t2 - t1), ("retrieval", t3 - t2), ("prompt", t4 - t3),
+                                  ("llm_ttft", (first or t5) - t4), ("llm", t5 - t4), ("rag_total", t5 - t0), ("total", t5 - t0)):
+                steps[name].append(seconds)
+    summary = {name: latency_summary(values) for name, values in steps.items() if values}
+    summary["routed"] = routed
+    summary["generated"] = len(questions) - routed
+    # Headline numbers for --compare: questions that went through retrieval and the LLM
+    headline = summary.get("rag_total", summary["total"])
+    summary.update({k: headline[k] for k in ("p50_ms", "p95_ms", "p99_ms")})
+    return summary
+
+def run_size(rows: int, args, profile: InventoryProfile, encoder: Embeddings, llm: StubLLM, log) -> dict:
+    label = format_size(rows)
+    results = {}
+    log(f"🧪 {label} rows")
+
+    results["generate"] = stage_generate(args.workdir, rows, args.seed, profile)
+    log(f"   generate     {results['generate']['seconds']:.2f}s")
+    results["csv_ingest"] = stage_csv_ingest(results["generate"]["csv_path"], rows, args.workdir)
+    ingest = results["csv_ingest"]
+    log(f"   csv_ingest   skipped ({ingest['skipped']})" if "skipped" in ingest else f"   csv_ingest   {ingest['seconds']:.2f}s")
+    results["snapshot"], records = stage_snapshot(results["generate"]["jsonl_path"], rows)
+    log(f"   snapshot     {results['snapshot']['seconds']:.2f}s")
+
+    n_index = min(rows, args.max_index_rows)
+    records = records[:n_index]
+    docs = [Document(page_content=render_document(rec), metadata=rec) for rec in records]
+    results["embed"], sample_vectors = stage_embed(encoder, docs[:args.embed_sample])
+    log(f"   embed        {results['embed']['docs_per_s']:.0f} docs/s")
+    results["index_build"], index = stage_index_build(sample_vectors, n_index, args.index_type, args.seed)
+    log(f"   index_build  {results['index_build']['seconds']:.2f}s for {n_index} vectors")
+
+    ids = [rec["Item_ID"] for rec in records]
+    vectorstore = FAISS(encoder, index, InMemoryDocstore(dict(zip(ids, docs))), dict(enumerate(ids)))
+    started = time.perf_counter()
+    retriever = build_hybrid_retriever(vectorstore)
+    results["index_build"]["retriever_s"] = time.perf_counter() - started
+
+    queries = [q for _, q, _ in generate_queries(records, args.queries, args.seed)]
+    results["retrieval"] = stage_retrieval(retriever, encoder, queries)
+    results["retrieval"].update({k: results["retrieval"]["hybrid"][k] for k in ("p50_ms", "p95_ms", "p99_ms")})
+    log(f"   retrieval    hybrid p50 {results['retrieval']['p50_ms']:.2f} ms, p99 {results['retrieval']['p99_ms']:.2f} ms")
+    results["qa"] = stage_qa(retriever, encoder, InventoryIndex(records), queries[:args.qa_questions], llm)
+    log(f"   qa (RAG)     p50 {results['qa']['p50_ms']:.1f} ms, p99 {results['qa']['p99_ms']:.1f} ms "
+        f"({results['qa']['routed']} routed, {results['qa']['generated']} via the LLM)")
+
+    csv_path, jsonl_path = results["generate"].pop("csv_path"), results["generate"].pop("jsonl_path")
+    if not args.keep_data:
+        for path in (csv_path, jsonl_path, snapshot_path_for(jsonl_path), os.path.join(args.workdir, "ingest_output.jsonl")):
+            if os.path.exists(path):
+                os.remove(path)
+    results["index_build"]["indexed_rows"] = n_index
+    return results
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(current: dict, baseline: dict, threshold: float = DEFAULT_REGRESSION_THRESHOLD) -> list[dict]:
+    """
+    Metrics that got worse than `baseline` by more than `threshold` (relative), per size and stage.
+    """
+    regressions = []
+    for size, stages in current["sizes"].items():
+        for stage, metrics in stages.items():
+            before = baseline.get("sizes", {}).get(size, {}).get(stage, {})
+            for metric, value in metrics.items():
+                old = before.get(metric)
+                if not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or old <= 0:
+                    continue
+                if metric in LOWER_IS_BETTER:
+                    change = value / old - 1
+                elif metric in HIGHER_IS_BETTER:
+                    change = old / value - 1 if value > 0 else float("inf")
+                else:
+                    continue
+                if change > threshold:
+                    regressions.append({"size": size, "stage": stage, "metric": metric, "baseline": old,
+                                        "current": value, "worse_by": change})
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time every pipeline stage on synthetic inventories.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma-separated row counts, e.g. 1k,100k,1m,10m")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR, help="Where the synthetic files are written")
+    parser.add_argument("--keep-data", action="store_true", help="Keep the generated CSV/JSONL files")
+    parser.add_argument("--embeddings", choices=("model", "hash"), default="model")
+    parser.add_argument("--embed-sample", type=int, default=DEFAULT_EMBED_SAMPLE, help="Documents actually encoded")
+    parser.add_argument("--max-index-rows", type=int, default=DEFAULT_MAX_INDEX_ROWS)
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default="flat")
+    parser.add_argument("--queries", type=int, default=DEFAULT_QUERIES)
+    parser.add_argument("--qa-questions", type=int, default=DEFAULT_QA_QUESTIONS)
+    parser.add_argument("--llm-tokens", type=int, default=40, help="Tokens the stub LLM streams per answer")
+    parser.add_argument("--llm-token-ms", type=float, default=5.0)
+    parser.add_argument("--out", help=f"Results JSON (default: {RESULTS_DIR}/<time>-<commit>.json)")
+    parser.add_argument("--compare", help="Earlier results JSON; exit 1 if any metric regressed")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        "sizes": {},
+    }
+    os.makedirs(args.workdir, exist_ok=True)
+    profile = InventoryProfile()
+    encoder = load_encoder(args.embeddings)
+    llm = StubLLM(tokens=args.llm_tokens, token_ms=args.llm_token_ms)
+    try:
+        for size in args.sizes.split(","):
+            rows = parse_size(size)
+            results["sizes"][format_size(rows)] = run_size(rows, args, profile, encoder, llm, print)
+    finally:
+        llm.close()
+
+    out = args.out or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{commit or 'nogit'}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"✅ Results written to {out}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        print(f"\n📊 Against {args.compare} (commit {baseline.get('commit')}), threshold {args.threshold:.0%}:")
+        for r in regressions:
+            print(f"   ❌ {r['size']} {r['stage']}.{r['metric']}: {r['baseline']:.3f} -> {r['current']:.3f} "
+                  f"({r['worse_by']:+.0%})")
+        if regressions:
+            raise SystemExit(1)
+        print("   ✅ No regressions")
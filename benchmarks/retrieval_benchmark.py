@@ -0,0 +1,115 @@
+# benchmarks/retrieval_benchmark.py
+"""
+Recall / latency benchmark for the dense (FAISS), lexical (BM25) and hybrid (RRF) retrievers
+on the bundled grocery dataset.
+
+Queries are generated from the processed inventory with known answers: product names,
+Item_IDs, warehouse addresses, aisle/shelf pairs and name + address combinations. For each
+query the relevant set is every record that matches it exactly.
+
+Run from the repo root:
+    python -m benchmarks.retrieval_benchmark --k 4 --queries 300
+"""
+import argparse
+import random
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from ingestion.columnar_store import DATA_PATH, load_records
+from langchain.docstore.document import Document
+from qa.hybrid_retriever import DEFAULT_FETCH_K, BM25Index, reciprocal_rank_fusion
+from vectorstore.embed_and_store import VECTOR_INDEX_PATH, render_document
+
+QUERY_TEMPLATES = {
+    "name": ("What is the current stock of {Name}?", ("Name",)),
+    "item_id": ("Tell me about item {Item_ID}", ("Item_ID",)),
+    "location": ("Which product is stored at {Warehouse_Location}?", ("Warehouse_Location",)),
+    "aisle_shelf": ("What is on Aisle {Aisle} Shelf {Shelf}?", ("Aisle", "Shelf")),
+    "name_location": ("How much {Name} is at {Warehouse_Location}?", ("Name", "Warehouse_Location")),
+}
+
+def generate_queries(records: list[dict], n: int, seed: int = 7) -> list[tuple[str, str, set]]:
+    """
+    (kind, query, relevant Item_IDs) triples, spread evenly over the query templates.
+    """
+    rng = random.Random(seed)
+    groups = {kind: defaultdict(set) for kind in QUERY_TEMPLATES}
+    for rec in records:
+        for kind, (_, fields) in QUERY_TEMPLATES.items():
+            groups[kind][tuple(rec.get(f) for f in fields)].add(rec["Item_ID"])
+    queries = []
+    per_kind = max(1, n // len(QUERY_TEMPLATES))
+    for kind, (template, fields) in QUERY_TEMPLATES.items():
+        keys = sorted(groups[kind], key=str)
+        for key in rng.sample(keys, min(per_kind, len(keys))):
+            queries.append((kind, template.format(**dict(zip(fields, key))), groups[kind][key]))
+    return queries
+
+def score(ranked: list[Document], relevant: set, k: int) -> tuple[float, float, float]:
+    """
+    (recall@k, hit@k, reciprocal rank) of one ranked list against the relevant Item_IDs.
+    """
+    ids = [doc.metadata.get("Item_ID") for doc in ranked[:k]]
+    found = sum(1 for i in ids if i in relevant)
+    first = next((rank for rank, i in enumerate(ids, start=1) if i in relevant), None)
+    return found / min(len(relevant), k), float(found > 0), 1.0 / first if first else 0.0
+
+def run(retrievers: dict, queries: list, k: int) -> dict:
+    results = {}
+    for name, retrieve in retrievers.items():
+        rows = defaultdict(list)
+        latencies = []
+        for kind, query, relevant in queries:
+            started = time.perf_counter()
+            ranked = retrieve(query)
+            latencies.append(time.perf_counter() - started)
+            rows[kind].append(score(ranked, relevant, k))
+            rows["all"].append(rows[kind][-1])
+        results[name] = {
+            kind: np.mean(np.array(values), axis=0) for kind, values in rows.items()
+        }
+        results[name]["latency_ms"] = np.percentile(np.array(latencies) * 1000, [50, 95])
+    return results
+
+def print_report(results: dict, k: int):
+    kinds = ["all"] + list(QUERY_TEMPLATES)
+    print(f"\n📊 recall@{k} / hit@{k} / MRR by query type")
+    print(f"{'retriever':<10}" + "".join(f"{kind:>22}" for kind in kinds) + f"{'p50 ms':>9}{'p95 ms':>9}")
+    for name, metrics in results.items():
+        cells = "".join(
+            f"{'{:.2f}/{:.2f}/{:.2f}'.format(*metrics[kind]):>22}" if kind in metrics else f"{'-':>22}"
+            for kind in kinds
+        )
+        p50, p95 = metrics["latency_ms"]
+        print(f"{name:<10}{cells}{p50:>9.2f}{p95:>9.2f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare dense, BM25 and hybrid retrieval on the grocery dataset.")
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--index", default=VECTOR_INDEX_PATH)
+    parser.add_argument("--k", type=int, default=4, help="Documents passed to the LLM")
+    parser.add_argument("--fetch-k", type=int, default=DEFAULT_FETCH_K, help="Candidates per retriever before fusion")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--lexical-only", action="store_true", help="Skip FAISS (no embedding model needed)")
+    args = parser.parse_args()
+
+    records = load_records(args.data)
+    queries = generate_queries(records, args.queries, args.seed)
+    print(f"🧪 {len(queries)} queries over {len(records)} records")
+
+    bm25 = BM25Index([Document(page_content=render_document(rec), metadata=rec) for rec in records])
+    retrievers = {"bm25": lambda q: [doc for doc, _ in bm25.search(q, args.k)]}
+    if not args.lexical_only:
+        from vectorstore.embedding_cache import get_embeddings
+        from vectorstore.index_store import load_store
+
+        vectorstore = load_store(args.index, get_embeddings())
+        retrievers["dense"] = lambda q: vectorstore.similarity_search(q, k=args.k)
+        retrievers["hybrid"] = lambda q: reciprocal_rank_fusion(
+            [[doc for doc, _ in bm25.search(q, args.fetch_k)], vectorstore.similarity_search(q, k=args.fetch_k)],
+            k=args.k,
+        )
+    print_report(run(retrievers, queries, args.k), args.k)
@@ -0,0 +1,184 @@
+# benchmarks/synthetic_data.py
+"""
+Synthetic grocery inventories shaped like data/uploads/Grocery_Inventory_and_Sales_Dataset.csv,
+at any size.
+
+Product names, categories, suppliers, street names and statuses are sampled from the bundled
+CSV, numeric columns from its observed ranges, and Item_IDs are unique NN-NNN-NNNN codes, so
+every stage downstream sees realistic vocabulary and cardinalities. Rows are generated and
+written in chunks, so 10M-row files need constant memory.
+
+    write_inventory_csv   raw upload CSV (input of the Pathway ingestor)
+    write_processed_jsonl processed records like data/processed/output.jsonl
+
+Run from the repo root:
+    python -m benchmarks.synthetic_data --rows 1m --csv data/bench/inventory_1m.csv --jsonl data/bench/output_1m.jsonl
+"""
+import argparse
+import csv
+import json
+import os
+from datetime import date
+
+import numpy as np
+
+from ingestion.inventory_schema import item_placement, parse_unit_price
+
+SOURCE_CSV = "data/uploads/Grocery_Inventory_and_Sales_Dataset.csv"
+CSV_COLUMNS = (
+    "Product_ID", "Product_Name", "Catagory", "Supplier_ID", "Supplier_Name", "Stock_Quantity", "Reorder_Level",
+    "Reorder_Quantity", "Unit_Price", "Date_Received", "Last_Order_Date", "Expiration_Date", "Warehouse_Location",
+    "Sales_Volume", "Inventory_Turnover_Rate", "Status",
+)
+INT_COLUMNS = ("Stock_Quantity", "Reorder_Level", "Reorder_Quantity", "Sales_Volume", "Inventory_Turnover_Rate")
+CHUNK_ROWS = 100_000
+REFERENCE_DATE = date(2025, 6, 28)
+EXPIRY_HORIZON_DAYS = 7
+# Step coprime with 10**9: row i maps to a distinct 9-digit Item_ID for any i < 10**9
+ID_STEP = 7919
+SIZE_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+
+def parse_size(text: str) -> int:
+    """
+    "1k" -> 1000, "10m" -> 10_000_000, "2500" -> 2500.
+    """
+    text = text.strip().lower()
+    if text[-1:] in SIZE_SUFFIXES:
+        return int(float(text[:-1]) * SIZE_SUFFIXES[text[-1]])
+    return int(text)
+
+def format_size(rows: int) -> str:
+    for suffix, factor in sorted(SIZE_SUFFIXES.items(), key=lambda kv: -kv[1]):
+        if rows >= factor and rows % factor == 0:
+            return f"{rows // factor}{suffix}"
+    return str(rows)
+
+class InventoryProfile:
+    """
+    Value pools and numeric ranges observed in the source CSV.
+    """
+
+    def __init__(self, path: str = SOURCE_CSV):
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            rows = list(csv.DictReader(f))
+        # Keep product name and category together so categories stay plausible
+        self.products = sorted({(r["Product_Name"], r["Catagory"]) for r in rows})
+        self.suppliers = sorted({(r["Supplier_ID"], r["Supplier_Name"]) for r in rows})
+        self.statuses = sorted({r["Status"] for r in rows})
+        self.streets = sorted({r["Warehouse_Location"].split(" ", 1)[1] for r in rows if " " in r["Warehouse_Location"]})
+        self.ranges = {c: (min(int(r[c]) for r in rows), max(int(r[c]) for r in rows)) for c in INT_COLUMNS}
+        prices = [float(r["Unit_Price"].strip().lstrip("$").replace(",", "")) for r in rows]
+        self.price_range = (min(prices), max(prices))
+
+def _item_ids(start: int, n: int) -> list[str]:
+    codes = (np.arange(start, start + n, dtype=np.int64) * ID_STEP) % 10**9
+    return [f"{c // 10**7:02d}-{c // 10**4 % 1000:03d}-{c % 10**4:04d}" for c in codes.tolist()]
+
+def _dates(rng, n: int, start: date, span_days: int) -> list[str]:
+    base = start.toordinal()
+    return [
+        f"{d.month}/{d.day}/{d.year}"
+        for d in map(date.fromordinal, (base + rng.integers(0, span_days, n)).tolist())
+    ]
+
+def generate_chunks(rows: int, seed: int = 7, profile: InventoryProfile | None = None, chunk_rows: int = CHUNK_ROWS):
+    """
+    Yield dicts of equal-length column lists, one per CSV column, `chunk_rows` rows at a time.
+    """
+    profile = profile or InventoryProfile()
+    rng = np.random.default_rng(seed)
+    # House number x street: nearly every row gets its own site, as in the source data
+    n_streets = len(profile.streets)
+    for start in range(0, rows, chunk_rows):
+        n = min(chunk_rows, rows - start)
+        product = rng.integers(0, len(profile.products), n)
+        supplier = rng.integers(0, len(profile.suppliers), n)
+        numbers = rng.integers(1, 99_999, n)
+        streets = rng.integers(0, n_streets, n)
+        low, high = profile.price_range
+        chunk = {
+            "Product_ID": _item_ids(start, n),
+            "Product_Name": [profile.products[i][0] for i in product.tolist()],
+            "Catagory": [profile.products[i][1] for i in product.tolist()],
+            "Supplier_ID": [profile.suppliers[i][0] for i in supplier.tolist()],
+            "Supplier_Name": [profile.suppliers[i][1] for i in supplier.tolist()],
+            "Unit_Price": [f"${p:.2f} " for p in rng.uniform(low, high, n).tolist()],
+            "Date_Received": _dates(rng, n, date(2024, 1, 1), 365),
+            "Last_Order_Date": _dates(rng, n, date(2024, 1, 1), 365),
+            "Expiration_Date": _dates(rng, n, date(2025, 1, 1), 365),
+            "Warehouse_Location": [f"{num} {profile.streets[s]}" for num, s in zip(numbers.tolist(), streets.tolist())],
+            "Status": [profile.statuses[i] for i in rng.integers(0, len(profile.statuses), n).tolist()],
+        }
+        for column in INT_COLUMNS:
+            lo, hi = profile.ranges[column]
+            chunk[column] = rng.integers(lo, hi + 1, n).tolist()
+        yield chunk
+
+def write_inventory_csv(path: str, rows: int, seed: int = 7, profile: InventoryProfile | None = None) -> str:
+    """
+    Write a raw upload CSV with the source file's header and `rows` rows.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_COLUMNS)
+        for chunk in generate_chunks(rows, seed, profile):
+            writer.writerows(zip(*(chunk[c] for c in CSV_COLUMNS)))
+    return path
+
+def processed_records(chunk: dict, reference: date = REFERENCE_DATE, horizon_days: int = EXPIRY_HORIZON_DAYS):
+    """
+    Records of one generated chunk in the processed output.jsonl shape, as the ingestor writes them.
+    """
+    start, end = reference.toordinal(), reference.toordinal() + horizon_days
+    for i in range(len(chunk["Product_ID"])):
+        month, day, year = map(int, chunk["Expiration_Date"][i].split("/"))
+        aisle, shelf = item_placement(chunk["Product_ID"][i])
+        yield {
+            "Item_ID": chunk["Product_ID"][i],
+            "Name": chunk["Product_Name"][i],
+            "Expiration_Date": chunk["Expiration_Date"][i],
+            "Warehouse_Location": chunk["Warehouse_Location"][i],
+            "Expiring_Soon": start <= date(year, month, day).toordinal() <= end,
+            "Stock_Quantity": chunk["Stock_Quantity"][i],
+            "Aisle": aisle,
+            "Shelf": shelf,
+            "Category": chunk["Catagory"][i],
+            "Unit_Price": parse_unit_price(chunk["Unit_Price"][i]),
+            "Reorder_Level": chunk["Reorder_Level"][i],
+            "Reorder_Quantity": chunk["Reorder_Quantity"][i],
+            "Sales_Volume": chunk["Sales_Volume"][i],
+            "Inventory_Turnover_Rate": chunk["Inventory_Turnover_Rate"][i],
+            "Supplier_ID": chunk["Supplier_ID"][i],
+            "Supplier_Name": chunk["Supplier_Name"][i],
+            "Date_Received": chunk["Date_Received"][i],
+            "Last_Order_Date": chunk["Last_Order_Date"][i],
+            "Status": chunk["Status"][i],
+        }
+
+def write_processed_jsonl(path: str, rows: int, seed: int = 7, profile: InventoryProfile | None = None) -> str:
+    """
+    Write `rows` processed records (the same rows write_inventory_csv produces for `seed`).
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for chunk in generate_chunks(rows, seed, profile):
+            f.writelines(json.dumps(rec) + "\n" for rec in processed_records(chunk))
+    return path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic grocery inventory.")
+    parser.add_argument("--rows", default="100k", help="Row count, e.g. 1k, 100k, 1m, 10m")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--csv", help="Write the raw upload CSV here")
+    parser.add_argument("--jsonl", help="Write processed output.jsonl-style records here")
+    args = parser.parse_args()
+    if not args.csv and not args.jsonl:
+        parser.error("give --csv and/or --jsonl")
+
+    rows = parse_size(args.rows)
+    profile = InventoryProfile()
+    for flag, writer in ((args.csv, write_inventory_csv), (args.jsonl, write_processed_jsonl)):
+        if flag:
+            writer(flag, rows, args.seed, profile)
+            print(f"✅ Wrote {rows} rows to {flag} ({os.path.getsize(flag) / 1e6:.1f} MB)")
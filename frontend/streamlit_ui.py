@@ -1,5 +1,5 @@
 import streamlit as st
-from qa.rag_qa import ask
+from qa.client import ask
 
 st.set_page_config(page_title="Inventory Spotter AI", page_icon="📦")
 st.title("📦 Inventory Spotter AI")
@@ -0,0 +1,109 @@
+# ingestion/columnar_store.py
+import os
+
+import pyarrow as pa
+import pyarrow.json as paj
+
+from ingestion.inventory_schema import OUTPUT_SCHEMA
+
+DATA_PATH = "data/processed/output.jsonl"
+# String columns with few distinct values, stored dictionary-encoded
+DICTIONARY_COLUMNS = ("Name", "Warehouse_Location", "Expiration_Date", "Aisle", "Category", "Supplier_Name", "Status")
+
+def snapshot_path_for(jsonl_path: str = DATA_PATH) -> str:
+    """
+    Path of the Arrow snapshot that sits next to a processed JSONL file (output.jsonl -> output.arrow).
+    """
+    return os.path.splitext(jsonl_path)[0] + ".arrow"
+
+RECORD_SCHEMA = pa.schema([(name, pa.type_for_alias(type_name)) for name, type_name in OUTPUT_SCHEMA])
+
+def read_jsonl(jsonl_path: str) -> pa.Table:
+    """
+    Parse a processed JSONL file with Arrow's native reader, typing the record fields by
+    RECORD_SCHEMA (missing ones come back as nulls) and inferring any others.
+    """
+    return paj.read_json(jsonl_path, parse_options=paj.ParseOptions(explicit_schema=RECORD_SCHEMA))
+
+def conform_table(table: pa.Table) -> pa.Table:
+    """
+    Add any record field the table lacks as an all-null column, so snapshots written before
+    the full-schema ingest read with every field present.
+    """
+    for field in RECORD_SCHEMA:
+        if field.name not in table.column_names:
+            table = table.append_column(field, pa.nulls(table.num_rows, type=field.type))
+    return table
+
+def encode_table(table: pa.Table) -> pa.Table:
+    """
+    Dictionary-encode the low-cardinality string columns of a processed inventory table.
+    """
+    for name in DICTIONARY_COLUMNS:
+        if name in table.column_names and pa.types.is_string(table.schema.field(name).type):
+            i = table.column_names.index(name)
+            table = table.set_column(i, name, table[name].dictionary_encode())
+    return table
+
+def write_snapshot(table: pa.Table, path: str) -> str:
+    """
+    Write `table` as an uncompressed Arrow IPC file so readers can memory-map it without copying.
+    Written to a temp file and renamed, so readers never see a partial snapshot.
+    """
+    table = encode_table(table)
+    tmp_path = path + ".tmp"
+    with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, path)
+    return path
+
+def jsonl_to_snapshot(jsonl_path: str = DATA_PATH, path: str | None = None) -> str:
+    """
+    Convert a processed JSONL file into its Arrow snapshot using Arrow's native JSON reader.
+    """
+    return write_snapshot(read_jsonl(jsonl_path), path or snapshot_path_for(jsonl_path))
+
+def snapshot_is_fresh(jsonl_path: str = DATA_PATH) -> bool:
+    path = snapshot_path_for(jsonl_path)
+    if not os.path.exists(path):
+        return False
+    return not os.path.exists(jsonl_path) or os.path.getmtime(path) >= os.path.getmtime(jsonl_path)
+
+def snapshot_version(jsonl_path: str = DATA_PATH) -> tuple:
+    """
+    (mtime_ns, size) of the JSONL and its snapshot; changes whenever either is rewritten.
+    """
+    version = []
+    for p in (jsonl_path, snapshot_path_for(jsonl_path)):
+        try:
+            st = os.stat(p)
+            version.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            version.append(None)
+    return tuple(version)
+
+def load_table(jsonl_path: str = DATA_PATH, columns: list[str] | None = None) -> pa.Table:
+    """
+    The processed inventory as an Arrow table, restricted to `columns` if given.
+    Memory-maps the Arrow snapshot when it is at least as new as the JSONL (zero-copy, and
+    untouched columns are never paged in); otherwise parses the JSONL with Arrow's reader.
+    """
+    if snapshot_is_fresh(jsonl_path):
+        table = pa.ipc.open_file(pa.memory_map(snapshot_path_for(jsonl_path), "r")).read_all()
+    else:
+        table = read_jsonl(jsonl_path)
+    table = conform_table(table)
+    if columns:
+        table = table.select([c for c in columns if c in table.column_names])
+    return table
+
+def load_records(jsonl_path: str = DATA_PATH, columns: list[str] | None = None) -> list[dict]:
+    """
+    The processed inventory as a list of dicts, for callers that need whole records.
+    """
+    return load_table(jsonl_path, columns).to_pylist()
+
+if __name__ == "__main__":
+    print(f"🗜️ Converting {DATA_PATH} to {snapshot_path_for(DATA_PATH)} ...")
+    jsonl_to_snapshot(DATA_PATH)
+    print("✅ Snapshot written.")
@@ -0,0 +1,91 @@
+# ingestion/inventory_schema.py
+"""
+Shape of one processed inventory record, shared by the Pathway ingestor, the readers of
+output.jsonl and the synthetic benchmark data.
+
+Every CSV column is carried through (Product_ID -> Item_ID, Product_Name -> Name,
+Catagory -> Category) and Unit_Price is parsed to a number. The inventory CSV has no aisle or
+shelf: each item's Aisle and Shelf come from data/placements.csv, and stay null for items it
+does not list rather than being guessed.
+"""
+import csv
+import os
+import zlib
+from functools import lru_cache
+
+PLACEMENTS_PATH = "data/placements.csv"
+# Items expiring within this many days of the reference date count as expiring soon
+EXPIRY_HORIZON_DAYS = 7
+# Warehouse layout of data/placements.csv, used to place generated benchmark items
+AISLES = "ABCDEFGH"
+SHELVES_PER_AISLE = 20
+
+# (field, Arrow type name), in output.jsonl order
+OUTPUT_SCHEMA = (
+    ("Item_ID", "string"),
+    ("Name", "string"),
+    ("Expiration_Date", "string"),
+    ("Warehouse_Location", "string"),
+    ("Expiring_Soon", "bool"),
+    ("Stock_Quantity", "int64"),
+    ("Aisle", "string"),
+    ("Shelf", "int64"),
+    ("Category", "string"),
+    ("Unit_Price", "float64"),
+    ("Reorder_Level", "int64"),
+    ("Reorder_Quantity", "int64"),
+    ("Sales_Volume", "int64"),
+    ("Inventory_Turnover_Rate", "int64"),
+    ("Supplier_ID", "string"),
+    ("Supplier_Name", "string"),
+    ("Date_Received", "string"),
+    ("Last_Order_Date", "string"),
+    ("Status", "string"),
+)
+OUTPUT_FIELDS = tuple(field for field, _ in OUTPUT_SCHEMA)
+
+@lru_cache(maxsize=None)
+def parse_unit_price(text):
+    """
+    "$4.50 " -> 4.5; None for a blank or malformed price.
+    Cached per distinct string: prices repeat heavily across rows.
+    """
+    try:
+        return float(str(text).strip().lstrip("$").replace(",", ""))
+    except ValueError:
+        return None
+
+def load_placements(path: str = PLACEMENTS_PATH) -> dict[str, tuple[str, int]]:
+    """
+    Item_ID -> (Aisle, Shelf) from a placement CSV (Item_ID,Aisle,Shelf); empty if there is none.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return {
+            row["Item_ID"]: (row["Aisle"].strip().upper(), int(row["Shelf"]))
+            for row in csv.DictReader(f)
+            if row.get("Aisle") and row.get("Shelf")
+        }
+
+def placement_label(rec: dict) -> str:
+    """
+    "Aisle A Shelf 4" for spoken and written answers, or a note that the placement is not recorded.
+    """
+    if rec.get("Aisle") is None or rec.get("Shelf") is None:
+        return "aisle and shelf not recorded"
+    return f"Aisle {rec['Aisle']} Shelf {rec['Shelf']}"
+
+def item_placement(item_id: str) -> tuple[str, int]:
+    """
+    Synthetic (Aisle, Shelf) for generated benchmark items: a stable hash of the Item_ID
+    spread over the real layout. Never used for actual inventory.
+    """
+    slot = zlib.crc32(item_id.encode("utf-8")) % (len(AISLES) * SHELVES_PER_AISLE)
+    return AISLES[slot // SHELVES_PER_AISLE], slot % SHELVES_PER_AISLE + 1
+
+def conform_record(rec: dict) -> dict:
+    """
+    `rec` with every OUTPUT_FIELDS key present (None where a pre-full-schema file lacks it).
+    """
+    return {**dict.fromkeys(OUTPUT_FIELDS), **rec}
@@ -1,12 +1,31 @@
-
 import pathway as pw
-import pandas as pd
-from datetime import datetime
+from datetime import date, datetime, timedelta
+from collections import defaultdict
+from functools import lru_cache
+import argparse
 import os
 import logging
 import json
+import threading
 import time
 
+from langchain.docstore.document import Document
+from alerts.restock_index import RESTOCK_PATH, days_of_cover, is_low_cover, write_restock
+from ingestion.columnar_store import jsonl_to_snapshot
+from ingestion.inventory_schema import EXPIRY_HORIZON_DAYS, OUTPUT_FIELDS, load_placements, parse_unit_price
+from vectorstore.embedding_cache import get_embeddings
+from vectorstore.index_store import load_store, store_exists
+from vectorstore.embed_and_store import (
+    FAISS,
+    VECTOR_INDEX_PATH,
+    apply_changes,
+    document_hash,
+    load_manifest,
+    render_document,
+    save_manifest,
+    save_vectorstore,
+)
+
 # Set up logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 
@@ -31,110 +50,438 @@ class InputSchema(pw.Schema):
 
 # Output paths
 OUTPUT_PATH = "data/processed/output.jsonl"
-TEMP_OUTPUT_PATH = "data/processed/temp_output.jsonl"
-TEMP_COUNT_PATH = "data/processed/temp_count.jsonl"
 CSV_PATH = "data/uploads/Grocery_Inventory_and_Sales_Dataset.csv"
+UPLOADS_DIR = "data/uploads/"
 
-# Verify file existence
-if not os.path.exists(CSV_PATH):
-    logging.error(f"CSV file not found at {CSV_PATH}")
-    raise FileNotFoundError(f"CSV file not found at {CSV_PATH}")
-
-# Step 1: Read CSV from the specific file
-try:
-    csv_input = pw.io.csv.read(
-        CSV_PATH,
-        schema=InputSchema,
-        mode="static",
-        autocommit_duration_ms=1000,
-    )
-    logging.info(f"Successfully read CSV from {CSV_PATH}")
-except Exception as e:
-    logging.error(f"Failed to read CSV: {str(e)}")
-    raise
-
-# Step 2: Log the number of rows read
-def log_row_count(table):
+# Step 1: Read CSV input
+def read_inventory_csv(path, mode):
     try:
-        count_table = table.reduce(count=pw.reducers.count())
-        pw.io.jsonlines.write(count_table.select(count=pw.this.count), TEMP_COUNT_PATH)
-        logging.info(f"Row count written to {TEMP_COUNT_PATH}. Check file for details.")
+        csv_input = pw.io.csv.read(
+            path,
+            schema=InputSchema,
+            mode=mode,
+            autocommit_duration_ms=1000,
+        )
+        logging.info(f"Successfully read CSV from {path} ({mode})")
+        return csv_input
     except Exception as e:
-        logging.warning(f"Failed to count rows: {str(e)}. Proceeding without count.")
-    return table
+        logging.error(f"Failed to read CSV: {str(e)}")
+        raise
 
-csv_input = log_row_count(csv_input)
+# Step 3: Add Expiring_Soon flag
+EXPIRY_DATE_FORMAT = "%m/%d/%Y"
+EXPIRY_REFERENCE_DATE = "today"
+# Stands in for an unparseable Expiration_Date; far outside any expiry window
+INVALID_DATE = pw.DateTimeNaive(datetime(1970, 1, 1))
 
-# Step 3: Select and rename relevant columns
-filtered_table = csv_input.select(
-    Item_ID=pw.this.Product_ID,
-    Name=pw.this.Product_Name,
-    Expiration_Date=pw.this.Expiration_Date,
-    Warehouse_Location=pw.this.Warehouse_Location,
-)
+@pw.udf
+def unit_price(price_str: str) -> float | None:
+    return parse_unit_price(price_str)
 
-# Step 4: Add Expiring_Soon flag
-def compute_expiring_soon(exp_date_str):
-    try:
-        exp_date = pd.to_datetime(exp_date_str, format="%m/%d/%Y", errors="coerce")
-        today = pd.Timestamp("2025-06-28")  # Hardcode date for consistency
-        if pd.notnull(exp_date):
-            days_diff = (exp_date - today).days
-            logging.debug(f"Date {exp_date_str}: {days_diff} days from {today}")
-            return 0 <= days_diff <= 7
-        logging.warning(f"Invalid date '{exp_date_str}'")
-        return False
-    except Exception as e:
-        logging.warning(f"Failed to parse date '{exp_date_str}': {str(e)}")
-        return False
+@lru_cache(maxsize=None)
+def placements():
+    return load_placements()
 
-cleaned_table = filtered_table.with_columns(
-    Expiring_Soon=pw.apply(compute_expiring_soon, pw.this.Expiration_Date)
+@pw.udf
+def item_aisle(item_id: str) -> str | None:
+    return placements().get(item_id, (None, None))[0]
+
+@pw.udf
+def item_shelf(item_id: str) -> int | None:
+    return placements().get(item_id, (None, None))[1]
+
+def resolve_reference_date(value):
+    if value in (None, "", "today"):
+        return date.today()
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+def expiry_date(column):
+    """
+    Native (engine-side) parse of an Expiration_Date column; INVALID_DATE where it does not parse.
+    """
+    return pw.fill_error(column.dt.strptime(EXPIRY_DATE_FORMAT), INVALID_DATE)
+
+def log_invalid_dates(table):
+    """
+    Report the number of rows with an unparseable Expiration_Date as one aggregate, not per row.
+    """
+    invalid = table.filter(pw.this.Expiry_Date == INVALID_DATE).reduce(count=pw.reducers.count())
+
+    def on_change(key, row, time, is_addition):
+        if is_addition and row["count"]:
+            logging.warning(f"{row['count']} rows have an invalid Expiration_Date and are not flagged")
+
+    pw.io.subscribe(invalid, on_change=on_change)
+
+def build_output_table(csv_input, reference_date=EXPIRY_REFERENCE_DATE, horizon_days=EXPIRY_HORIZON_DAYS):
+    # Step 2: Carry the full typed record, renamed, with price parsed and placement looked up
+    filtered_table = csv_input.select(
+        Item_ID=pw.this.Product_ID,
+        Name=pw.this.Product_Name,
+        Expiration_Date=pw.this.Expiration_Date,
+        Warehouse_Location=pw.this.Warehouse_Location,
+        Stock_Quantity=pw.this.Stock_Quantity,
+        Aisle=item_aisle(pw.this.Product_ID),
+        Shelf=item_shelf(pw.this.Product_ID),
+        Category=pw.this.Catagory,
+        Unit_Price=unit_price(pw.this.Unit_Price),
+        Reorder_Level=pw.this.Reorder_Level,
+        Reorder_Quantity=pw.this.Reorder_Quantity,
+        Sales_Volume=pw.this.Sales_Volume,
+        Inventory_Turnover_Rate=pw.this.Inventory_Turnover_Rate,
+        Supplier_ID=pw.this.Supplier_ID,
+        Supplier_Name=pw.this.Supplier_Name,
+        Date_Received=pw.this.Date_Received,
+        Last_Order_Date=pw.this.Last_Order_Date,
+        Status=pw.this.Status,
+        Expiry_Date=expiry_date(pw.this.Expiration_Date),
+    )
+    log_invalid_dates(filtered_table)
+
+    # Parsing and the window check both run in the engine; INVALID_DATE never falls inside the window
+    reference = pw.DateTimeNaive(datetime.combine(resolve_reference_date(reference_date), datetime.min.time()))
+    cleaned_table = filtered_table.with_columns(
+        Expiring_Soon=(pw.this.Expiry_Date >= reference) & (pw.this.Expiry_Date <= reference + timedelta(days=horizon_days))
+    )
+
+    return cleaned_table.select(*(pw.this[field] for field in OUTPUT_FIELDS))
+
+class JsonlOutputSink:
+    """
+    Pathway subscriber that writes output rows as JSON lines in the single pass over the data,
+    counting them on the way. Rows go to a temp file that replaces `path` only once the run
+    has ended, so readers never see a half-written output.jsonl.
+    """
+
+    def __init__(self, path=OUTPUT_PATH, fields=OUTPUT_FIELDS):
+        self.path = path
+        self.fields = fields
+        self.tmp_path = path + ".tmp"
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.file = open(self.tmp_path, "w", encoding="utf-8")
+        self.rows = 0
+        self.retractions = 0
+
+    def on_change(self, key, row, time, is_addition):
+        if not is_addition:
+            # A static read of an append-only select never retracts; a line already written cannot be taken back
+            self.retractions += 1
+            return
+        self.file.write(json.dumps({k: row[k] for k in self.fields}) + "\n")
+        self.rows += 1
+
+    def on_end(self):
+        self.file.close()
+        if self.retractions:
+            os.remove(self.tmp_path)
+            raise RuntimeError(f"{self.retractions} rows were retracted; {self.path} left unchanged")
+        os.replace(self.tmp_path, self.path)
+        logging.info(f"Wrote {self.rows} rows to {self.path}")
+
+def write_output(rows, path=OUTPUT_PATH, fields=OUTPUT_FIELDS) -> int:
+    """
+    Replace `path` (atomically) with `rows` as JSON lines, then rewrite its Arrow snapshot.
+    Returns the number of rows written.
+    """
+    tmp_path = path + ".tmp"
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    count = 0
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps({k: row[k] for k in fields}) + "\n")
+            count += 1
+    os.replace(tmp_path, path)
+    jsonl_to_snapshot(path)
+    return count
+
+@pw.udf
+def cover_days(stock: int, sales_volume: int) -> float | None:
+    return days_of_cover(stock, sales_volume)
+
+@pw.udf
+def low_cover(stock: int, sales_volume: int) -> bool:
+    return is_low_cover(stock, sales_volume)
+
+# Fields of each flagged product/location row carried in a product's Flagged tuple
+RESTOCK_LOCATION_FIELDS = (
+    "Item_ID", "Name", "Warehouse_Location", "Aisle", "Shelf", "Stock_Quantity", "Reorder_Level",
+    "Reorder_Quantity", "Sales_Volume", "Days_Of_Cover", "Below_Reorder", "Low_Cover",
 )
 
-# Step 5: Write to temporary output and post-process
-try:
-    os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
-    output_table = cleaned_table.select(
+def build_restock_table(output_table):
+    """
+    Restock view of the output table as one table: a row per product with its summary and the
+    tuple of its flagged product/location rows (RESTOCK_LOCATION_FIELDS). Rows are first
+    reduced to one per (Item_ID, Warehouse_Location), so a product present in several upload
+    files counts once. Everything is a groupby, filter or join over the live rows, so Pathway
+    only re-evaluates the products whose inputs changed.
+    """
+    locations = output_table.groupby(pw.this.Item_ID, pw.this.Warehouse_Location).reduce(
         Item_ID=pw.this.Item_ID,
-        Name=pw.this.Name,
-        Expiration_Date=pw.this.Expiration_Date,
         Warehouse_Location=pw.this.Warehouse_Location,
-        Expiring_Soon=pw.this.Expiring_Soon
+        # The most recently ingested copy wins, as in VectorIndexSink
+        Name=pw.reducers.latest(pw.this.Name),
+        Aisle=pw.reducers.latest(pw.this.Aisle),
+        Shelf=pw.reducers.latest(pw.this.Shelf),
+        Stock_Quantity=pw.reducers.latest(pw.this.Stock_Quantity),
+        Reorder_Level=pw.reducers.latest(pw.this.Reorder_Level),
+        Reorder_Quantity=pw.reducers.latest(pw.this.Reorder_Quantity),
+        Sales_Volume=pw.reducers.latest(pw.this.Sales_Volume),
+    )
+    locations = locations.with_columns(
+        Days_Of_Cover=cover_days(pw.this.Stock_Quantity, pw.this.Sales_Volume),
+        Below_Reorder=pw.this.Stock_Quantity <= pw.this.Reorder_Level,
+        Low_Cover=low_cover(pw.this.Stock_Quantity, pw.this.Sales_Volume),
+    )
+    flagged = locations.filter(pw.this.Below_Reorder | pw.this.Low_Cover).groupby(pw.this.Name).reduce(
+        Name=pw.this.Name,
+        Flagged=pw.reducers.tuple(pw.make_tuple(*(pw.this[field] for field in RESTOCK_LOCATION_FIELDS))),
     )
-    # Write to temporary JSONL
-    pw.io.jsonlines.write(output_table, TEMP_OUTPUT_PATH)
-    logging.info(f"Wrote temporary output to {TEMP_OUTPUT_PATH}")
 
-    # Run the pipeline to ensure temp output is written
-    logging.info("Running Pathway pipeline for temporary output")
-    pw.run()
-    logging.info("Pipeline execution completed for temporary output")
+    products = locations.groupby(pw.this.Name).reduce(
+        Name=pw.this.Name,
+        Locations=pw.reducers.count(),
+        Stock_Quantity=pw.reducers.sum(pw.this.Stock_Quantity),
+        Reorder_Level=pw.reducers.sum(pw.this.Reorder_Level),
+        Sales_Volume=pw.reducers.sum(pw.this.Sales_Volume),
+        Below_Reorder_Locations=pw.reducers.sum(pw.if_else(pw.this.Below_Reorder, 1, 0)),
+    )
+    products = products.with_columns(
+        Days_Of_Cover=cover_days(pw.this.Stock_Quantity, pw.this.Sales_Volume),
+        Below_Reorder=pw.this.Stock_Quantity <= pw.this.Reorder_Level,
+    )
+    return products.join_left(flagged, pw.left.Name == pw.right.Name).select(*pw.left, Flagged=pw.right.Flagged)
+
+class RestockSink:
+    """
+    Pathway subscriber that keeps the restock view (alerts/restock_index.py) on disk.
+    It follows the single table of build_restock_table, so every commit's diffs are applied
+    together and restock.json is rewritten (atomically) once per commit in which something
+    changed, with products and flagged locations from the same point in time.
+    """
+
+    def __init__(self, path=RESTOCK_PATH):
+        self.path = path
+        self.products = {}
+        self.dirty = False
+
+    def on_change(self, key, row, time, is_addition):
+        if is_addition:
+            self.products[key] = dict(row)
+        elif self.products.get(key) == dict(row):
+            # The addition of an update may arrive first; only drop the row this retraction names
+            del self.products[key]
+        self.dirty = True
+
+    def view(self) -> tuple[list[dict], list[dict]]:
+        """
+        (flagged locations, product summaries) of the current rows, as written to restock.json.
+        """
+        locations, products = [], []
+        for row in self.products.values():
+            products.append({k: v for k, v in row.items() if k != "Flagged"})
+            locations += [dict(zip(RESTOCK_LOCATION_FIELDS, values)) for values in row.get("Flagged") or ()]
+        return locations, products
+
+    def on_time_end(self, time):
+        if not self.dirty:
+            return
+        self.dirty = False
+        locations, products = self.view()
+        write_restock(locations, products, self.path)
+        logging.info(
+            f"Restock view updated at time {time}: {len(locations)} locations flagged "
+            f"across {len(products)} products"
+        )
+
+    def on_end(self):
+        if self.dirty or not os.path.exists(self.path):
+            self.dirty = True
+            self.on_time_end("end")
+
+def subscribe_restock(output_table, path=RESTOCK_PATH):
+    sink = RestockSink(path)
+    pw.io.subscribe(
+        build_restock_table(output_table), on_change=sink.on_change, on_time_end=sink.on_time_end, on_end=sink.on_end,
+    )
+    return sink
 
-    # Wait briefly to ensure file is flushed
-    time.sleep(2)
+# Step 4: Project, count and write the output in one pass, then snapshot it
+def run_static(reference_date=EXPIRY_REFERENCE_DATE, horizon_days=EXPIRY_HORIZON_DAYS):
+    # Verify file existence
+    if not os.path.exists(CSV_PATH):
+        logging.error(f"CSV file not found at {CSV_PATH}")
+        raise FileNotFoundError(f"CSV file not found at {CSV_PATH}")
+
+    csv_input = read_inventory_csv(CSV_PATH, "static")
 
-    # Post-process to create clean JSONL
-    desired_fields = ["Item_ID", "Name", "Expiration_Date", "Warehouse_Location", "Expiring_Soon"]
     try:
-        with open(TEMP_OUTPUT_PATH, "r", encoding="utf-8") as temp_f, open(OUTPUT_PATH, "w", encoding="utf-8") as out_f:
-            for line in temp_f:
-                try:
-                    data = json.loads(line.strip())
-                    cleaned_data = {k: data[k] for k in desired_fields if k in data}
-                    json.dump(cleaned_data, out_f)
-                    out_f.write("\n")
-                except json.JSONDecodeError as e:
-                    logging.warning(f"Failed to parse temp JSON line: {line.strip()}. Error: {str(e)}")
+        output_table = build_output_table(csv_input, reference_date, horizon_days)
+        sink = JsonlOutputSink(OUTPUT_PATH)
+        pw.io.subscribe(output_table, on_change=sink.on_change, on_end=sink.on_end)
+        subscribe_restock(output_table, RESTOCK_PATH)
+        logging.info("Running Pathway pipeline")
+        pw.run()
+        snapshot_path = jsonl_to_snapshot(OUTPUT_PATH)
+        logging.info(f"Wrote columnar snapshot to {snapshot_path}")
+    except Exception as e:
+        logging.error(f"Failed to write output: {str(e)}")
+        raise
+
+# A streaming sink saves the index and output.jsonl at most this often, unless this many
+# index changes are waiting. Other processes see a change up to the interval late; each save
+# rewrites the whole store, so a shorter interval costs more I/O under a steady stream.
+SAVE_INTERVAL_SECONDS = float(os.getenv("INGEST_SAVE_INTERVAL_SECONDS", "2"))
+SAVE_MAX_PENDING = 5000
+
+class VectorIndexSink:
+    """
+    Pathway subscriber that folds row-level diffs straight into the FAISS index and keeps
+    output.jsonl and its Arrow snapshot in step with it.
+    Diffs are buffered per Item_ID and applied once per Pathway commit, so an update
+    (retraction + insertion) costs a single re-embed, and rows whose rendered document
+    hash matches the manifest are not re-embedded at all. Saving is O(N) however small the
+    commit, so the index, manifest and output are written together at most once every
+    `save_interval` seconds (sooner once `max_pending` index changes are waiting); a timer
+    writes the last commits of a burst, and on_end writes whatever is left.
+    """
+
+    def __init__(self, index_path=VECTOR_INDEX_PATH, output_path=OUTPUT_PATH,
+                 save_interval=SAVE_INTERVAL_SECONDS, max_pending=SAVE_MAX_PENDING):
+        self.index_path = index_path
+        self.output_path = output_path
+        self.save_interval = save_interval
+        self.max_pending = max_pending
+        self.embeddings = get_embeddings()
+        self.hashes = {item_id: entry["hash"] for item_id, entry in load_manifest(index_path).items()}
+        self.vectorstore = None
+        if self.hashes and store_exists(index_path):
+            self.vectorstore = load_store(index_path, self.embeddings, lazy=False)
+        else:
+            self.hashes = {}
+        # Item_ID -> {pathway row key: row}; the same product may arrive from several files
+        self.live_rows = defaultdict(dict)
+        self.touched = set()
+        # Index changes and output changes not yet written
+        self.pending = 0
+        self.output_dirty = False
+        self.last_save = time.monotonic()
+        self.timer = None
+        # The timer saves from its own thread; the engine's callbacks and the save take turns
+        self.lock = threading.RLock()
+
+    def on_change(self, key, row, time, is_addition):
+        item_id = row["Item_ID"]
+        with self.lock:
+            if is_addition:
+                self.live_rows[item_id][key] = row
+            else:
+                self.live_rows[item_id].pop(key, None)
+            self.touched.add(item_id)
+
+    def on_time_end(self, time):
+        with self.lock:
+            if not self.touched:
+                return
+            self.apply(time)
+            self.schedule_save()
+
+    def apply(self, time):
+        upserts, existing, deletes = [], [], []
+        for item_id in self.touched:
+            rows = self.live_rows.get(item_id)
+            if rows:
+                rec = dict(next(reversed(rows.values())))
+                doc = Document(page_content=render_document(rec), metadata=rec)
+                doc_hash = document_hash(doc)
+                if self.hashes.get(item_id) == doc_hash:
                     continue
-        logging.info(f"Cleaned and wrote final output to {OUTPUT_PATH}")
-    except FileNotFoundError:
-        logging.warning(f"Temporary file {TEMP_OUTPUT_PATH} not found. Falling back to direct write.")
-        pw.io.jsonlines.write(output_table, OUTPUT_PATH)
-        logging.info(f"Fell back to direct write to {OUTPUT_PATH}")
-        pw.run()  # Run again for fallback
-        logging.info("Pipeline execution completed for fallback output")
-except Exception as e:
-    logging.error(f"Failed to write output: {str(e)}")
-    raise
+                if item_id in self.hashes:
+                    existing.append(item_id)
+                upserts.append(doc)
+                self.hashes[item_id] = doc_hash
+            else:
+                self.live_rows.pop(item_id, None)
+                if self.hashes.pop(item_id, None) is not None:
+                    deletes.append(item_id)
+        self.touched.clear()
+        self.output_dirty = True
+
+        if not upserts and not deletes:
+            return
+        if self.vectorstore is None:
+            if not upserts:
+                return
+            self.vectorstore = FAISS.from_documents(
+                upserts, self.embeddings, ids=[doc.metadata["Item_ID"] for doc in upserts]
+            )
+        else:
+            apply_changes(self.vectorstore, upserts, deletes, existing=existing)
+        self.pending += len(upserts) + len(deletes)
+        logging.info(
+            f"Index updated at time {time}: {len(upserts) - len(existing)} added, "
+            f"{len(existing)} updated, {len(deletes)} deleted"
+        )
+
+    def schedule_save(self):
+        wait = self.save_interval - (time.monotonic() - self.last_save)
+        if wait <= 0 or self.pending >= self.max_pending:
+            self.save()
+        elif self.timer is None:
+            self.timer = threading.Timer(wait, self.save)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def save(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if self.pending and self.vectorstore is not None:
+                save_vectorstore(self.vectorstore, self.index_path)
+                save_manifest(self.vectorstore, self.hashes, self.index_path)
+                logging.info(f"Saved index with {len(self.hashes)} documents ({self.pending} changes)")
+            if self.output_dirty:
+                count = write_output((next(reversed(rows.values())) for rows in self.live_rows.values()), self.output_path)
+                logging.info(f"Wrote {count} rows to {self.output_path} and its snapshot")
+            self.pending = 0
+            self.output_dirty = False
+            self.last_save = time.monotonic()
+
+    def on_end(self):
+        with self.lock:
+            if self.touched:
+                self.apply("end")
+            self.save()
+
+def run_streaming(reference_date=EXPIRY_REFERENCE_DATE, horizon_days=EXPIRY_HORIZON_DAYS,
+                  save_interval=SAVE_INTERVAL_SECONDS):
+    """
+    Watch UPLOADS_DIR and push inserts, updates and retractions into the vector index,
+    output.jsonl (with its snapshot) and the restock view as they arrive.
+    """
+    csv_input = read_inventory_csv(UPLOADS_DIR, "streaming")
+    output_table = build_output_table(csv_input, reference_date, horizon_days)
+    sink = VectorIndexSink(VECTOR_INDEX_PATH, OUTPUT_PATH, save_interval=save_interval)
+    pw.io.subscribe(output_table, on_change=sink.on_change, on_time_end=sink.on_time_end, on_end=sink.on_end)
+    subscribe_restock(output_table, RESTOCK_PATH)
+    logging.info(f"Streaming {UPLOADS_DIR} into {VECTOR_INDEX_PATH}")
+    pw.run()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest inventory CSVs with Pathway.")
+    parser.add_argument("--stream", action="store_true",
+                        help=f"Watch {UPLOADS_DIR} and keep the vector index, output.jsonl and restock view updated continuously.")
+    parser.add_argument("--reference-date", default=EXPIRY_REFERENCE_DATE,
+                        help="Date (YYYY-MM-DD, default today) that Expiring_Soon is measured from.")
+    parser.add_argument("--horizon-days", type=int, default=EXPIRY_HORIZON_DAYS,
+                        help="Items expiring within this many days of the reference date are flagged.")
+    parser.add_argument("--save-interval", type=float, default=SAVE_INTERVAL_SECONDS,
+                        help="With --stream, seconds between saves of the index and output.jsonl "
+                             "(how stale other processes may see them; lower means more rewrites).")
+    args = parser.parse_args()
 
+    if args.stream:
+        run_streaming(args.reference_date, args.horizon_days, args.save_interval)
+    else:
+        run_static(args.reference_date, args.horizon_days)
@@ -1,17 +1,17 @@
 # ✅ main.py (Updated for Docker Public Deployment with Theme Toggle)
 
 import streamlit as st
-from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.llms import Ollama
-from langchain.prompts import PromptTemplate
-from langchain.chains import RetrievalQA
-from datetime import datetime, timedelta
-from collections import defaultdict
-import json
-import requests
+import httpx
 import time
 
+from alerts.dispatcher import VoiceAlertDispatcher, call_payload
+from alerts.expiry_index import ExpiryIndex, group_expiries_by_month
+from ingestion.columnar_store import load_table, snapshot_version
+from ingestion.inventory_schema import placement_label
+from qa.client import QAClient
+from qa.snapshot_manager import SnapshotManager
+from telemetry.metrics import span
+
 # --- PAGE CONFIG ---
 st.set_page_config(
     page_title="Inventory Spotter AI",
@@ -246,29 +246,47 @@ with st.expander("💡 Example questions you can try", expanded=True):
     <div class="example-card">Where is Basmati Rice stored?</div>
     """, unsafe_allow_html=True)
 
-# --- LOAD CHAIN ---
+# --- QA SERVICE ---
+# Embedder, FAISS store, answer cache and Ollama pool live in the shared QA service (qa/service.py)
+DATA_PATH = "data/processed/output.jsonl"
+
 @st.cache_resource
-def load_chain():
-    embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-    vectorstore = FAISS.load_local("vectorstore/faiss_index", embeddings, allow_dangerous_deserialization=True)
-    retriever = vectorstore.as_retriever(search_kwargs={"k": 5})
-    prompt = PromptTemplate(
-        input_variables=["context", "question"],
-        template="""
-You are an inventory assistant AI. Use the context to answer the user query. If the answer is not in the context, say you don't know.
+def load_qa_client():
+    return QAClient()
 
-Context: {context}
-Question: {question}
-Answer:"""
-    )
-    qa_chain = RetrievalQA.from_chain_type(
-        llm=Ollama(model="phi3", base_url="http://host.containers.internal:11434"),
-        chain_type="stuff",
-        retriever=retriever,
-        return_source_documents=True,
-        chain_type_kwargs={"prompt": prompt}
-    )
-    return qa_chain
+@st.cache_resource
+def load_snapshots():
+    # Shared by every session: the expiry index is rebuilt in the background when
+    # output.jsonl/.arrow change on disk, and swapped in atomically
+    manager = SnapshotManager()
+    manager.register("expiry", lambda: snapshot_version(DATA_PATH), lambda: ExpiryIndex(load_table(DATA_PATH)))
+    return manager.start()
+
+def stream_answer(events, state, timings, started, sources_box):
+    """
+    Yield answer tokens from the QA service's event stream, showing sources as soon as they
+    arrive and recording retrieval time and time-to-first-token.
+    """
+    for event in events:
+        if event["event"] == "sources":
+            timings["retrieval"] = time.perf_counter() - started
+            state["route"] = event["route"]
+            with sources_box:
+                show_sources(event["sources"])
+        elif event["event"] == "token":
+            if "ttft" not in timings:
+                timings["ttft"] = time.perf_counter() - started
+            yield event["text"]
+        elif event["event"] == "done":
+            state.update(event)
+        elif event["event"] == "error":
+            raise RuntimeError(event["error"])
+
+def show_sources(sources):
+    st.markdown("### 📚 Source Documents")
+    for i, source in enumerate(sources, start=1):
+        with st.expander(f"📄 Snippet {i}"):
+            st.code(source["page_content"], language="text")
 
 # --- QUESTION FORM ---
 st.markdown("<hr/>", unsafe_allow_html=True)
@@ -282,16 +300,31 @@ with st.form("query_form", clear_on_submit=False):
 
 # --- ANSWER SECTION ---
 if submitted and query:
-    with st.spinner("🤖 Thinking..."):
-        qa_chain = load_chain()
-        time.sleep(0.5)
-        result = qa_chain.invoke(query)
+    if "query_timings" not in st.session_state:
+        st.session_state.query_timings = []
+    started = time.perf_counter()
+    timings = {"query": query}
     st.markdown("### ✅ Answer:")
-    st.success(result['result'])
-    st.markdown("### 📚 Source Documents")
-    for i, doc in enumerate(result["source_documents"], start=1):
-        with st.expander(f"📄 Snippet {i}"):
-            st.code(doc.page_content, language="text")
+    answer_box = st.container()
+    sources_box = st.container()
+    state = {}
+    # Routing (exact lookups), the answer cache and generation all happen in the QA service
+    try:
+        with answer_box:
+            st.write_stream(stream_answer(load_qa_client().stream(query), state, timings, started, sources_box))
+        if state.get("route") == "cache":
+            answer_box.caption(f"⚡ Served from answer cache (similarity {state.get('similarity', 0):.2f})")
+        elif state.get("route") not in (None, "rag"):
+            answer_box.caption("⚡ Answered directly from the inventory index")
+    except httpx.HTTPError as e:
+        answer_box.error(f"❌ QA service unavailable at {load_qa_client().base_url}: {e}")
+    except RuntimeError as e:
+        answer_box.error(f"❌ {e}")
+    timings["total"] = time.perf_counter() - started
+    st.session_state.query_timings.append(timings)
+    answer_box.caption(
+        f"⏱️ First token {timings.get('ttft', timings['total']):.2f}s · Total {timings['total']:.2f}s"
+    )
 
 # ================================
 # 📞 PHONE CALL FEATURE SECTION
@@ -301,36 +334,12 @@ st.markdown("### 📞 Trigger Inventory Voice Alert")
 
 OMNI_API_KEY = "#####################################"
 AGENT_ID = 2428
-DATA_PATH = "data/processed/output.jsonl"
-
-def load_inventory():
-    try:
-        with open(DATA_PATH, "r", encoding="utf-8") as f:
-            return [json.loads(line) for line in f]
-    except Exception as e:
-        st.error(f"Failed to load inventory: {e}")
-        return []
-
-def is_valid_date(date_str):
-    try:
-        datetime.strptime(date_str, "%m/%d/%Y")
-        return True
-    except:
-        return False
 
-def group_expiries_by_month(inventory):
-    now = datetime.now()
-    next_month = now + timedelta(days=32)
-    expiry_map = defaultdict(list)
-    for item in inventory:
-        date_str = item.get("Expiration_Date", "")
-        if not is_valid_date(date_str):
-            continue
-        date = datetime.strptime(date_str, "%m/%d/%Y")
-        if now <= date <= next_month:
-            key = date.strftime("%B %Y")
-            expiry_map[key].append(item)
-    return expiry_map
+def load_expiry_index():
+    expiry_index = load_snapshots().get("expiry")
+    if expiry_index is None:
+        st.error(f"Failed to load inventory: {load_snapshots().status()['expiry']['error']}")
+    return expiry_index
 
 def generate_alert_text(monthly_expiries):
     if not monthly_expiries:
@@ -340,47 +349,43 @@ def generate_alert_text(monthly_expiries):
         parts.append(f"\nIn {month}, these items are expiring:")
         for itm in items[:10]:
             parts.append(
-                f"- {itm['Name']} (ID: {itm['Item_ID']}), Aisle {itm.get('Aisle','?')} Shelf {itm.get('Shelf','?')}, Qty: {itm.get('Stock_Quantity','?')}"
+                f"- {itm['Name']} (ID: {itm['Item_ID']}), {placement_label(itm)}, Qty: {itm['Stock_Quantity']}"
             )
         if len(items) > 10:
             parts.append(f"...and {len(items) - 10} more items.")
     parts.append("Please review your inventory dashboard. Goodbye.")
     return " ".join(parts)
 
-def send_voice_alert(agent_id, phone_number, message):
-    url = "https://backend.omnidim.io/api/v1/calls/dispatch"
-    headers = {
-        "Authorization": f"Bearer {OMNI_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "agent_id": agent_id,
-        "to_number": phone_number,
-        "call_context": {
-            "message": message
-        }
-    }
-    response = requests.post(url, json=payload, headers=headers)
-    return response.status_code, response.text
+@st.cache_resource
+def load_dispatcher():
+    # One pooled, rate-limited dispatcher shared by all sessions; calls run off the Streamlit thread
+    return VoiceAlertDispatcher(OMNI_API_KEY)
 
 with st.form("call_form"):
     phone = st.text_input("📱 Enter phone number with country code", value="+91", key="phone_input")
     call_submit = st.form_submit_button("🚀 Call Now")
 
 if call_submit:
-    with st.spinner("⏳ Preparing and sending your voice alert..."):
-        inventory = load_inventory()
-        if inventory:
-            expiries = group_expiries_by_month(inventory)
-            message = generate_alert_text(expiries)
-            status, response = send_voice_alert(AGENT_ID, phone, message)
-            if status == 200:
-                st.success(f"✅ Voice call sent to {phone}")
-            else:
-                st.error(f"❌ Failed to send call: {response}")
+    with st.spinner("⏳ Preparing your voice alert..."):
+        expiry_index = load_expiry_index()
+        if expiry_index:
+            with span("alerts", "group_expiries"):
+                expiries = group_expiries_by_month(expiry_index)
+            with span("alerts", "render_message"):
+                message = generate_alert_text(expiries)
+            load_dispatcher().submit([call_payload(AGENT_ID, phone, message)])
+            st.info(f"📨 Voice call to {phone} queued. Delivery status appears below.")
         else:
             st.error("❌ No inventory data found.")
 
+recent_alerts = load_dispatcher().outbox.recent(5)
+if recent_alerts:
+    with st.expander("📬 Recent voice alerts"):
+        for alert in recent_alerts:
+            icon = {"sent": "✅", "failed": "❌"}.get(alert["status"], "⏳")
+            detail = alert.get("error") or f"attempts: {alert.get('attempts', 0)}"
+            st.markdown(f"{icon} {alert['payload'].get('to_number', '?')} — {alert['status']} ({detail})")
+
 # --- SIDEBAR INFO ---
 with st.sidebar:
     st.markdown("---")
@@ -396,6 +401,32 @@ with st.sidebar:
     - **Dark/Light Themes** 🌓
     """)
 
+    try:
+        service_stats = load_qa_client().stats()
+    except httpx.HTTPError:
+        service_stats = None
+    st.markdown("### ⚡ QA Service")
+    if service_stats is None:
+        st.markdown("- unavailable")
+    else:
+        cache_metrics = service_stats["answer_cache"]
+        st.markdown(
+            f"- answer cache hit rate {cache_metrics['hit_rate']:.0%} ({cache_metrics['hits']}/{cache_metrics['lookups']})\n"
+            f"- LLM time saved {cache_metrics['saved_llm_seconds']:.1f}s\n"
+            f"- {service_stats['coalesced']} of {service_stats['requests']} requests coalesced"
+        )
+        stage_means = service_stats.get("stage_mean_ms", {})
+        if stage_means:
+            st.markdown("Mean stage latency: " + " · ".join(
+                f"{stage} {stage_means[stage]:.0f} ms"
+                for stage in ("route", "embed", "retrieval", "prompt", "llm_ttft", "llm") if stage in stage_means
+            ))
+
+    if st.session_state.get("query_timings"):
+        st.markdown("### ⏱️ Recent Query Latency")
+        for t in reversed(st.session_state.query_timings[-5:]):
+            st.markdown(f"- first token {t.get('ttft', t['total']):.2f}s · total {t['total']:.2f}s")
+
 # --- FOOTER ---
 st.markdown("<hr/>", unsafe_allow_html=True)
 st.markdown("""
@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from vectorstore.embed_and_store import VECTOR_INDEX_PATH, index_version
+
+DEFAULT_THRESHOLD = 0.92
+DEFAULT_TTL_SECONDS = 15 * 60
+DEFAULT_MAX_ENTRIES = 512
+
+class SemanticAnswerCache:
+    """
+    Process-wide cache of RetrievalQA answers, matched on cosine similarity of the query embedding.
+
+    Entries expire after `ttl_seconds` and the least recently used entry is dropped beyond
+    `max_entries`. `version_fn` reports the version of the retriever answers are produced with
+    (by default the saved FAISS index at `index_path`); the whole cache is cleared as soon as it
+    changes, and an answer produced by another version is not stored, so answers computed against
+    an older index (and older stock numbers) are never served.
+    Each entry also carries the question's structured constraints (query_router.question_constraints):
+    a cached answer is only returned for a question naming the same aisle, month, Item_ID, product, ...
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES, index_path: str = VECTOR_INDEX_PATH, version_fn=None):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.index_path = index_path
+        self.version_fn = version_fn or (lambda: index_version(index_path))
+        self.version = self.version_fn()
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.next_id = 0
+        self.lookups = 0
+        self.hits = 0
+        self.saved_llm_seconds = 0.0
+        self.invalidations = 0
+        self.rejected = 0
+
+    def _check_version(self):
+        version = self.version_fn()
+        if version != self.version:
+            self.entries.clear()
+            self.version = version
+            self.invalidations += 1
+
+    def _expire(self, now: float):
+        stale = [key for key, entry in self.entries.items() if now - entry["created"] > self.ttl_seconds]
+        for key in stale:
+            del self.entries[key]
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(self, query_vector, constraints: tuple = ()):
+        """
+        Return the cached result dict for the most similar earlier query with the same
+        `constraints` above the threshold, or None.
+        """
+        now = time.time()
+        with self.lock:
+            self.lookups += 1
+            self._check_version()
+            self._expire(now)
+            keys = [key for key, entry in self.entries.items() if entry["constraints"] == constraints]
+            if not keys:
+                return None
+            matrix = np.stack([self.entries[key]["vector"] for key in keys])
+            scores = matrix @ self._normalize(query_vector)
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            entry = self.entries[keys[best]]
+            self.entries.move_to_end(keys[best])
+            self.hits += 1
+            self.saved_llm_seconds += entry["llm_seconds"]
+            return dict(entry["result"], cached=True, similarity=float(scores[best]))
+
+    def put(self, query_vector, result: dict, llm_seconds: float, constraints: tuple = (), version=None) -> bool:
+        """
+        Cache a result dict ("result", "source_documents", ...) and the LLM time it cost to produce.
+        `version` is the retriever version that produced it; the answer is dropped (False is
+        returned) when that is no longer the current version.
+        """
+        with self.lock:
+            self._check_version()
+            if version is not None and version != self.version:
+                self.rejected += 1
+                return False
+            self.entries[self.next_id] = {
+                "vector": self._normalize(query_vector),
+                "constraints": constraints,
+                "result": result,
+                "llm_seconds": llm_seconds,
+                "created": time.time(),
+            }
+            self.next_id += 1
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            return True
+
+    def metrics(self) -> dict:
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+                "saved_llm_seconds": self.saved_llm_seconds,
+                "invalidations": self.invalidations,
+                "rejected": self.rejected,
+            }
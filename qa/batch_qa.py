@@ -0,0 +1,160 @@
+"""
+Batch QA: answer a whole file of questions (e.g. a shift's standard checklist) in one run.
+
+Questions answerable from the structured index are routed first. The rest are embedded in
+one batch, retrieved with a single FAISS matrix search, checked against the answer cache,
+and sent to Ollama concurrently. Answers and per-question timings are written to JSONL as
+they complete.
+
+Run from the repo root:
+    python -m qa.batch_qa checklist.txt --out data/qa/answers.jsonl --parallel 4
+For real concurrency, start Ollama with OLLAMA_NUM_PARALLEL >= --parallel.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from qa.context_builder import build_prompt
+from qa.query_router import question_constraints, route_query
+from qa.rag_qa import answer_cache, embeddings, inventory_index, llm, retriever
+from telemetry.metrics import QA_REQUESTS, span
+
+DEFAULT_OUTPUT_PATH = "data/qa/answers.jsonl"
+DEFAULT_PARALLELISM = 4
+
+def load_questions(path: str) -> list[str]:
+    """
+    Questions from a text file (one per line, '#' comments allowed) or JSONL with a "question" field.
+    """
+    questions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            questions.append(json.loads(line)["question"] if line.startswith("{") else line)
+    return questions
+
+def _source_ids(docs) -> list:
+    return [doc.metadata.get("Item_ID") for doc in docs]
+
+def _generate(question: str, docs) -> str:
+    with span("qa_batch", "llm"):
+        return llm.invoke(build_prompt(question, docs))
+
+def run_batch(questions: list[str], output_path: str = DEFAULT_OUTPUT_PATH,
+              parallelism: int = DEFAULT_PARALLELISM, on_result=None) -> dict:
+    """
+    Answer `questions` and append one JSON line per question to `output_path` as each completes.
+    Lines carry the question's position as "index", since LLM answers finish out of order.
+    Returns a summary of counts and wall time.
+    """
+    started = time.perf_counter()
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    write_lock = threading.Lock()
+    counts = {"routed": 0, "cached": 0, "llm": 0, "failed": 0}
+
+    with open(output_path, "w", encoding="utf-8") as out:
+        def emit(index, question, route, answer, docs, timings, error=None):
+            entry = {
+                "index": index,
+                "question": question,
+                "answer": answer,
+                "route": route,
+                "sources": _source_ids(docs),
+                "timings": {k: round(v, 4) for k, v in timings.items()},
+            }
+            if error:
+                entry["error"] = error
+            QA_REQUESTS.inc(route="failed" if error else {"cached": "cache", "llm": "rag"}.get(route, route))
+            with write_lock:
+                counts["failed" if error else route] += 1
+                out.write(json.dumps(entry) + "\n")
+                out.flush()
+            if on_result:
+                on_result(entry)
+
+        # 1. Exact lookups straight from the structured index
+        pending = []
+        for i, question in enumerate(questions):
+            t0 = time.perf_counter()
+            result = route_query(question, inventory_index)
+            if result is not None:
+                emit(i, question, "routed", result["result"], result["source_documents"],
+                     {"total_s": time.perf_counter() - t0})
+            else:
+                pending.append(i)
+        if not pending:
+            return dict(counts, questions=len(questions), seconds=time.perf_counter() - started)
+
+        # 2. One embedding batch and one retrieval pass for everything left
+        t0 = time.perf_counter()
+        texts = [questions[i] for i in pending]
+        with span("qa_batch", "embed"):
+            vectors = embeddings.embed_documents(texts)
+        embed_seconds = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        with span("qa_batch", "retrieval"):
+            contexts = retriever.batch_retrieve(texts, vectors)
+        retrieval_seconds = time.perf_counter() - t0
+        shared = {
+            "embed_s": embed_seconds / len(pending),
+            "retrieval_s": retrieval_seconds / len(pending),
+        }
+
+        # 3. Cached answers, then concurrent LLM calls for the rest
+        jobs = []
+        for i, vector, docs in zip(pending, vectors, contexts):
+            cached = answer_cache.get(vector, question_constraints(questions[i], inventory_index))
+            if cached is not None:
+                emit(i, questions[i], "cached", cached["result"], cached["source_documents"], dict(shared))
+            else:
+                jobs.append((i, vector, docs))
+
+        def ask(job):
+            i, vector, docs = job
+            t0 = time.perf_counter()
+            answer = _generate(questions[i], docs)
+            llm_seconds = time.perf_counter() - t0
+            answer_cache.put(
+                vector, {"query": questions[i], "result": answer, "source_documents": docs}, llm_seconds,
+                constraints=question_constraints(questions[i], inventory_index),
+            )
+            return answer, llm_seconds
+
+        queued = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, parallelism), thread_name_prefix="batch-qa") as pool:
+            futures = {pool.submit(ask, job): job for job in jobs}
+            for future in as_completed(futures):
+                i, _, docs = futures[future]
+                timings = dict(shared, total_s=time.perf_counter() - queued)
+                try:
+                    answer, llm_seconds = future.result()
+                except Exception as e:
+                    emit(i, questions[i], "llm", None, docs, timings, error=f"{type(e).__name__}: {e}")
+                    continue
+                timings["llm_s"] = llm_seconds
+                emit(i, questions[i], "llm", answer, docs, timings)
+
+    return dict(counts, questions=len(questions), seconds=time.perf_counter() - started)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer a file of inventory questions in one batch.")
+    parser.add_argument("questions", help="Text file (one question per line) or JSONL with a 'question' field")
+    parser.add_argument("--out", default=DEFAULT_OUTPUT_PATH, help="JSONL file for answers and timings")
+    parser.add_argument("--parallel", type=int, default=DEFAULT_PARALLELISM, help="Concurrent Ollama requests")
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    print(f"📋 {len(questions)} questions from {args.questions}, up to {args.parallel} LLM calls in parallel")
+    summary = run_batch(
+        questions, args.out, args.parallel,
+        on_result=lambda e: print(f"  {'❌' if e.get('error') else '✅'} [{e['index']}] {e['route']}: {e['question']}"),
+    )
+    print(
+        f"✅ Done in {summary['seconds']:.1f}s: {summary['routed']} routed, {summary['cached']} cached, "
+        f"{summary['llm']} answered by the LLM, {summary['failed']} failed. Results in {args.out}"
+    )
@@ -0,0 +1,54 @@
+import json
+import os
+
+import httpx
+
+QA_SERVICE_URL = os.getenv("QA_SERVICE_URL", "http://localhost:8000")
+
+class QAClient:
+    """
+    Thin synchronous client for the QA service (qa/service.py), with one pooled HTTP connection.
+    """
+
+    def __init__(self, base_url: str = QA_SERVICE_URL, timeout: float = 300.0):
+        self.base_url = base_url
+        self.http = httpx.Client(base_url=base_url, timeout=httpx.Timeout(timeout, connect=5.0))
+
+    def ask(self, question: str) -> dict:
+        response = self.http.post("/ask", json={"question": question})
+        response.raise_for_status()
+        return response.json()
+
+    def ask_batch(self, questions: list[str]) -> list[dict]:
+        response = self.http.post("/ask/batch", json={"questions": questions})
+        response.raise_for_status()
+        return response.json()
+
+    def stream(self, question: str):
+        """
+        Yield the service's events for `question`: sources, then tokens, then done (or error).
+        """
+        with self.http.stream("POST", "/ask/stream", json={"question": question}) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
+
+    def stats(self) -> dict:
+        response = self.http.get("/stats")
+        response.raise_for_status()
+        return response.json()
+
+    def close(self):
+        self.http.close()
+
+_default_client = None
+
+def ask(question: str) -> str:
+    """
+    Answer text for `question` from the QA service at QA_SERVICE_URL.
+    """
+    global _default_client
+    if _default_client is None:
+        _default_client = QAClient()
+    return _default_client.ask(question)["result"]
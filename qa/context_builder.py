@@ -0,0 +1,109 @@
+import math
+import os
+
+# Fixed instruction prefix. It is byte-identical on every request and comes first, so Ollama
+# can reuse its KV cache for these tokens and only prefill the table and question.
+SYSTEM_PREFIX = """You are an inventory assistant. Answer only from the inventory table; if the answer is not there, say you don't know.
+Qty = units in stock, Price = unit price in USD, Expires = expiration date (M/D/YYYY), Soon = flagged as expiring soon.
+"""
+PROMPT_TEMPLATE = SYSTEM_PREFIX + """
+Inventory:
+{context}
+
+Question: {question}
+Answer:"""
+
+# (record field, table header), in display order
+COLUMNS = (
+    ("Name", "Product"),
+    ("Item_ID", "ID"),
+    ("Warehouse_Location", "Location"),
+    ("Aisle", "Aisle"),
+    ("Shelf", "Shelf"),
+    ("Stock_Quantity", "Qty"),
+    ("Unit_Price", "Price"),
+    ("Expiration_Date", "Expires"),
+    ("Expiring_Soon", "Soon"),
+)
+EMPTY_VALUES = (None, "", "N/A", "n/a", "None")
+DEFAULT_TOKEN_BUDGET = int(os.getenv("QA_CONTEXT_TOKENS", "600"))
+# phi3's tokenizer averages ~3.5 characters per token on this kind of text; estimates stay conservative
+CHARS_PER_TOKEN = 3.5
+KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def _record(doc) -> dict:
+    """
+    The inventory record behind a retrieved document: its metadata, or the "Label: value"
+    lines of the rendered text for documents saved without metadata.
+    """
+    if doc.metadata:
+        return doc.metadata
+    labels = {"Product": "Name", "Location": "Warehouse_Location", "Expiration": "Expiration_Date",
+              "Expiring Soon": "Expiring_Soon", "Stock Quantity": "Stock_Quantity", "Aisle": "Aisle", "Shelf": "Shelf",
+              "Unit Price": "Unit_Price"}
+    rec = {}
+    for line in doc.page_content.splitlines():
+        label, _, value = line.partition(":")
+        if label.strip() in labels:
+            value = value.strip()
+            if label.strip() == "Expiring Soon":
+                value = value == "True"
+            elif label.strip() == "Unit Price":
+                value = value.lstrip("$")
+            rec[labels[label.strip()]] = value
+    return rec
+
+def _cell(field: str, value) -> str:
+    if field == "Expiring_Soon":
+        return "yes" if value is True or value == "True" else ""
+    # `is False` so that a quantity of 0 is kept (0 == False)
+    if value is False or (not isinstance(value, (int, float)) and value in EMPTY_VALUES):
+        return ""
+    if field == "Unit_Price" and isinstance(value, float):
+        return f"{value:.2f}"
+    return str(value).replace("|", "/")
+
+def build_context(docs, token_budget: int = DEFAULT_TOKEN_BUDGET) -> tuple[str, dict]:
+    """
+    Render retrieved documents as one compact pipe table, in retrieval order.
+
+    Records that differ only in Item_ID / quantity (same product, place, date) are merged
+    into one row with their IDs joined and quantities summed; columns that are empty for every
+    row are dropped; rows are added until `token_budget` (estimated) would be exceeded.
+    Returns the table and stats: docs in, rows kept, rows merged, rows cut by the budget, tokens.
+    """
+    rows = {}
+    for doc in docs:
+        rec = _record(doc)
+        cells = {field: _cell(field, rec.get(field)) for field, _ in COLUMNS}
+        key = tuple(cells[f] for f, _ in COLUMNS if f not in ("Item_ID", "Stock_Quantity"))
+        if key in rows:
+            row = rows[key]
+            row["Item_ID"] = "/".join(p for p in (row["Item_ID"], cells["Item_ID"]) if p)
+            if row["Stock_Quantity"].isdigit() and cells["Stock_Quantity"].isdigit():
+                row["Stock_Quantity"] = str(int(row["Stock_Quantity"]) + int(cells["Stock_Quantity"]))
+        else:
+            rows[key] = cells
+    merged = len(docs) - len(rows)
+
+    columns = [(f, h) for f, h in COLUMNS if any(row[f] for row in rows.values())]
+    lines = ["|".join(h for _, h in columns)]
+    tokens = estimate_tokens(lines[0]) + 1
+    cut = 0
+    for row in rows.values():
+        line = "|".join(row[f] for f, _ in columns)
+        cost = estimate_tokens(line) + 1
+        if tokens + cost > token_budget and len(lines) > 1:
+            cut += 1
+            continue
+        lines.append(line)
+        tokens += cost
+    context = "\n".join(lines) if len(lines) > 1 else ""
+    return context, {"docs": len(docs), "rows": len(lines) - 1, "merged": merged, "cut": cut, "tokens": tokens}
+
+def build_prompt(question: str, docs, token_budget: int = DEFAULT_TOKEN_BUDGET) -> str:
+    context, _ = build_context(docs, token_budget)
+    return PROMPT_TEMPLATE.format(context=context or "(no matching items)", question=question)
@@ -0,0 +1,272 @@
+import math
+import re
+from collections import Counter, defaultdict
+from collections.abc import Sequence
+from typing import Any
+
+import faiss
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.retrievers import BaseRetriever
+
+from langchain.docstore.document import Document
+from qa.metadata_filter import (
+    MetadataFilterIndex,
+    filtered_search_by_vector,
+    filtered_search_with_score_by_vector,
+    filtered_similarity_search,
+)
+from vectorstore.index_store import LazyDocstore
+
+DEFAULT_K = 4
+DEFAULT_FETCH_K = 20
+RRF_K = 60
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+ITEM_ID_RE = re.compile(r"\b\d{2}-\d{3}-\d{4}\b")
+AISLE_RE = re.compile(r"\baisle\s*:?\s*([a-z])\b")
+SHELF_RE = re.compile(r"\bshelf\s*:?\s*(\d+)\b")
+WORD_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    "a", "an", "and", "any", "are", "at", "do", "does", "for", "from", "have", "how", "in", "is", "it",
+    "item", "items", "many", "much", "of", "on", "or", "the", "there", "to", "we", "what", "when",
+    "where", "which", "who", "with",
+}
+# Fields of an inventory record that are searched lexically
+INDEXED_FIELDS = ("Name", "Item_ID", "Warehouse_Location", "Aisle", "Shelf")
+
+def _stem(word: str) -> str:
+    return word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+
+def tokenize(text: str) -> list[str]:
+    """
+    Lexical tokens of a query or record: whole Item_IDs, "aisle:x" / "shelf:n" field tokens
+    (so a lone "a" never matches Aisle A), and lowercase stemmed words without stopwords.
+    """
+    text = str(text).lower()
+    tokens = ITEM_ID_RE.findall(text)
+    tokens += [f"aisle:{m}" for m in AISLE_RE.findall(text)]
+    tokens += [f"shelf:{m}" for m in SHELF_RE.findall(text)]
+    text = SHELF_RE.sub(" ", AISLE_RE.sub(" ", ITEM_ID_RE.sub(" ", text)))
+    tokens += [_stem(w) for w in WORD_RE.findall(text) if w not in STOPWORDS]
+    return tokens
+
+def field_tokens(name, item_id, location, aisle, shelf) -> list[str]:
+    """
+    Lexical tokens of one record from its INDEXED_FIELDS values.
+    """
+    tokens = tokenize(f"{name or ''} {item_id or ''} {location or ''}")
+    if aisle not in (None, ""):
+        tokens.append(f"aisle:{str(aisle).lower()}")
+    if shelf not in (None, ""):
+        tokens.append(f"shelf:{shelf}")
+    return tokens
+
+def record_tokens(doc: Document) -> list[str]:
+    meta = doc.metadata or {}
+    if not any(field in meta for field in INDEXED_FIELDS):
+        return tokenize(doc.page_content)
+    return field_tokens(*(meta.get(field) for field in INDEXED_FIELDS))
+
+def column_tokens(table) -> list[list[str]] | None:
+    """
+    Lexical tokens of every row of a store's metadata table (vectorstore/index_store.py), read
+    column-wise; None when the table holds none of INDEXED_FIELDS.
+    """
+    if not any(field in table.column_names for field in INDEXED_FIELDS):
+        return None
+    columns = [
+        table[field].to_pylist() if field in table.column_names else [None] * table.num_rows
+        for field in INDEXED_FIELDS
+    ]
+    return [field_tokens(*values) for values in zip(*columns)]
+
+def lexical_stats(token_lists) -> dict:
+    """
+    The corpus statistics BM25 weights depend on: document count, average document length and
+    each token's document frequency. Shards built from one corpus share them, so their scores
+    stay comparable when merged.
+    """
+    df = Counter()
+    documents = total = 0
+    for tokens in token_lists:
+        documents += 1
+        total += len(tokens)
+        df.update(set(tokens))
+    return {"documents": documents, "avg_length": total / documents if documents else 0.0, "df": dict(df)}
+
+class BM25Index:
+    """
+    In-memory inverted index with Okapi BM25 scoring over the Name, Item_ID, location,
+    aisle and shelf of each inventory document. Per-posting BM25 weights are precomputed,
+    so a query is a handful of vectorised adds over the posting lists of its tokens.
+    `documents` may be a lazy sequence (a DocumentFile); only the returned hits are then kept
+    hydrated. `tokens` (one token list per document) skips reading the documents to index them.
+    `stats` (see lexical_stats) replaces this index's own IDF and average length with those of
+    a larger corpus it is part of.
+    """
+
+    def __init__(self, documents: Sequence[Document], k1: float = BM25_K1, b: float = BM25_B,
+                 tokens: Sequence[list[str]] | None = None, stats: dict | None = None):
+        self.documents = documents if isinstance(documents, Sequence) else list(documents)
+        if tokens is None:
+            tokens = (record_tokens(doc) for doc in self.documents)
+        postings = defaultdict(list)
+        lengths = np.zeros(len(self.documents), dtype=np.float32)
+        for i, tokens in enumerate(tokens):
+            lengths[i] = len(tokens)
+            for token, tf in Counter(tokens).items():
+                postings[token].append((i, tf))
+        if stats is None:
+            n = len(self.documents)
+            avg_length = float(lengths.mean()) if n else 0.0
+        else:
+            n, avg_length = stats["documents"], stats["avg_length"]
+        self.postings = {}
+        for token, entries in postings.items():
+            rows = np.array([row for row, _ in entries], dtype=np.int64)
+            tf = np.array([tf for _, tf in entries], dtype=np.float32)
+            df = stats["df"].get(token, len(rows)) if stats is not None else len(rows)
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            norm = k1 * (1 - b + b * lengths[rows] / (avg_length or 1.0))
+            self.postings[token] = (rows, (idf * tf * (k1 + 1) / (tf + norm)).astype(np.float32))
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore, stats: dict | None = None) -> "BM25Index":
+        """
+        Index the documents held in a FAISS vectorstore's docstore, in index order. A saved store
+        is indexed from its metadata columns, so no document is decoded.
+        """
+        if isinstance(vectorstore.docstore, LazyDocstore):
+            documents = vectorstore.docstore.documents
+            table = documents.metadata()
+            return cls(documents, tokens=column_tokens(table) if table is not None else None, stats=stats)
+        mapping = vectorstore.index_to_docstore_id
+        return cls([vectorstore.docstore.search(mapping[row]) for row in range(len(mapping))], stats=stats)
+
+    def __len__(self):
+        return len(self.documents)
+
+    def search(self, query: str, k: int = DEFAULT_FETCH_K, mask=None) -> list[tuple[Document, float]]:
+        """
+        Top-k (document, score) pairs for `query`; documents matching no query token are never returned.
+        `mask` optionally restricts the search to the rows set in a boolean bitmap.
+        """
+        scores = np.zeros(len(self.documents), dtype=np.float32)
+        for token in set(tokenize(query)):
+            posting = self.postings.get(token)
+            if posting is not None:
+                scores[posting[0]] += posting[1]
+        if mask is not None:
+            scores[~mask] = 0
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(self.documents[i], float(scores[i])) for i in matched]
+
+def _doc_key(doc: Document):
+    return (doc.metadata or {}).get("Item_ID") or doc.page_content
+
+def reciprocal_rank_fusion(rankings: list[list[Document]], k: int = DEFAULT_K, rrf_k: int = RRF_K) -> list[Document]:
+    """
+    Fuse several ranked document lists: each document scores sum(1 / (rrf_k + rank)) over the lists it appears in.
+    """
+    scores = defaultdict(float)
+    docs = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            key = _doc_key(doc)
+            scores[key] += 1.0 / (rrf_k + rank)
+            docs.setdefault(key, doc)
+    best = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [docs[key] for key in best]
+
+def similarity_search_batch(vectorstore, vectors, k: int) -> list[list[Document]]:
+    """
+    Top-k documents for many query vectors with a single FAISS matrix search.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if vectorstore._normalize_L2:
+        faiss.normalize_L2(vectors)
+    _, rows = vectorstore.index.search(vectors, k)
+    return [
+        [vectorstore.docstore.search(vectorstore.index_to_docstore_id[row]) for row in hits if row >= 0]
+        for hits in rows
+    ]
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retriever that fuses FAISS similarity results with BM25 lexical results by reciprocal rank.
+    Exact product names, Item_IDs and aisle/shelf references are caught by BM25 even when the
+    MiniLM neighbours miss them, so a smaller `k` (and prompt) is enough for the chain.
+    With `filters`, aisle/shelf/location/expiry constraints in the question restrict both
+    searches to the matching rows before ranking.
+    """
+
+    vectorstore: Any
+    lexical: Any
+    filters: Any = None
+    k: int = DEFAULT_K
+    fetch_k: int = DEFAULT_FETCH_K
+    rrf_k: int = RRF_K
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list[Document]:
+        mask = self.filters.mask_for(query) if self.filters is not None else None
+        if mask is None:
+            dense = self.vectorstore.similarity_search(query, k=self.fetch_k)
+        elif not mask.any():
+            # Nothing satisfies the constraints; better no context than unrelated rows
+            return []
+        else:
+            dense = filtered_similarity_search(self.vectorstore, query, self.fetch_k, mask)
+        lexical = [doc for doc, _ in self.lexical.search(query, self.fetch_k, mask=mask)]
+        return reciprocal_rank_fusion([lexical, dense], k=self.k, rrf_k=self.rrf_k)
+
+    def batch_retrieve(self, queries: list[str], vectors) -> list[list[Document]]:
+        """
+        Retrieve for many queries at once from their precomputed embeddings. Unconstrained
+        queries share one FAISS matrix search; pre-filtered ones are searched individually.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        masks = [self.filters.mask_for(q) if self.filters is not None else None for q in queries]
+        dense = [None] * len(queries)
+        plain = [i for i, mask in enumerate(masks) if mask is None]
+        if plain:
+            for i, docs in zip(plain, similarity_search_batch(self.vectorstore, vectors[plain], self.fetch_k)):
+                dense[i] = docs
+        results = []
+        for i, (query, mask) in enumerate(zip(queries, masks)):
+            if mask is not None:
+                if not mask.any():
+                    results.append([])
+                    continue
+                dense[i] = filtered_search_by_vector(self.vectorstore, vectors[i], self.fetch_k, mask)
+            lexical = [doc for doc, _ in self.lexical.search(query, self.fetch_k, mask=mask)]
+            results.append(reciprocal_rank_fusion([lexical, dense[i]], k=self.k, rrf_k=self.rrf_k))
+        return results
+
+    def scored_candidates(self, query: str, vector) -> tuple[list, list]:
+        """
+        The unfused candidates for one query: (document, FAISS distance) and (document, BM25 score)
+        lists of up to fetch_k each, after pre-filtering. Used to merge results across shards.
+        """
+        mask = self.filters.mask_for(query) if self.filters is not None else None
+        if mask is None:
+            dense = self.vectorstore.similarity_search_with_score_by_vector(vector, k=self.fetch_k)
+        elif not mask.any():
+            return [], []
+        else:
+            dense = filtered_search_with_score_by_vector(self.vectorstore, vector, self.fetch_k, mask)
+        return dense, self.lexical.search(query, self.fetch_k, mask=mask)
+
+def build_hybrid_retriever(vectorstore, k: int = DEFAULT_K, fetch_k: int = DEFAULT_FETCH_K,
+                           prefilter: bool = True, lexical_stats: dict | None = None) -> HybridRetriever:
+    return HybridRetriever(
+        vectorstore=vectorstore,
+        lexical=BM25Index.from_vectorstore(vectorstore, lexical_stats),
+        filters=MetadataFilterIndex.from_vectorstore(vectorstore) if prefilter else None,
+        k=k,
+        fetch_k=fetch_k,
+    )
@@ -0,0 +1,121 @@
+from datetime import datetime
+
+import faiss
+import numpy as np
+
+from qa.query_router import AISLE_RE, EXPIRY_RE, SHELF_RE, InventoryIndex, expiry_window
+from vectorstore.index_store import LazyDocstore
+
+# Record fields the constraints are resolved against
+FILTER_FIELDS = ("Name", "Item_ID", "Warehouse_Location", "Aisle", "Shelf", "Expiration_Date", "Expiring_Soon")
+
+class MetadataFilterIndex:
+    """
+    Structured pre-filter for vector search, built from the record metadata stored in the
+    FAISS docstore, with row i of every structure being row i of the FAISS index.
+
+    Aisle and shelf constraints are precomputed boolean bitmaps; warehouse locations and expiry
+    windows (a month, the next N days, ...) resolve to row-ID sets through an InventoryIndex over
+    the same records. `mask_for(question)` ANDs whatever constraints the question mentions.
+    """
+
+    def __init__(self, records: list[dict]):
+        self.index = InventoryIndex(records)
+        self.size = len(records)
+        self.aisle_bitmaps = {key: self._bitmap(rows) for key, rows in self.index.by_aisle.items()}
+        self.shelf_bitmaps = {key: self._bitmap(rows) for key, rows in self.index.by_shelf.items()}
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore) -> "MetadataFilterIndex":
+        """
+        Build from a saved store's metadata columns (no documents decoded), else from the docstore.
+        """
+        docstore = vectorstore.docstore
+        table = docstore.documents.metadata() if isinstance(docstore, LazyDocstore) else None
+        if table is not None:
+            fields = [field for field in FILTER_FIELDS if field in table.column_names]
+            if fields:
+                return cls(table.select(fields).to_pylist())
+            return cls([{} for _ in range(table.num_rows)])
+        ids = [vectorstore.index_to_docstore_id[row] for row in range(len(vectorstore.index_to_docstore_id))]
+        return cls([dict(docstore.search(doc_id).metadata or {}) for doc_id in ids])
+
+    def _bitmap(self, rows) -> np.ndarray:
+        bitmap = np.zeros(self.size, dtype=bool)
+        bitmap[np.asarray(rows, dtype=np.int64)] = True
+        return bitmap
+
+    def constraints(self, question: str, now: datetime | None = None) -> dict:
+        """
+        Structured constraints found in the question, each mapped to its bitmap of matching rows.
+        """
+        now = now or datetime.now()
+        q = question.lower()
+        found = {}
+        aisle = AISLE_RE.search(q)
+        if aisle:
+            found[f"aisle {aisle.group(1).upper()}"] = self.aisle_bitmaps.get(aisle.group(1), self._bitmap([]))
+        shelf = SHELF_RE.search(q)
+        if shelf:
+            found[f"shelf {shelf.group(1)}"] = self.shelf_bitmaps.get(shelf.group(1), self._bitmap([]))
+        location_rows = self.index.find_location_rows(question)
+        if location_rows:
+            found[self.index.records[location_rows[0]].get("Warehouse_Location")] = self._bitmap(location_rows)
+        if EXPIRY_RE.search(q):
+            window = expiry_window(self.index, q, now)
+            if window is not None:
+                found[window[1]] = self._bitmap(window[0])
+        return found
+
+    def mask_for(self, question: str, now: datetime | None = None):
+        """
+        Bitmap of the rows satisfying every constraint in the question, or None if it has none.
+        """
+        mask = None
+        for bitmap in self.constraints(question, now).values():
+            mask = bitmap if mask is None else mask & bitmap
+        return mask
+
+def search_parameters(index, mask: np.ndarray):
+    """
+    FAISS search parameters restricting a search to the rows set in `mask`, keeping the
+    index's own nprobe / efSearch. Returns (params, keepalive): FAISS only holds pointers to the
+    selector and its packed bitmap, so `keepalive` must outlive the search.
+    """
+    bits = np.packbits(mask, bitorder="little")
+    selector = faiss.IDSelectorBitmap(len(bits), faiss.swig_ptr(bits))
+    keepalive = (selector, bits)
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=index.nprobe), keepalive
+    if isinstance(index, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=index.hnsw.efSearch), keepalive
+    return faiss.SearchParameters(sel=selector), keepalive
+
+def filtered_similarity_search(vectorstore, query: str, k: int, mask: np.ndarray) -> list:
+    """
+    similarity_search over only the rows set in `mask`, filtered inside FAISS before ranking.
+    """
+    if not mask.any():
+        return []
+    return filtered_search_by_vector(vectorstore, vectorstore._embed_query(query), k, mask)
+
+def filtered_search_by_vector(vectorstore, vector, k: int, mask: np.ndarray) -> list:
+    return [doc for doc, _ in filtered_search_with_score_by_vector(vectorstore, vector, k, mask)]
+
+def filtered_search_with_score_by_vector(vectorstore, vector, k: int, mask: np.ndarray) -> list:
+    """
+    (document, FAISS distance) pairs for the top-k rows set in `mask`.
+    """
+    candidates = int(mask.sum())
+    if candidates == 0:
+        return []
+    vector = np.asarray([vector], dtype=np.float32)
+    if vectorstore._normalize_L2:
+        faiss.normalize_L2(vector)
+    params, keepalive = search_parameters(vectorstore.index, mask)
+    distances, rows = vectorstore.index.search(vector, min(k, candidates), params=params)
+    return [
+        (vectorstore.docstore.search(vectorstore.index_to_docstore_id[row]), float(distance))
+        for row, distance in zip(rows[0], distances[0]) if row >= 0
+    ]
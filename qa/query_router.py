@@ -0,0 +1,353 @@
+import re
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from langchain.docstore.document import Document
+
+from ingestion.columnar_store import load_records
+from ingestion.inventory_schema import EXPIRY_HORIZON_DAYS, placement_label
+from vectorstore.embed_and_store import render_document
+
+DATA_PATH = "data/processed/output.jsonl"
+DATE_FORMAT = "%m/%d/%Y"
+MAX_LISTED = 25
+
+MONTHS = {
+    name.lower(): i
+    for i, names in enumerate(
+        [("January", "Jan"), ("February", "Feb"), ("March", "Mar"), ("April", "Apr"), ("May",), ("June", "Jun"),
+         ("July", "Jul"), ("August", "Aug"), ("September", "Sep", "Sept"), ("October", "Oct"),
+         ("November", "Nov"), ("December", "Dec")],
+        start=1,
+    )
+    for name in names
+}
+
+RESTOCK_RE = re.compile(
+    r"\b(re-?order\w*|restock\w*|replenish\w*|low (?:on )?stock|running (?:low|out)|run out|out of stock|"
+    r"days of (?:cover|stock|supply))\b"
+)
+PRICE_RE = re.compile(r"\b(price[sd]?|costs?|how much (?:is|are|does|do))\b")
+STOCK_RE = re.compile(r"\b(stock|quantity|qty|how many|how much|units|left)\b")
+WHERE_RE = re.compile(r"\b(where|located|location|stored|aisle|shelf|find)\b")
+EXPIRY_RE = re.compile(r"\b(expir\w*|best before|use by)\b")
+ITEM_ID_RE = re.compile(r"\b\d{2}-\d{3}-\d{4}\b")
+AISLE_RE = re.compile(r"\baisle\s+([a-z])\b")
+SHELF_RE = re.compile(r"\bshelf\s+(\d+)\b")
+DAYS_RE = re.compile(r"\b(?:next|within|in)\s+(\d+)\s+days?\b")
+MONTH_RE = re.compile(r"\b(" + "|".join(sorted(MONTHS, key=len, reverse=True)) + r")\b(?:\s+(\d{4}))?")
+# "may" is only the month after one of these words or before a year ("which items may expire" is not May)
+MAY_PREFIX_RE = re.compile(r"\b(?:in|by|during|for|of|before|until|till|through|from|since|after|early|mid|late)\s+$")
+SOON_RE = re.compile(r"\b(soon|about to expire|imminent)\b")
+
+def _normalize(text: str) -> str:
+    return re.sub(r"[^a-z0-9\- ]+", " ", text.lower())
+
+def _parse_date(date_str):
+    try:
+        return datetime.strptime(date_str, DATE_FORMAT)
+    except (TypeError, ValueError):
+        return None
+
+class InventoryIndex:
+    """
+    In-memory columnar view of output.jsonl with lookup indexes by name, Item_ID,
+    warehouse location, aisle, shelf and expiration date, plus the numeric stock and
+    price columns, used to answer exact lookups without going through retrieval and the LLM.
+    """
+
+    def __init__(self, records: list[dict]):
+        self.records = records
+        self.names = [r.get("Name", "") for r in records]
+        self.locations = [r.get("Warehouse_Location", "") for r in records]
+        self.stock = [r.get("Stock_Quantity") for r in records]
+        self.prices = [r.get("Unit_Price") for r in records]
+        self.by_name = defaultdict(list)
+        self.by_item_id = defaultdict(list)
+        self.by_location = defaultdict(list)
+        self.by_aisle = defaultdict(list)
+        self.by_shelf = defaultdict(list)
+        self.by_month = defaultdict(list)
+        dated = []
+        for row, rec in enumerate(records):
+            self.by_name[_normalize(rec.get("Name", "")).strip()].append(row)
+            self.by_item_id[rec.get("Item_ID")].append(row)
+            self.by_location[_normalize(rec.get("Warehouse_Location", "")).strip()].append(row)
+            self.by_aisle[str(rec.get("Aisle", "")).lower()].append(row)
+            self.by_shelf[str(rec.get("Shelf", ""))].append(row)
+            date = _parse_date(rec.get("Expiration_Date"))
+            if date is not None:
+                dated.append((date.toordinal(), row))
+                self.by_month[(date.year, date.month)].append(row)
+        dated.sort()
+        self.expiry_ordinals = [d for d, _ in dated]
+        self.expiry_rows = [r for _, r in dated]
+        self.max_phrase_words = max(
+            (len(key.split()) for key in list(self.by_name) + list(self.by_location)), default=1
+        )
+
+    @classmethod
+    def load(cls, path: str = DATA_PATH) -> "InventoryIndex":
+        return cls(load_records(path))
+
+    def _match_phrase(self, words: list[str], lookup: dict):
+        for n in range(min(self.max_phrase_words, len(words)), 0, -1):
+            for i in range(len(words) - n + 1):
+                phrase = " ".join(words[i:i + n])
+                for candidate in (phrase, phrase[:-1] if phrase.endswith("s") else None):
+                    if candidate and candidate in lookup:
+                        return lookup[candidate]
+        return None
+
+    def find_product_rows(self, question: str):
+        """
+        Rows of the product named in the question (by Item_ID or longest matching name), or None.
+        """
+        item_ids = ITEM_ID_RE.findall(question)
+        if item_ids:
+            return [row for item_id in item_ids for row in self.by_item_id.get(item_id, [])] or None
+        return self._match_phrase(_normalize(question).split(), self.by_name)
+
+    def find_location_rows(self, question: str):
+        return self._match_phrase(_normalize(question).split(), self.by_location)
+
+    def rows_expiring_between(self, start: datetime, end: datetime) -> list[int]:
+        lo = bisect_left(self.expiry_ordinals, start.toordinal())
+        hi = bisect_right(self.expiry_ordinals, end.toordinal())
+        return self.expiry_rows[lo:hi]
+
+def _source_documents(index: InventoryIndex, rows: list[int]) -> list[Document]:
+    return [
+        Document(page_content=render_document(index.records[row]), metadata=index.records[row])
+        for row in rows[:MAX_LISTED]
+    ]
+
+def _placement(rec: dict) -> str:
+    return f"{rec['Warehouse_Location']} ({placement_label(rec)})"
+
+def _listing(index: InventoryIndex, rows: list[int], line) -> list[str]:
+    lines = [f"- {line(index.records[row])}" for row in rows[:MAX_LISTED]]
+    if len(rows) > MAX_LISTED:
+        lines.append(f"...and {len(rows) - MAX_LISTED} more.")
+    return lines
+
+def _answer_stock(index, rows):
+    name = index.records[rows[0]].get("Name")
+    quantities = [index.stock[row] for row in rows if isinstance(index.stock[row], (int, float))]
+    if len(rows) == 1:
+        return f"{name} has {index.stock[rows[0]]} units in stock at {_placement(index.records[rows[0]])}."
+    lines = [f"{name} has {sum(quantities)} units in stock across {len(rows)} locations:"]
+    lines += _listing(index, rows, lambda r: f"{_placement(r)}: {r['Stock_Quantity']} units")
+    return "\n".join(lines)
+
+def _answer_price(index, rows):
+    """
+    Unit price from the numeric Unit_Price column, or None when no row has one
+    (inventory ingested before prices were carried).
+    """
+    priced = [row for row in rows if isinstance(index.prices[row], (int, float))]
+    if not priced:
+        return None
+    name = index.records[priced[0]]["Name"]
+    if len(priced) == 1:
+        return f"{name} costs ${index.prices[priced[0]]:.2f} per unit at {_placement(index.records[priced[0]])}."
+    prices = [index.prices[row] for row in priced]
+    lines = [f"{name} costs ${min(prices):.2f} to ${max(prices):.2f} per unit across {len(priced)} locations:"]
+    lines += _listing(index, priced, lambda r: f"{_placement(r)}: ${r['Unit_Price']:.2f}")
+    return "\n".join(lines)
+
+def _restock_line(rec: dict) -> str:
+    cover = "no recent sales" if rec["Days_Of_Cover"] is None else f"~{rec['Days_Of_Cover']:g} days of cover"
+    return (f"{rec['Name']} (ID: {rec['Item_ID']}) at {_placement(rec)}: {rec['Stock_Quantity']} units, "
+            f"reorder level {rec['Reorder_Level']}, {cover}, reorder {rec['Reorder_Quantity']}")
+
+def _restock_listing(recs: list[dict]) -> list[str]:
+    lines = [f"- {_restock_line(rec)}" for rec in recs[:MAX_LISTED]]
+    if len(recs) > MAX_LISTED:
+        lines.append(f"...and {len(recs) - MAX_LISTED} more.")
+    return lines
+
+def _answer_product_restock(restock, name):
+    summary, flagged = restock.for_product(name)
+    if summary is None:
+        return None, []
+    cover = "it has no recent sales" if summary["Days_Of_Cover"] is None else f"about {summary['Days_Of_Cover']:g} days of cover"
+    lines = [f"{summary['Name']} has {summary['Stock_Quantity']} units across {summary['Locations']} locations, {cover}."]
+    if not flagged:
+        lines.append("No location is at or below its reorder level or about to run out.")
+    else:
+        lines.append(f"{len(flagged)} locations need restocking:")
+        lines += _restock_listing(flagged)
+    return "\n".join(lines), flagged
+
+def _answer_restock_list(restock, aisle=None):
+    flagged = restock.locations
+    where = ""
+    if aisle:
+        flagged = [rec for rec in flagged if str(rec["Aisle"]).lower() == aisle]
+        where = f" in Aisle {aisle.upper()}"
+    if not flagged:
+        return f"No items{where} need restocking.", flagged
+    below = sum(1 for rec in flagged if rec["Below_Reorder"])
+    lines = [f"{len(flagged)} items{where} need restocking ({below} at or below their reorder level), most urgent first:"]
+    lines += _restock_listing(flagged)
+    return "\n".join(lines), flagged
+
+def _answer_location(index, rows):
+    name = index.records[rows[0]].get("Name")
+    if len(rows) == 1:
+        return f"{name} is stored at {_placement(index.records[rows[0]])}."
+    lines = [f"{name} is stored in {len(rows)} places:"]
+    lines += _listing(index, rows, _placement)
+    return "\n".join(lines)
+
+def _answer_product_expiry(index, rows):
+    name = index.records[rows[0]].get("Name")
+    lines = [f"{name} expiration dates:"]
+    lines += _listing(index, rows, lambda r: f"{r['Expiration_Date']} at {_placement(r)}")
+    return "\n".join(lines)
+
+def _answer_item_list(index, rows, description):
+    if not rows:
+        return f"No items are {description}."
+    lines = [f"{len(rows)} items are {description}:"]
+    lines += _listing(
+        index, rows,
+        lambda r: f"{r['Name']} (ID: {r['Item_ID']}), {_placement(r)}, "
+                  f"expires {r['Expiration_Date']}, Qty: {r['Stock_Quantity']}",
+    )
+    return "\n".join(lines)
+
+def find_month(question: str):
+    """
+    The MONTH_RE match naming a month in a lowercased question, or None. A bare "may" counts
+    only after a preposition ("in may") or before a year ("may 2025").
+    """
+    for match in MONTH_RE.finditer(question):
+        if match.group(1) != "may" or match.group(2) or MAY_PREFIX_RE.search(question, 0, match.start()):
+            return match
+    return None
+
+def expiry_window(index: InventoryIndex, question: str, now: datetime):
+    """
+    Resolve an expiry-window question to (rows, description), or None if no window is recognised.
+    """
+    days = DAYS_RE.search(question)
+    if days:
+        n = int(days.group(1))
+        return index.rows_expiring_between(now, now + timedelta(days=n)), f"expiring in the next {n} days"
+    if re.search(r"\b(this|next)\s+week\b", question):
+        return index.rows_expiring_between(now, now + timedelta(days=7)), "expiring in the next 7 days"
+    if re.search(r"\b(this|next)\s+month\b", question):
+        return index.rows_expiring_between(now, now + timedelta(days=30)), "expiring in the next 30 days"
+    month = find_month(question)
+    if month:
+        # A month without a year means that month of the reference date's year
+        year = int(month.group(2)) if month.group(2) else now.year
+        rows = index.by_month.get((year, MONTHS[month.group(1)]), [])
+        rows = sorted(rows, key=lambda r: _parse_date(index.records[r]["Expiration_Date"]))
+        return rows, f"expiring in {month.group(1).capitalize()} {year}"
+    if SOON_RE.search(question):
+        # Measured from `now`, not the Expiring_Soon flag, which is as old as the last ingest
+        end = now + timedelta(days=EXPIRY_HORIZON_DAYS)
+        return index.rows_expiring_between(now, end), f"expiring in the next {EXPIRY_HORIZON_DAYS} days"
+    return None
+
+def question_constraints(question: str, index: InventoryIndex | None = None) -> tuple:
+    """
+    The structured constraints a question names (Item_IDs, aisle, shelf, expiry month or window,
+    and with `index` the product and location it matches) as a hashable key. Questions with
+    different keys need different answers, however close their embeddings are.
+    """
+    q = question.lower()
+    found = [("item_id", tuple(sorted(set(ITEM_ID_RE.findall(q)))))]
+    aisle = AISLE_RE.search(q)
+    shelf = SHELF_RE.search(q)
+    month = find_month(q)
+    days = DAYS_RE.search(q)
+    relative = re.search(r"\b(?:this|next)\s+(week|month)\b", q)
+    found += [
+        ("aisle", aisle.group(1) if aisle else None),
+        ("shelf", shelf.group(1) if shelf else None),
+        ("month", (month.group(1), month.group(2)) if month else None),
+        ("days", int(days.group(1)) if days else relative.group(1) if relative else None),
+        ("soon", bool(SOON_RE.search(q))),
+    ]
+    if index is not None:
+        product_rows = index.find_product_rows(question) or []
+        location_rows = index.find_location_rows(question) or []
+        found += [
+            ("product", tuple(sorted({index.records[row].get("Name", "") for row in product_rows}))),
+            ("location", index.records[location_rows[0]].get("Warehouse_Location") if location_rows else None),
+        ]
+    return tuple((name, value) for name, value in found if value)
+
+def _item_rows(index: InventoryIndex, recs: list[dict]) -> list[int]:
+    return [row for rec in recs for row in index.by_item_id.get(rec["Item_ID"], [])]
+
+def route_query(question: str, index: InventoryIndex, now: datetime | None = None, restock=None):
+    """
+    Answer stock, price, location, aisle/shelf and expiry-window questions straight from the index,
+    and restock / low-stock questions from `restock` (alerts/restock_index.py) when it is given.
+    Returns a result dict shaped like the RetrievalQA output ("query", "result", "source_documents")
+    plus the matched "route", or None when the question should fall through to RAG.
+    """
+    now = now or datetime.now()
+    q = question.lower()
+    product_rows = index.find_product_rows(question)
+
+    if product_rows:
+        price = _answer_price(index, product_rows) if PRICE_RE.search(q) else None
+        restocked = (
+            _answer_product_restock(restock, index.records[product_rows[0]]["Name"])
+            if restock is not None and RESTOCK_RE.search(q) else (None, [])
+        )
+        if restocked[0] is not None:
+            route, text = "restock", restocked[0]
+            product_rows = _item_rows(index, restocked[1]) or product_rows
+        elif price is not None:
+            route, text = "price", price
+        elif STOCK_RE.search(q):
+            route, text = "stock", _answer_stock(index, product_rows)
+        elif EXPIRY_RE.search(q):
+            route, text = "expiry", _answer_product_expiry(index, product_rows)
+        elif WHERE_RE.search(q):
+            route, text = "location", _answer_location(index, product_rows)
+        else:
+            return None
+        rows = product_rows
+    else:
+        aisle = AISLE_RE.search(q)
+        shelf = SHELF_RE.search(q)
+        window = expiry_window(index, q, now) if EXPIRY_RE.search(q) else None
+        location_rows = index.find_location_rows(question)
+        if restock is not None and RESTOCK_RE.search(q):
+            text, flagged = _answer_restock_list(restock, aisle.group(1) if aisle else None)
+            route, rows = "restock", _item_rows(index, flagged)
+        elif aisle or shelf:
+            rows = index.by_aisle.get(aisle.group(1), []) if aisle else list(range(len(index.records)))
+            if shelf:
+                shelf_rows = set(index.by_shelf.get(shelf.group(1), []))
+                rows = [r for r in rows if r in shelf_rows]
+            where = " ".join(p for p in (
+                f"Aisle {aisle.group(1).upper()}" if aisle else "",
+                f"Shelf {shelf.group(1)}" if shelf else "",
+            ) if p)
+            route, text = "aisle", _answer_item_list(index, rows, f"located in {where}")
+        elif window is not None:
+            rows, description = window
+            route, text = "expiry", _answer_item_list(index, rows, description)
+        elif location_rows:
+            rows = location_rows
+            location = index.records[rows[0]].get("Warehouse_Location")
+            route, text = "location", _answer_item_list(index, rows, f"stored at {location}")
+        else:
+            return None
+
+    return {
+        "query": question,
+        "result": text,
+        "source_documents": _source_documents(index, rows),
+        "route": route,
+    }
@@ -1,46 +1,107 @@
-from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.llms import Ollama
-from langchain.prompts import PromptTemplate
-from langchain.chains import RetrievalQA
+import os
+import time
 import warnings
 
+from alerts.restock_index import get_restock_index
+from qa.answer_cache import SemanticAnswerCache
+from qa.context_builder import KEEP_ALIVE, build_prompt, estimate_tokens
+from qa.hybrid_retriever import build_hybrid_retriever
+from qa.query_router import InventoryIndex, question_constraints, route_query
+from qa.shard_router import load_sharded_retriever
+from telemetry.metrics import ANSWER_CACHE, QA_REQUESTS, RETRIEVED_DOCS, Trace
+from vectorstore.ann_index import tune_from_env
+from vectorstore.embed_and_store import index_version
+from vectorstore.embedding_cache import get_embeddings
+from vectorstore.index_store import load_store
+from vectorstore.sharded_index import shard_versions
+
 # Suppress known LangChain warnings for cleaner output
 warnings.filterwarnings("ignore", category=UserWarning)
 
-# Load the FAISS vectorstore with HuggingFace embeddings
+# Sharded index per warehouse location (vectorstore/sharded_index.py), if FAISS_SHARDS_PATH is set
+SHARDS_PATH = os.getenv("FAISS_SHARDS_PATH")
+
 print("📦 Loading vectorstore...")
-vectorstore = FAISS.load_local(
-    "vectorstore/faiss_index",
-    embeddings=HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2"),
-    allow_dangerous_deserialization=True
-)
-
-# Create retriever with top 5 results per query
-retriever = vectorstore.as_retriever(search_kwargs={"k": 5})
-
-# Define the prompt template for the QA chain
-template = """
-You are an inventory assistant AI. Use the context to answer the user query.
-If the answer is not in the context, say you don't know.
-
-Context:
-{context}
-
-Question: {question}
-Answer:
-"""
-
-prompt = PromptTemplate(input_variables=["context", "question"], template=template)
-
-# Initialize the RetrievalQA chain with Ollama LLM
-qa_chain = RetrievalQA.from_chain_type(
-    llm=Ollama(model="phi3"),  # Change model here if needed
-    chain_type="stuff",
-    retriever=retriever,
-    return_source_documents=True,
-    chain_type_kwargs={"prompt": prompt}
-)
+embeddings = get_embeddings()
+# The retriever is loaded once; answers are cached against the index version it was loaded from
+RETRIEVER_VERSION = shard_versions(SHARDS_PATH) if SHARDS_PATH else index_version("vectorstore/faiss_index")
+if SHARDS_PATH:
+    # Location questions search one shard; everything else fans out over all shards
+    retriever = load_sharded_retriever(SHARDS_PATH, embeddings)
+else:
+    # Load the FAISS vectorstore (memory-mapped, documents read per hit) with the cached HuggingFace embeddings
+    vectorstore = load_store("vectorstore/faiss_index", embeddings)
+    # IVF nprobe / HNSW efSearch overrides (FAISS_NPROBE, FAISS_EF_SEARCH)
+    tune_from_env(vectorstore.index)
+
+    # Hybrid retriever: BM25 over names/IDs/locations fused with FAISS similarity, top 4 results per query
+    retriever = build_hybrid_retriever(vectorstore)
+
+# Ollama LLM; keep_alive keeps the model and the KV cache of the fixed prompt prefix warm between questions
+llm = Ollama(model="phi3", keep_alive=KEEP_ALIVE)  # Change model here if needed
+
+def rag_answer(query, query_vector=None, trace=None):
+    """
+    Retrieve context for `query` and answer it with the LLM over a compact, token-budgeted
+    table of the hits (qa/context_builder.py) instead of the full documents.
+    """
+    trace = trace or Trace("qa", question=query)
+    if query_vector is None:
+        with trace.span("embed"):
+            query_vector = embeddings.embed_query(query)
+    with trace.span("retrieval"):
+        docs = retriever.batch_retrieve([query], [query_vector])[0]
+    RETRIEVED_DOCS.observe(len(docs))
+    with trace.span("prompt"):
+        prompt = build_prompt(query, docs)
+    with trace.span("llm"):
+        result = llm.invoke(prompt)
+    trace.set(documents=len(docs), prompt_chars=len(prompt), prompt_tokens_est=estimate_tokens(prompt))
+    return {"query": query, "result": result, "source_documents": docs}
+
+# Structured index for exact lookups that do not need the LLM
+inventory_index = InventoryIndex.load()
+
+# Answers to semantically repeated questions asking about the same products, aisles, months, ...
+answer_cache = SemanticAnswerCache(version_fn=lambda: RETRIEVER_VERSION)
+
+def load_restock_index():
+    """
+    The restock view written by the Pathway ingestor (re-read when it changes), or None before the first run.
+    """
+    try:
+        return get_restock_index()
+    except FileNotFoundError:
+        return None
+
+def answer(query):
+    """
+    Answer a question via the structured router, the semantic answer cache, or retrieval + the LLM.
+    Stage timings go to the telemetry registry (and QA_TRACE_LOG, if set).
+    """
+    trace = Trace("qa", question=query)
+    with trace.span("route"):
+        result = route_query(query, inventory_index, restock=load_restock_index())
+    if result is not None:
+        QA_REQUESTS.inc(route="routed")
+        trace.finish(route="routed")
+        return result
+    with trace.span("embed"):
+        query_vector = embeddings.embed_query(query)
+    constraints = question_constraints(query, inventory_index)
+    with trace.span("answer_cache"):
+        result = answer_cache.get(query_vector, constraints)
+    ANSWER_CACHE.inc(outcome="miss" if result is None else "hit")
+    route = "cache"
+    if result is None:
+        started = time.perf_counter()
+        result = rag_answer(query, query_vector, trace)
+        answer_cache.put(query_vector, result, llm_seconds=time.perf_counter() - started, constraints=constraints)
+        route = "rag"
+    QA_REQUESTS.inc(route=route)
+    trace.finish(route=route)
+    return result
 
 # Interactive Q&A loop
 if __name__ == "__main__":
@@ -48,11 +109,13 @@ if __name__ == "__main__":
     while True:
         query = input("\n🔎 Ask InventoryBot: ").strip()
         if query.lower() in {"exit", "quit"}:
+            metrics = answer_cache.metrics()
+            print(f"⚡ Answer cache: {metrics['hits']}/{metrics['lookups']} hits, {metrics['saved_llm_seconds']:.1f}s of LLM time saved")
             print("👋 Exiting InventoryBot. Have a great day!")
             break
 
         try:
-            result = qa_chain(query)
+            result = answer(query)
             print("\n📤 Answer:", result["result"])
 
             print("\n📚 Source Snippets:")
@@ -0,0 +1,423 @@
+"""
+Long-running async QA service: one warm embedder, FAISS store and pooled Ollama connection
+shared by every frontend replica.
+
+    POST /ask          {"question": "..."}          -> answer, route, sources, timings
+    POST /ask/batch    {"questions": ["...", ...]}  -> list of answers, in order
+    POST /ask/stream   {"question": "..."}          -> NDJSON events: sources, token..., done | error
+    GET  /restock      ?product=&aisle=&limit=      -> locations that need restocking, most urgent first
+    GET  /stats                                      -> answer cache and coalescing counters
+    GET  /metrics                                    -> Prometheus metrics (telemetry/metrics.py)
+    GET  /health
+
+Identical questions in flight at the same time are coalesced onto one generation; streaming
+subscribers that join late replay the tokens produced so far. The inventory index and vector
+store (and the restock view written by the Pathway ingestor) are reloaded in the background
+when their files change. With FAISS_SHARDS_PATH set, the
+per-location sharded index is served instead, and only shards whose files changed are reopened.
+Every stage of a question is timed into GET /metrics; with QA_TRACE_LOG set, one JSON trace
+per question (spans, route, tokens, retrieved documents) is appended to that file.
+
+Run from the repo root:
+    uvicorn qa.service:app --host 0.0.0.0 --port 8000
+"""
+import asyncio
+import json
+import os
+import re
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+
+from alerts.restock_index import RESTOCK_PATH, RestockIndex, restock_version
+from ingestion.columnar_store import snapshot_version
+from qa.answer_cache import SemanticAnswerCache
+from qa.context_builder import KEEP_ALIVE, build_prompt
+from qa.hybrid_retriever import build_hybrid_retriever
+from qa.query_router import DATA_PATH, InventoryIndex, question_constraints, route_query
+from qa.shard_router import load_sharded_retriever
+from qa.snapshot_manager import SnapshotManager
+from telemetry.metrics import ANSWER_CACHE, LLM_TOKENS, QA_REQUESTS, REGISTRY, RETRIEVED_DOCS, STAGE_SECONDS, Trace
+from vectorstore.ann_index import tune_from_env
+from vectorstore.embed_and_store import VECTOR_INDEX_PATH, index_version
+from vectorstore.embedding_cache import get_embeddings
+from vectorstore.index_store import load_store
+from vectorstore.sharded_index import shard_versions
+
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://host.containers.internal:11434")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "phi3")
+LLM_CONCURRENCY = int(os.getenv("QA_LLM_CONCURRENCY", "4"))
+# Directory of a sharded index (vectorstore/sharded_index.py) to serve instead of the single index
+SHARDS_PATH = os.getenv("FAISS_SHARDS_PATH")
+
+def _question_key(question: str) -> str:
+    return re.sub(r"\s+", " ", question.strip().lower())
+
+def _source(doc) -> dict:
+    return {"page_content": doc.page_content, "metadata": doc.metadata}
+
+class Generation:
+    """
+    One answer being produced, shared by every request that asked the same question.
+    Tokens are kept so that subscribers joining mid-stream replay them from the start.
+    """
+
+    def __init__(self, question: str):
+        self.question = question
+        self.started = time.perf_counter()
+        self.route = None
+        self.sources = None
+        self.tokens = []
+        self.timings = {}
+        self.extra = {}
+        self.error = None
+        self.done = False
+        self.changed = asyncio.Event()
+        self.task = None
+
+    def _notify(self):
+        # Wake everyone waiting on the current event, then arm a fresh one
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    def set_sources(self, route: str, docs):
+        self.route = route
+        self.sources = [_source(doc) for doc in docs]
+        self.timings["retrieval_s"] = time.perf_counter() - self.started
+        self._notify()
+
+    def push(self, token: str):
+        if not self.tokens:
+            self.timings["ttft_s"] = time.perf_counter() - self.started
+        self.tokens.append(token)
+        self._notify()
+
+    def finish(self, error: Exception | None = None):
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        self.timings["total_s"] = time.perf_counter() - self.started
+        self.done = True
+        self._notify()
+
+    async def events(self):
+        """
+        sources / token / done (or error) events for one subscriber.
+        """
+        sent = 0
+        sources_sent = False
+        while True:
+            changed = self.changed
+            if self.sources is not None and not sources_sent:
+                sources_sent = True
+                yield {"event": "sources", "route": self.route, "sources": self.sources}
+            while sent < len(self.tokens):
+                sent += 1
+                yield {"event": "token", "text": self.tokens[sent - 1]}
+            if self.done:
+                yield {"event": "error", "error": self.error} if self.error else {"event": "done", **self.result()}
+                return
+            await changed.wait()
+
+    async def wait(self) -> dict:
+        while not self.done:
+            await self.changed.wait()
+        if self.error:
+            raise RuntimeError(self.error)
+        return self.result()
+
+    def result(self) -> dict:
+        return {
+            "query": self.question,
+            "result": "".join(self.tokens),
+            "route": self.route,
+            "sources": self.sources or [],
+            "timings": {k: round(v, 4) for k, v in self.timings.items()},
+            **self.extra,
+        }
+
+class QAService:
+    """
+    Shared QA state for the HTTP app: warm embedder, hot-reloaded inventory index and retriever,
+    semantic answer cache, pooled async Ollama client and the table of in-flight generations.
+    """
+
+    def __init__(self, data_path: str = DATA_PATH, index_path: str = VECTOR_INDEX_PATH,
+                 ollama_url: str = OLLAMA_BASE_URL, model: str = OLLAMA_MODEL,
+                 llm_concurrency: int = LLM_CONCURRENCY, shards_path: str | None = SHARDS_PATH,
+                 restock_path: str = RESTOCK_PATH):
+        self.index_path = index_path
+        self.shards_path = shards_path
+        self.ollama_url = ollama_url.rstrip("/")
+        self.model = model
+        self.llm_concurrency = llm_concurrency
+        self.embeddings = get_embeddings()
+        self.snapshots = SnapshotManager()
+        self.snapshots.register("inventory", lambda: snapshot_version(data_path), lambda: InventoryIndex.load(data_path))
+        self.snapshots.register("restock", lambda: restock_version(restock_path), lambda: RestockIndex.load(restock_path))
+        self.snapshots.register("retriever", self._retriever_version, self._build_retriever)
+        self.snapshots.start()
+        # Keyed on the retriever snapshot actually serving answers, not on the files it will be reloaded from
+        self.answer_cache = SemanticAnswerCache(index_path=index_path, version_fn=lambda: self.snapshots.generation("retriever"))
+        self.inflight = {}
+        self.counters = {"requests": 0, "coalesced": 0, "routed": 0, "cached": 0, "generated": 0, "failed": 0}
+        self.client = None
+        self.llm_slots = None
+
+    def _retriever_version(self):
+        return shard_versions(self.shards_path) if self.shards_path else index_version(self.index_path)
+
+    def _build_retriever(self):
+        if self.shards_path:
+            # Only shards whose files changed are reopened
+            return load_sharded_retriever(self.shards_path, self.embeddings, previous=self.snapshots.get("retriever"))
+        vectorstore = load_store(self.index_path, self.embeddings)
+        tune_from_env(vectorstore.index)
+        return build_hybrid_retriever(vectorstore)
+
+    async def start(self):
+        self.client = httpx.AsyncClient(
+            base_url=self.ollama_url,
+            timeout=httpx.Timeout(300.0, connect=10.0),
+            limits=httpx.Limits(max_connections=self.llm_concurrency, max_keepalive_connections=self.llm_concurrency),
+        )
+        self.llm_slots = asyncio.Semaphore(self.llm_concurrency)
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+        self.snapshots.stop()
+
+    async def _generate(self, prompt: str, usage: dict | None = None):
+        """
+        Stream response tokens for `prompt` from Ollama's /api/generate. keep_alive holds the
+        model (and the KV cache of the shared prompt prefix) in memory between requests.
+        Time spent waiting for an LLM slot, Ollama's prompt/completion token counts and its
+        prefill time are copied into `usage`.
+        """
+        queued = time.perf_counter()
+        async with self.llm_slots:
+            if usage is not None:
+                usage["queue_s"] = time.perf_counter() - queued
+            payload = {"model": self.model, "prompt": prompt, "stream": True, "keep_alive": KEEP_ALIVE}
+            async with self.client.stream("POST", "/api/generate", json=payload) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("response"):
+                        yield chunk["response"]
+                    if chunk.get("done"):
+                        if usage is not None:
+                            usage["prompt_tokens"] = chunk.get("prompt_eval_count")
+                            usage["completion_tokens"] = chunk.get("eval_count")
+                            usage["prompt_eval_s"] = (chunk.get("prompt_eval_duration") or 0) / 1e9
+                        return
+
+    def submit(self, question: str, vector=None, docs=None, retriever_version=None) -> Generation:
+        """
+        Start answering `question`, or join the generation already running for it.
+        `vector` / `docs` let batch callers pass a precomputed embedding and retrieval, made with
+        the retriever snapshot of generation `retriever_version`.
+        """
+        self.counters["requests"] += 1
+        key = _question_key(question)
+        generation = self.inflight.get(key)
+        if generation is not None:
+            self.counters["coalesced"] += 1
+            QA_REQUESTS.inc(route="coalesced")
+            return generation
+        generation = Generation(question)
+        self.inflight[key] = generation
+        generation.task = asyncio.create_task(self._run(key, generation, vector, docs, retriever_version))
+        return generation
+
+    async def _run(self, key: str, generation: Generation, vector=None, docs=None, retriever_version=None):
+        question = generation.question
+        trace = Trace("qa", question=question)
+        try:
+            inventory = self.snapshots.get("inventory")
+            with trace.span("route"):
+                routed = route_query(question, inventory, restock=self.snapshots.get("restock")) if inventory is not None else None
+            if routed is not None:
+                self.counters["routed"] += 1
+                generation.set_sources(routed["route"], routed["source_documents"])
+                generation.push(routed["result"])
+                return self._finish(generation, trace, "routed")
+
+            if vector is None:
+                with trace.span("embed"):
+                    vector = await asyncio.to_thread(self.embeddings.embed_query, question)
+            constraints = question_constraints(question, inventory)
+            with trace.span("answer_cache"):
+                cached = self.answer_cache.get(vector, constraints)
+            ANSWER_CACHE.inc(outcome="miss" if cached is None else "hit")
+            if cached is not None:
+                self.counters["cached"] += 1
+                generation.extra = {"cached": True, "similarity": cached["similarity"]}
+                generation.set_sources("cache", cached["source_documents"])
+                generation.push(cached["result"])
+                return self._finish(generation, trace, "cache", similarity=cached["similarity"])
+
+            if docs is None:
+                retriever, retriever_version = self.snapshots.get_versioned("retriever")
+                if retriever is None:
+                    raise RuntimeError("Vector index is not available yet")
+                # The query vector is reused, so this span is the FAISS + BM25 search alone
+                with trace.span("retrieval"):
+                    docs = (await asyncio.to_thread(retriever.batch_retrieve, [question], [vector]))[0]
+            RETRIEVED_DOCS.observe(len(docs))
+            generation.set_sources("rag", docs)
+            with trace.span("prompt"):
+                prompt = build_prompt(question, docs)
+            llm_started = time.perf_counter()
+            usage = {}
+            with trace.span("llm"):
+                async for token in self._generate(prompt, usage):
+                    if not generation.tokens:
+                        trace.record("llm_ttft", time.perf_counter() - llm_started, llm_started)
+                    generation.push(token)
+            llm_seconds = time.perf_counter() - llm_started
+            generation.extra = usage
+            for kind in ("prompt", "completion"):
+                if usage.get(f"{kind}_tokens") is not None:
+                    LLM_TOKENS.observe(usage[f"{kind}_tokens"], kind=kind)
+            self.answer_cache.put(
+                vector, {"query": question, "result": "".join(generation.tokens), "source_documents": docs}, llm_seconds,
+                constraints=constraints, version=retriever_version,
+            )
+            self.counters["generated"] += 1
+            self._finish(generation, trace, "rag", documents=len(docs), prompt_chars=len(prompt), **usage)
+        except Exception as e:
+            self.counters["failed"] += 1
+            generation.finish(error=e)
+            QA_REQUESTS.inc(route="failed")
+            trace.finish(route="failed", error=generation.error)
+        finally:
+            self.inflight.pop(key, None)
+
+    def _finish(self, generation: Generation, trace: Trace, route: str, **attrs):
+        generation.finish()
+        QA_REQUESTS.inc(route=route)
+        trace.finish(route=route, **attrs)
+
+    async def ask_batch(self, questions: list[str]) -> list[dict]:
+        """
+        Answer many questions at once: one embedding batch and one retrieval pass for the
+        questions the router cannot answer, then concurrent (and coalesced) generations.
+        """
+        inventory = self.snapshots.get("inventory")
+        restock = self.snapshots.get("restock")
+        open_questions = [
+            q for q in dict.fromkeys(questions)
+            if _question_key(q) not in self.inflight and (inventory is None or route_query(q, inventory, restock=restock) is None)
+        ]
+        prepared = {}
+        retriever, retriever_version = self.snapshots.get_versioned("retriever")
+        if open_questions and retriever is not None:
+            vectors = await asyncio.to_thread(self.embeddings.embed_documents, open_questions)
+            contexts = await asyncio.to_thread(retriever.batch_retrieve, open_questions, vectors)
+            prepared = {q: (v, d) for q, v, d in zip(open_questions, vectors, contexts)}
+        generations = [self.submit(q, *prepared.get(q, (None, None)), retriever_version) for q in questions]
+        results = []
+        for generation in generations:
+            try:
+                results.append(await generation.wait())
+            except RuntimeError as e:
+                results.append({"query": generation.question, "error": str(e)})
+        return results
+
+    def restock(self, product: str | None = None, aisle: str | None = None, limit: int = 50) -> dict:
+        """
+        Flagged locations from the restock view, optionally for one product or aisle, plus the
+        product summary when a product is given.
+        """
+        restock = self.snapshots.get("restock")
+        if restock is None:
+            raise RuntimeError("Restock view not loaded; run the Pathway ingestor")
+        summary = None
+        if product:
+            summary, locations = restock.for_product(product)
+        else:
+            locations = restock.locations
+        if aisle:
+            locations = [rec for rec in locations if str(rec["Aisle"]).lower() == aisle.lower()]
+        return {"product": summary, "total": len(locations), "locations": locations[:limit]}
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "in_flight": len(self.inflight),
+            "answer_cache": self.answer_cache.metrics(),
+            "stage_mean_ms": {
+                stage: round(mean * 1000, 2) for (component, stage), mean in STAGE_SECONDS.means().items() if component == "qa"
+            },
+            "snapshots": self.snapshots.status(),
+        }
+
+class AskRequest(BaseModel):
+    question: str
+
+class BatchRequest(BaseModel):
+    questions: list[str]
+
+service = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global service
+    service = QAService()
+    await service.start()
+    yield
+    await service.close()
+
+app = FastAPI(title="Inventory Spotter QA", lifespan=lifespan)
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "retriever_loaded": service.snapshots.get("retriever") is not None}
+
+@app.get("/restock")
+async def restock(product: str | None = None, aisle: str | None = None, limit: int = 50):
+    try:
+        return service.restock(product, aisle, limit)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+@app.get("/stats")
+async def stats():
+    return service.stats()
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.post("/ask")
+async def ask(request: AskRequest):
+    try:
+        return await service.submit(request.question).wait()
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+@app.post("/ask/batch")
+async def ask_batch(request: BatchRequest):
+    return await service.ask_batch(request.questions)
+
+@app.post("/ask/stream")
+async def ask_stream(request: AskRequest):
+    generation = service.submit(request.question)
+
+    async def ndjson():
+        async for event in generation.events():
+            yield json.dumps(event) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("QA_SERVICE_PORT", "8000")))
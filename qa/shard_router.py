@@ -0,0 +1,122 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.retrievers import BaseRetriever
+
+from langchain.docstore.document import Document
+from qa.hybrid_retriever import DEFAULT_FETCH_K, DEFAULT_K, RRF_K, build_hybrid_retriever, reciprocal_rank_fusion
+from qa.query_router import InventoryIndex
+from vectorstore.ann_index import tune_from_env
+from vectorstore.embed_and_store import index_version
+from vectorstore.index_store import load_store
+from vectorstore.sharded_index import SHARDS_PATH, load_shard_map
+
+SHARD_WORKERS = int(os.getenv("QA_SHARD_WORKERS", str(min(8, os.cpu_count() or 1))))
+
+def _higher_is_better(vectorstore) -> bool:
+    strategy = vectorstore.distance_strategy
+    return str(getattr(strategy, "value", strategy)) == "MAX_INNER_PRODUCT"
+
+class ShardedRetriever(BaseRetriever):
+    """
+    Hybrid retrieval over a sharded index (vectorstore/sharded_index.py).
+
+    A question naming a warehouse location is searched in that location's shard only; any
+    other question fans out to every shard in a thread pool (FAISS releases the GIL). The
+    query is embedded once, each shard returns its pre-filtered FAISS and BM25 candidates, and
+    the candidates are merged by distance / score before the usual reciprocal rank fusion.
+    Every shard's BM25 is scored with the statistics of the whole corpus (`lexical_stats`, from
+    the shard map), so its scores are those the unsharded index would give and the merged
+    top-k matches HybridRetriever over the same documents (up to the order of tied scores).
+    """
+
+    shards: dict
+    versions: dict
+    locations: Any
+    location_shards: list
+    pool: Any
+    lexical_stats: Any = None
+    k: int = DEFAULT_K
+    fetch_k: int = DEFAULT_FETCH_K
+    rrf_k: int = RRF_K
+
+    def shards_for(self, query: str) -> list[str]:
+        """
+        Shards that can hold the answer: the named location's shard, else all of them.
+        """
+        rows = self.locations.find_location_rows(query)
+        if rows:
+            named = {self.location_shards[row] for row in rows} & self.shards.keys()
+            if named:
+                return sorted(named)
+        return sorted(self.shards)
+
+    def _embed(self, query: str):
+        return next(iter(self.shards.values())).vectorstore._embed_query(query)
+
+    def _retrieve(self, query: str, vector) -> list[Document]:
+        targets = self.shards_for(query)
+        if not targets:
+            return []
+        if len(targets) == 1:
+            candidates = [self.shards[targets[0]].scored_candidates(query, vector)]
+        else:
+            candidates = list(self.pool.map(lambda name: self.shards[name].scored_candidates(query, vector), targets))
+        reverse = _higher_is_better(self.shards[targets[0]].vectorstore)
+        dense = sorted((pair for d, _ in candidates for pair in d), key=lambda pair: pair[1], reverse=reverse)
+        lexical = sorted((pair for _, l in candidates for pair in l), key=lambda pair: pair[1], reverse=True)
+        return reciprocal_rank_fusion(
+            [[doc for doc, _ in lexical[:self.fetch_k]], [doc for doc, _ in dense[:self.fetch_k]]],
+            k=self.k, rrf_k=self.rrf_k,
+        )
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list[Document]:
+        if not self.shards:
+            return []
+        return self._retrieve(query, self._embed(query))
+
+    def batch_retrieve(self, queries: list[str], vectors) -> list[list[Document]]:
+        if not self.shards:
+            return [[] for _ in queries]
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return [self._retrieve(query, vector) for query, vector in zip(queries, vectors)]
+
+def load_sharded_retriever(path: str = SHARDS_PATH, embeddings=None, previous: ShardedRetriever | None = None,
+                           k: int = DEFAULT_K, fetch_k: int = DEFAULT_FETCH_K) -> ShardedRetriever:
+    """
+    Open every shard listed in the shard map at `path`. Shards whose files are unchanged since
+    `previous` was loaded are reused as they are, so rebuilding one site reloads only its shard
+    (plus the BM25 indexes of the others, whose corpus statistics changed with it).
+    """
+    shard_map = load_shard_map(path)
+    if not shard_map:
+        raise FileNotFoundError(f"No sharded index at {path}; build it with python -m vectorstore.sharded_index")
+    stats = shard_map.get("lexical")
+    same_stats = previous is not None and previous.lexical_stats == stats
+    shards, versions = {}, {}
+    for name in shard_map["shards"]:
+        version = index_version(os.path.join(path, name))
+        if previous is not None and previous.versions.get(name) == version:
+            shards[name] = previous.shards[name]
+            if not same_stats:
+                shards[name] = build_hybrid_retriever(shards[name].vectorstore, k=k, fetch_k=fetch_k, lexical_stats=stats)
+        else:
+            vectorstore = load_store(os.path.join(path, name), embeddings)
+            tune_from_env(vectorstore.index)
+            shards[name] = build_hybrid_retriever(vectorstore, k=k, fetch_k=fetch_k, lexical_stats=stats)
+        versions[name] = version
+    located = [(loc, name) for name, info in shard_map["shards"].items() for loc in info.get("locations", [])]
+    pool = previous.pool if previous is not None else ThreadPoolExecutor(max_workers=SHARD_WORKERS, thread_name_prefix="shard")
+    return ShardedRetriever(
+        shards=shards,
+        versions=versions,
+        locations=InventoryIndex([{"Warehouse_Location": loc} for loc, _ in located]),
+        location_shards=[name for _, name in located],
+        pool=pool,
+        lexical_stats=stats,
+        k=k,
+        fetch_k=fetch_k,
+    )
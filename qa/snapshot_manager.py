@@ -0,0 +1,125 @@
+import threading
+import time
+import traceback
+
+DEFAULT_POLL_SECONDS = 5.0
+
+class SnapshotManager:
+    """
+    Process-wide holder for read-only resources built from files on disk (inventory indexes,
+    the FAISS-backed QA chain, ...), shared by every session.
+
+    Each resource is registered with a cheap `version()` function (mtimes/sizes) and a `load()`
+    function. A background thread polls the versions; when one changes, the new resource is
+    built off the request path and swapped in with a single reference assignment, so readers
+    always see either the old or the new object, never a half-loaded one. Nothing is reloaded
+    while the versions stay the same, and a failed load keeps serving the previous snapshot.
+    """
+
+    def __init__(self, poll_seconds: float = DEFAULT_POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self.resources = {}
+        self.current = {}
+        self.versions = {}
+        self.loaded_at = {}
+        # Bumped on every swap of a resource, so callers can tell which snapshot they used
+        self.generations = {}
+        self.errors = {}
+        self.reloads = 0
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def register(self, name: str, version, load):
+        """
+        Register a resource and load it immediately, so the first request never waits on the poller.
+        """
+        self.resources[name] = (version, load)
+        self._reload(name)
+        return self
+
+    def _reload(self, name: str) -> bool:
+        version_fn, load = self.resources[name]
+        version = version_fn()
+        if name in self.current and version == self.versions.get(name):
+            return False
+        try:
+            value = load()
+        except Exception as e:
+            # Usually a writer still mid-way through replacing the files; retried on the next poll
+            self.errors[name] = f"{type(e).__name__}: {e}"
+            return False
+        if version_fn() != version:
+            # Files changed again while loading; keep the result but re-check on the next poll
+            version = None
+        with self.lock:
+            self.current = {**self.current, name: value}
+            self.versions[name] = version
+            self.loaded_at[name] = time.time()
+            self.generations[name] = self.generations.get(name, 0) + 1
+            self.errors.pop(name, None)
+            self.reloads += 1
+        return True
+
+    def refresh(self) -> list[str]:
+        """
+        Reload every resource whose version changed; returns the names that were swapped in.
+        """
+        return [name for name in list(self.resources) if self._reload(name)]
+
+    def _run(self):
+        while not self.stop_event.wait(self.poll_seconds):
+            try:
+                for name in self.refresh():
+                    print(f"🔄 Reloaded {name} snapshot")
+            except Exception:
+                traceback.print_exc()
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="snapshot-manager", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def get(self, name: str):
+        """
+        The current snapshot of `name`, or None if it has never loaded successfully.
+        """
+        return self.current.get(name)
+
+    def generation(self, name: str):
+        """
+        How many times `name` has been swapped in (None before its first load); changes exactly
+        when get(name) starts returning a new object.
+        """
+        return self.generations.get(name)
+
+    def get_versioned(self, name: str) -> tuple:
+        """
+        (current snapshot of `name`, its generation), read together.
+        """
+        with self.lock:
+            return self.current.get(name), self.generations.get(name)
+
+    def snapshot(self) -> dict:
+        """
+        All current resources at once, for callers that need a consistent set across one request.
+        """
+        return self.current
+
+    def status(self) -> dict:
+        with self.lock:
+            return {
+                name: {
+                    "loaded": name in self.current,
+                    "loaded_at": self.loaded_at.get(name),
+                    "error": self.errors.get(name),
+                }
+                for name in self.resources
+            }
@@ -0,0 +1,214 @@
+# telemetry/metrics.py
+"""
+In-process latency and volume metrics for the QA path and the alert jobs, exposed in the
+Prometheus text format, plus an optional per-request trace log.
+
+    REGISTRY.render()             text for a /metrics endpoint (qa/service.py serves it)
+    REGISTRY.write_textfile(path) the same text for node_exporter's textfile collector, for
+                                  short-lived jobs such as alert_weekly.py
+    Trace                         per-request span timings and attributes; every span also
+                                  feeds inventory_stage_seconds. With QA_TRACE_LOG set, each
+                                  finished trace is appended to that JSONL file.
+
+No client library is needed; histograms use fixed buckets and every metric has its own lock.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+DOC_BUCKETS = (0, 1, 2, 4, 8, 16, 32)
+TRACE_LOG = os.getenv("QA_TRACE_LOG")
+
+def _labels(names: tuple, values: dict) -> tuple:
+    if set(values) != set(names):
+        raise ValueError(f"expected labels {names}, got {tuple(values)}")
+    return tuple(str(values[n]) for n in names)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, value: float = 1.0, **labels):
+        key = _labels(self.labelnames, labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value:g}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _labels(self.labelnames, labels)
+        with self.lock:
+            series = self.values.setdefault(key, [0] * (len(self.buckets) + 1) + [0.0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def means(self) -> dict[tuple, float]:
+        """
+        Mean observed value per label combination.
+        """
+        with self.lock:
+            return {key: series[-1] / series[-2] for key, series in self.values.items() if series[-2]}
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, series in sorted(self.values.items()):
+                for bound, count in zip(self.buckets, series):
+                    le = 'le="%g"' % bound
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {count}")
+                inf = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, inf)} {series[-2]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {series[-1]:g}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series[-2]}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        metric = self.metrics.get(name)
+        if metric is None:
+            metric = self.metrics[name] = cls(name, *args, **kwargs)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets)
+
+    def render(self) -> str:
+        return "\n".join(line for metric in self.metrics.values() for line in metric.render()) + "\n"
+
+    def write_textfile(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "inventory_stage_seconds", "Wall time of one pipeline stage.", ("component", "stage")
+)
+QA_REQUESTS = REGISTRY.counter(
+    "inventory_qa_requests_total", "Questions answered, by how they were answered.", ("route",)
+)
+ANSWER_CACHE = REGISTRY.counter(
+    "inventory_qa_answer_cache_total", "Semantic answer cache lookups, by outcome.", ("outcome",)
+)
+LLM_TOKENS = REGISTRY.histogram(
+    "inventory_qa_llm_tokens", "Tokens per LLM call (prompt and completion).", ("kind",), TOKEN_BUCKETS
+)
+RETRIEVED_DOCS = REGISTRY.histogram(
+    "inventory_qa_retrieved_documents", "Documents retrieved per question.", (), DOC_BUCKETS
+)
+ALERTS = REGISTRY.counter(
+    "inventory_alerts_total", "Voice alerts delivered, by final status.", ("status",)
+)
+ALERT_ATTEMPTS = REGISTRY.counter(
+    "inventory_alert_attempts_total", "Voice alert HTTP attempts, including retries.", ()
+)
+
+@contextmanager
+def span(component: str, stage: str):
+    """
+    Time a block into inventory_stage_seconds without a trace.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, component=component, stage=stage)
+
+_trace_lock = threading.Lock()
+
+class Trace:
+    """
+    Span timings and attributes (route, tokens, retrieved docs, cache outcome) of one request.
+    """
+
+    def __init__(self, component: str, **attrs):
+        self.id = uuid.uuid4().hex[:16]
+        self.component = component
+        self.started = time.perf_counter()
+        self.wall_started = time.time()
+        self.spans = []
+        self.attrs = dict(attrs)
+
+    @contextmanager
+    def span(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started, started)
+
+    def record(self, stage: str, seconds: float, started: float | None = None):
+        """
+        Add a span measured elsewhere (e.g. time to first token).
+        """
+        STAGE_SECONDS.observe(seconds, component=self.component, stage=stage)
+        offset = (started if started is not None else time.perf_counter() - seconds) - self.started
+        self.spans.append({"stage": stage, "start_ms": round(offset * 1000, 3), "ms": round(seconds * 1000, 3)})
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def finish(self, **attrs) -> dict:
+        self.attrs.update(attrs)
+        total = time.perf_counter() - self.started
+        STAGE_SECONDS.observe(total, component=self.component, stage="total")
+        entry = {
+            "trace_id": self.id,
+            "component": self.component,
+            "started": self.wall_started,
+            "total_ms": round(total * 1000, 3),
+            "spans": self.spans,
+            **self.attrs,
+        }
+        if TRACE_LOG:
+            line = json.dumps(entry, default=str) + "\n"
+            with _trace_lock:
+                os.makedirs(os.path.dirname(TRACE_LOG) or ".", exist_ok=True)
+                with open(TRACE_LOG, "a", encoding="utf-8") as f:
+                    f.write(line)
+        return entry
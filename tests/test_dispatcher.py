@@ -0,0 +1,153 @@
+# tests/test_dispatcher.py
+"""
+VoiceAlertDispatcher against the local stub of the OmniDimension API (alerts/stub_server.py).
+
+Run from the repo root:
+    python -m pytest tests
+"""
+import json
+import threading
+import time
+
+import httpx
+import pytest
+
+from alerts.dispatcher import Outbox, VoiceAlertDispatcher, call_payload, key_fingerprint
+from alerts.stub_server import start_stub_server
+
+@pytest.fixture
+def outbox_path(tmp_path):
+    return str(tmp_path / "outbox.jsonl")
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(**kwargs):
+        server, url, state = start_stub_server(**kwargs)
+        servers.append(server)
+        return url, state
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+def read_lines(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+def make_dispatcher(outbox_path, url, **kwargs):
+    return VoiceAlertDispatcher("test-key", url=url, backoff_base=0.01, outbox=Outbox(outbox_path), **kwargs)
+
+def test_delivers_every_payload(stub, outbox_path):
+    url, state = stub()
+    dispatcher = make_dispatcher(outbox_path, url)
+    try:
+        payloads = [call_payload(1, f"+1555000{i:04d}", f"alert {i}") for i in range(5)]
+        results = dispatcher.dispatch_sync(payloads)
+    finally:
+        dispatcher.close()
+    assert [r["status"] for r in results] == ["sent"] * 5
+    assert sorted(r["body"]["to_number"] for r in state["requests"]) == sorted(p["to_number"] for p in payloads)
+
+def test_retries_transient_failures(stub, outbox_path):
+    url, state = stub(fail_first=2)
+    dispatcher = make_dispatcher(outbox_path, url)
+    try:
+        [result] = dispatcher.dispatch_sync([call_payload(1, "+15550000001", "retry me")])
+    finally:
+        dispatcher.close()
+    assert result["status"] == "sent"
+    assert result["attempts"] == 3
+    assert state["count"] == 3
+
+def test_permanent_transport_error_fails_without_retry(outbox_path):
+    dispatcher = make_dispatcher(outbox_path, "ftp://127.0.0.1/api/v1/calls/dispatch", max_retries=4)
+    try:
+        started = time.monotonic()
+        [result] = dispatcher.dispatch_sync([call_payload(1, "+15550000001", "bad url")])
+    finally:
+        dispatcher.close()
+    assert result["status"] == "failed"
+    assert result["attempts"] == 1
+    assert result["error"].startswith("UnsupportedProtocol")
+    assert time.monotonic() - started < 1.0
+
+def test_resends_alerts_left_pending(stub, outbox_path):
+    url, state = stub()
+    Outbox(outbox_path).record("left-over", "pending", url=url, payload=call_payload(1, "+15550000002", "crash"))
+    dispatcher = make_dispatcher(outbox_path, url)
+    try:
+        dispatcher.dispatch_sync([])
+    finally:
+        dispatcher.close()
+    assert Outbox(outbox_path).get("left-over")["status"] == "sent"
+    assert state["count"] == 1
+
+def test_reclaims_expired_lease(stub, outbox_path):
+    url, state = stub()
+    outbox = Outbox(outbox_path)
+    outbox.record("stuck", "sending", url=url, payload=call_payload(1, "+15550000003", "x"),
+                  owner="crashed", lease_until=time.time() - 1)
+    outbox.record("held", "sending", url=url, payload=call_payload(1, "+15550000004", "y"),
+                  owner="alive", lease_until=time.time() + 60)
+    dispatcher = make_dispatcher(outbox_path, url)
+    try:
+        dispatcher.dispatch_sync([])
+    finally:
+        dispatcher.close()
+    assert Outbox(outbox_path).get("stuck")["status"] == "sent"
+    assert Outbox(outbox_path).get("held")["status"] == "sending"
+    assert state["count"] == 1
+
+def test_concurrent_dispatchers_send_each_alert_once(stub, outbox_path):
+    url, state = stub(latency=0.05)
+    seed = Outbox(outbox_path)
+    for i in range(20):
+        seed.record(f"alert-{i}", "pending", url=url, payload=call_payload(1, f"+1555100{i:04d}", "once"))
+    # Separate Outbox objects on one file stand in for separate processes
+    dispatchers = [make_dispatcher(outbox_path, url) for _ in range(4)]
+    try:
+        threads = [threading.Thread(target=d.dispatch_sync, args=([],)) for d in dispatchers]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        for d in dispatchers:
+            d.close()
+    assert state["count"] == 20
+    assert len({r["body"]["to_number"] for r in state["requests"]}) == 20
+    assert all(Outbox(outbox_path).get(f"alert-{i}")["status"] == "sent" for i in range(20))
+
+def test_retry_after_is_capped_below_the_lease(outbox_path):
+    dispatcher = make_dispatcher(outbox_path, "http://127.0.0.1:9", lease_seconds=60, timeout=10)
+    try:
+        response = httpx.Response(503, headers={"Retry-After": "900"})
+        assert dispatcher._backoff(0, response) == 40
+    finally:
+        dispatcher.close()
+
+def test_renews_lease_before_retrying(stub, outbox_path):
+    url, state = stub(fail_first=1)
+    dispatcher = make_dispatcher(outbox_path, url)
+    try:
+        [result] = dispatcher.dispatch_sync([call_payload(1, "+15550000005", "renew")])
+    finally:
+        dispatcher.close()
+    assert result["status"] == "sent"
+    leases = [e for e in read_lines(outbox_path) if e["id"] == result["id"] and e["status"] == "sending"]
+    assert len(leases) == 2
+    assert leases[1]["lease_until"] > leases[0]["lease_until"]
+
+def test_leaves_alerts_queued_under_another_key(stub, outbox_path):
+    url, state = stub()
+    Outbox(outbox_path).record("other-key", "pending", url=url, payload=call_payload(1, "+15550000006", "not mine"),
+                               key_id=key_fingerprint("other-key"))
+    dispatcher = make_dispatcher(outbox_path, url)
+    try:
+        dispatcher.dispatch_sync([])
+    finally:
+        dispatcher.close()
+    assert Outbox(outbox_path).get("other-key")["status"] == "pending"
+    assert state["count"] == 0
@@ -0,0 +1,238 @@
+# vectorstore/ann_index.py
+import math
+import os
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "ivf", "hnsw", "ivfpq")
+DEFAULT_NPROBE = 8
+DEFAULT_HNSW_M = 32
+DEFAULT_EF_CONSTRUCTION = 80
+DEFAULT_EF_SEARCH = 64
+DEFAULT_PQ_M = 48  # 384 dims -> 8 dims per sub-quantizer
+DEFAULT_TRAIN_SIZE = 50_000
+# FAISS wants ~39 training points per centroid
+POINTS_PER_CENTROID = 39
+# A batch changing more than this share of an ANN index's rows rebuilds (and retrains) it
+REBUILD_FRACTION = 0.25
+
+def default_nlist(n: int) -> int:
+    """
+    Number of IVF lists for `n` vectors: ~4 * sqrt(n), capped so every list gets enough training points.
+    """
+    return max(1, min(int(4 * math.sqrt(n)), n // POINTS_PER_CENTROID, 65536))
+
+def default_pq_bits(n: int) -> int:
+    # 8-bit codebooks need 256 centroids per sub-quantizer; small collections get fewer
+    return max(4, min(8, int(math.log2(max(2, n // POINTS_PER_CENTROID)))))
+
+def is_flat(index) -> bool:
+    return isinstance(faiss.downcast_index(index), faiss.IndexFlat)
+
+def set_search_params(index, nprobe: int | None = None, ef_search: int | None = None):
+    """
+    Tune the recall/latency trade-off of a built index: `nprobe` for IVF, `ef_search` for HNSW.
+    Both are saved with the index, so they also apply after the store is reloaded.
+    """
+    index = faiss.downcast_index(index)
+    if nprobe is not None and isinstance(index, faiss.IndexIVF):
+        index.nprobe = min(nprobe, index.nlist)
+    if ef_search is not None and isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = ef_search
+
+def tune_from_env(index):
+    """
+    Apply FAISS_NPROBE / FAISS_EF_SEARCH from the environment to a loaded index, if set.
+    """
+    nprobe = os.getenv("FAISS_NPROBE")
+    ef_search = os.getenv("FAISS_EF_SEARCH")
+    set_search_params(index, int(nprobe) if nprobe else None, int(ef_search) if ef_search else None)
+    return index
+
+def describe_index(index) -> dict:
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return {"type": "hnsw", "ef_search": index.hnsw.efSearch, "ntotal": index.ntotal}
+    if isinstance(index, faiss.IndexIVFPQ):
+        return {"type": "ivfpq", "nlist": index.nlist, "nprobe": index.nprobe, "pq_m": index.pq.M, "ntotal": index.ntotal}
+    if isinstance(index, faiss.IndexIVF):
+        return {"type": "ivf", "nlist": index.nlist, "nprobe": index.nprobe, "ntotal": index.ntotal}
+    return {"type": "flat", "ntotal": index.ntotal}
+
+def build_index(vectors: np.ndarray, index_type: str = "flat", metric: int = faiss.METRIC_L2,
+                nlist: int | None = None, nprobe: int = DEFAULT_NPROBE, hnsw_m: int = DEFAULT_HNSW_M,
+                ef_search: int = DEFAULT_EF_SEARCH, pq_m: int = DEFAULT_PQ_M,
+                train_size: int = DEFAULT_TRAIN_SIZE, seed: int = 0):
+    """
+    Build a FAISS index of `index_type` over `vectors` (rows in order, so row i keeps id i).
+    IVF variants are trained on a random sample of at most `train_size` vectors.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}; expected one of {INDEX_TYPES}")
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, dim = vectors.shape
+
+    if index_type == "flat":
+        index = faiss.IndexFlatIP(dim) if metric == faiss.METRIC_INNER_PRODUCT else faiss.IndexFlatL2(dim)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m, metric)
+        index.hnsw.efConstruction = DEFAULT_EF_CONSTRUCTION
+    else:
+        nlist = nlist or default_nlist(n)
+        quantizer = faiss.IndexFlatIP(dim) if metric == faiss.METRIC_INNER_PRODUCT else faiss.IndexFlatL2(dim)
+        if index_type == "ivf":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist, metric)
+        else:
+            if dim % pq_m:
+                raise ValueError(f"pq_m={pq_m} must divide the embedding dimension {dim}")
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, default_pq_bits(n), metric)
+        sample = vectors
+        if n > train_size:
+            sample = vectors[np.random.default_rng(seed).choice(n, train_size, replace=False)]
+        index.train(sample)
+
+    index.add(vectors)
+    if isinstance(index, faiss.IndexIVF):
+        # Id -> list lookup, so rows can later be removed and relabelled without a scan
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+    set_search_params(index, nprobe=nprobe, ef_search=ef_search)
+    return index
+
+def convert_vectorstore(vectorstore, index_type: str, **params):
+    """
+    Swap the flat index of a LangChain FAISS vectorstore for an ANN index in place.
+    Rows keep their positions, so the docstore mapping and manifest stay valid.
+    """
+    if index_type == "flat":
+        return vectorstore
+    flat = vectorstore.index
+    vectors = flat.reconstruct_n(0, flat.ntotal)
+    vectorstore.index = build_index(vectors, index_type, metric=flat.metric_type, **params)
+    return vectorstore
+
+def index_params(index) -> dict:
+    """
+    The build_index parameters of an existing index, for rebuilding it with the same shape.
+    """
+    index = faiss.downcast_index(index)
+    params = {"metric": index.metric_type}
+    if isinstance(index, faiss.IndexHNSW):
+        params.update(index_type="hnsw", hnsw_m=index.hnsw.nb_neighbors(1), ef_search=index.hnsw.efSearch)
+    elif isinstance(index, faiss.IndexIVFPQ):
+        params.update(index_type="ivfpq", nprobe=index.nprobe, pq_m=index.pq.M)
+    elif isinstance(index, faiss.IndexIVF):
+        params.update(index_type="ivf", nprobe=index.nprobe)
+    else:
+        params.update(index_type="flat")
+    return params
+
+def _embed(vectorstore, documents: list) -> np.ndarray:
+    vectors = np.asarray(vectorstore._embed_documents([doc.page_content for doc in documents]), dtype=np.float32)
+    if vectorstore._normalize_L2:
+        faiss.normalize_L2(vectors)
+    return vectors.reshape(len(documents), vectorstore.index.d)
+
+def _stored_vectors(vectorstore, rows: list[int]) -> np.ndarray:
+    """
+    Vectors of existing rows: read back from the index, except for IVF-PQ, whose codes only
+    approximate them, where the documents are re-embedded (through the embedding cache).
+    """
+    index = faiss.downcast_index(vectorstore.index)
+    if isinstance(index, faiss.IndexIVFPQ):
+        mapping = vectorstore.index_to_docstore_id
+        return _embed(vectorstore, [vectorstore.docstore.search(mapping[row]) for row in rows])
+    if isinstance(index, faiss.IndexIVF) and index.direct_map.type == faiss.DirectMap.NoMap:
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+    if not len(rows):
+        return np.zeros((0, index.d), dtype=np.float32)
+    return index.reconstruct_batch(np.asarray(rows, dtype=np.int64))
+
+def rebuild_vectorstore(vectorstore, upserts: list = (), stale: list[str] = ()):
+    """
+    Apply row changes by building a fresh index of the same type over every live vector,
+    retraining IVF quantizers on the current data. Stored vectors are reused, so only the
+    upserts are embedded (plus every document for IVF-PQ). O(N): run explicitly
+    (embed_and_store.py --rebuild-index) or when a batch crosses REBUILD_FRACTION.
+    """
+    mapping = vectorstore.index_to_docstore_id
+    upserted = {doc.metadata["Item_ID"] for doc in upserts}
+    removed = set(stale) | upserted
+    rows = [row for row in range(len(mapping)) if mapping[row] not in removed]
+    ids = [mapping[row] for row in rows] + [doc.metadata["Item_ID"] for doc in upserts]
+    vectors = np.vstack([_stored_vectors(vectorstore, rows), _embed(vectorstore, list(upserts))])
+    params = index_params(vectorstore.index)
+    if len(ids):
+        vectorstore.index = build_index(vectors, **params)
+    else:
+        vectorstore.index.reset()
+    present = set(mapping.values())
+    _update_docstore(vectorstore, [i for i in removed if i in present], upserts)
+    vectorstore.index_to_docstore_id = dict(enumerate(ids))
+    return vectorstore
+
+def _update_docstore(vectorstore, removed: list[str], upserts: list):
+    if removed:
+        vectorstore.docstore.delete(removed)
+    if upserts:
+        vectorstore.docstore.add({doc.metadata["Item_ID"]: doc for doc in upserts})
+
+def replace_documents(vectorstore, upserts: list, stale: list[str]):
+    """
+    Apply row changes to a vectorstore with an ANN index in O(changed rows); rows stay
+    numbered 0..N-1 so the docstore mapping, manifest and pre-filter bitmaps remain valid.
+
+    IVF variants remove the dropped rows by id (through the direct map) and move the last
+    rows into the gaps with add_with_ids. HNSW cannot remove nodes, so an updated document's
+    vector is overwritten in place (its graph links are kept, close enough for the small edits
+    of a stock or price update) and only real deletions rebuild it. Upserts are appended.
+    Large batches go through rebuild_vectorstore instead.
+    """
+    index = faiss.downcast_index(vectorstore.index)
+    mapping = vectorstore.index_to_docstore_id
+    rows = {doc_id: row for row, doc_id in mapping.items()}
+    upserted = {doc.metadata["Item_ID"]: doc for doc in upserts}
+    deleted = [i for i in stale if i in rows and i not in upserted]
+    hnsw = isinstance(index, faiss.IndexHNSW)
+    if (hnsw and deleted) or len(set(stale) | set(upserted)) > REBUILD_FRACTION * max(index.ntotal, 1):
+        return rebuild_vectorstore(vectorstore, upserts, stale)
+
+    if hnsw:
+        # Updated documents keep their row; their new vectors overwrite the stored ones
+        updated = [doc for item_id, doc in upserted.items() if item_id in rows]
+        if updated:
+            storage = faiss.downcast_index(index.storage)
+            stored = faiss.rev_swig_ptr(storage.get_xb(), index.ntotal * index.d).reshape(index.ntotal, index.d)
+            stored[[rows[doc.metadata["Item_ID"]] for doc in updated]] = _embed(vectorstore, updated)
+            _update_docstore(vectorstore, [doc.metadata["Item_ID"] for doc in updated], updated)
+        appended = [doc for item_id, doc in upserted.items() if item_id not in rows]
+        if appended:
+            index.add(_embed(vectorstore, appended))
+            _update_docstore(vectorstore, [], appended)
+            for doc in appended:
+                mapping[len(mapping)] = doc.metadata["Item_ID"]
+        return vectorstore
+
+    dropped = sorted({rows[i] for i in stale if i in rows} | {rows[i] for i in upserted if i in rows})
+    if dropped:
+        n = index.ntotal
+        kept = n - len(dropped)
+        gaps = [row for row in dropped if row < kept]
+        dropped_set = set(dropped)
+        tail = [row for row in range(kept, n) if row not in dropped_set]
+        moved = _stored_vectors(vectorstore, tail)
+        index.remove_ids(np.asarray(dropped + tail, dtype=np.int64))
+        if tail:
+            index.add_with_ids(moved, np.asarray(gaps, dtype=np.int64))
+        _update_docstore(vectorstore, [mapping[row] for row in dropped], [])
+        for gap, row in zip(gaps, tail):
+            mapping[gap] = mapping[row]
+        for row in range(kept, n):
+            del mapping[row]
+    if upserts:
+        start = index.ntotal
+        index.add_with_ids(_embed(vectorstore, upserts), np.arange(start, start + len(upserts), dtype=np.int64))
+        _update_docstore(vectorstore, [], upserts)
+        for offset, doc in enumerate(upserts):
+            mapping[start + offset] = doc.metadata["Item_ID"]
+    return vectorstore
@@ -0,0 +1,133 @@
+import json
+import os
+import time
+from collections import deque
+from multiprocessing import get_context
+
+from langchain.vectorstores import FAISS
+from langchain.docstore.document import Document
+
+from ingestion.columnar_store import load_table, snapshot_is_fresh
+from ingestion.inventory_schema import conform_record
+from vectorstore.embed_and_store import document_hash, render_document
+from vectorstore.embedding_cache import MODEL_NAME, get_embeddings, text_key
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_CHUNK_SIZE = 2048
+
+# Per-process model handle, loaded once by the pool initializer
+_worker_model = None
+
+def available_cores() -> int:
+    """
+    Number of cores this process may run on (respects container CPU affinity).
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def iter_document_chunks(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Stream inventory records as lists of at most `chunk_size` Documents, so only one chunk
+    per in-flight batch is ever held as Python objects. Reads record batches from the
+    memory-mapped Arrow snapshot when it is fresh, else streams the JSONL line by line.
+    """
+    if snapshot_is_fresh(path):
+        for batch in load_table(path).to_batches(max_chunksize=chunk_size):
+            yield [Document(page_content=render_document(rec), metadata=rec) for rec in batch.to_pylist()]
+        return
+
+    chunk = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            rec = conform_record(json.loads(line))
+            chunk.append(Document(page_content=render_document(rec), metadata=rec))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+def _init_worker(model_name: str, threads: int):
+    global _worker_model
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    # Keep workers from oversubscribing the box: each one gets its share of the cores
+    torch.set_num_threads(threads)
+    _worker_model = SentenceTransformer(model_name, device="cpu")
+
+def _encode(texts: list[str], batch_size: int):
+    return _worker_model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+
+def bulk_embed(path: str, batch_size: int = DEFAULT_BATCH_SIZE, workers: int | None = None,
+               chunk_size: int = DEFAULT_CHUNK_SIZE, on_progress=None) -> tuple[FAISS, dict, dict]:
+    """
+    Embed every record in the JSONL at `path` with a pool of encoder processes and build a FAISS vectorstore.
+    Chunks are encoded in parallel but added to the index in file order, with at most two chunks
+    per worker in flight; texts already in the embedding cache are not re-encoded. Returns the vectorstore, a dict of {Item_ID: document hash} for the manifest,
+    and throughput stats. `on_progress(docs_done, docs_per_sec)` is called after every chunk.
+    Only the chunks being encoded are bounded: the docstore and the hashes still hold every document.
+    A repeated Item_ID is indexed once, from its last row.
+    Raises ValueError when `path` holds no records.
+    """
+    workers = workers or available_cores()
+    threads = max(1, available_cores() // workers)
+    embeddings = get_embeddings()
+    cache = embeddings.cache
+    vectorstore = None
+    hashes = {}
+    done = 0
+    started = time.perf_counter()
+
+    def add_chunk(docs, keys, vectors, result):
+        nonlocal vectorstore, done
+        if result is not None:
+            missing = [i for i, v in enumerate(vectors) if v is None]
+            computed = result.get()
+            cache.put_many([keys[i] for i in missing], computed)
+            for i, vector in zip(missing, computed):
+                vectors[i] = vector
+        # A repeated Item_ID keeps its last row, as in embed_and_store.unique_documents
+        last = {doc.metadata["Item_ID"]: i for i, doc in enumerate(docs)}
+        rows = sorted(last.values())
+        docs, vectors = [docs[i] for i in rows], [vectors[i] for i in rows]
+        repeated = [item_id for item_id in last if item_id in hashes]
+        if repeated:
+            vectorstore.delete(repeated)
+        texts = [doc.page_content for doc in docs]
+        metadatas = [doc.metadata for doc in docs]
+        ids = [doc.metadata["Item_ID"] for doc in docs]
+        if vectorstore is None:
+            vectorstore = FAISS.from_embeddings(list(zip(texts, vectors)), embeddings, metadatas=metadatas, ids=ids)
+        else:
+            vectorstore.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=ids)
+        for doc in docs:
+            hashes[doc.metadata["Item_ID"]] = document_hash(doc)
+        done += len(docs)
+        if on_progress:
+            on_progress(done, done / (time.perf_counter() - started))
+
+    ctx = get_context("spawn")
+    with ctx.Pool(workers, initializer=_init_worker, initargs=(MODEL_NAME, threads)) as pool:
+        pending = deque()
+        for docs in iter_document_chunks(path, chunk_size):
+            # Only cache misses go to the pool; unchanged products reuse their stored vectors
+            keys = [text_key(doc.page_content) for doc in docs]
+            vectors = cache.get_many(keys)
+            misses = [doc.page_content for doc, v in zip(docs, vectors) if v is None]
+            result = pool.apply_async(_encode, (misses, batch_size)) if misses else None
+            pending.append((docs, keys, vectors, result))
+            if len(pending) >= 2 * workers:
+                add_chunk(*pending.popleft())
+        while pending:
+            add_chunk(*pending.popleft())
+
+    if vectorstore is None:
+        raise ValueError(f"No inventory records in {path}; nothing to embed")
+    elapsed = time.perf_counter() - started
+    stats = {"documents": done, "seconds": elapsed, "docs_per_sec": done / elapsed if elapsed else 0.0}
+    return vectorstore, hashes, stats
@@ -1,56 +1,245 @@
+import argparse
+import hashlib
 import json
 import os
 
+from ingestion.columnar_store import load_records
+
 from langchain.vectorstores import FAISS
-from langchain.embeddings import HuggingFaceEmbeddings
 from langchain.docstore.document import Document
 
+from vectorstore.ann_index import (
+    INDEX_TYPES,
+    convert_vectorstore,
+    describe_index,
+    is_flat,
+    rebuild_vectorstore,
+    replace_documents,
+)
+from vectorstore.embedding_cache import get_embeddings
+from vectorstore.index_store import HEADER_FILENAME, LEGACY_PICKLE_FILENAME, load_store, save_store, store_exists
+
 # Constants for file paths
 DATA_PATH = "data/processed/output.jsonl"
 VECTOR_INDEX_PATH = "vectorstore/faiss_index"
+MANIFEST_FILENAME = "manifest.json"
+
+def render_document(rec: dict) -> str:
+    """
+    Render one inventory record into the text that gets embedded.
+    Category and price lines are left out for records ingested before they were carried, and
+    aisle/shelf lines for items without a recorded placement.
+    """
+    lines = [
+        f"Product: {rec['Name']}",
+        f"Location: {rec['Warehouse_Location']}",
+        f"Expiration: {rec['Expiration_Date']}",
+        f"Expiring Soon: {rec['Expiring_Soon']}",
+        f"Stock Quantity: {rec['Stock_Quantity']}",
+    ]
+    if rec.get("Aisle") is not None and rec.get("Shelf") is not None:
+        lines += [f"Aisle: {rec['Aisle']}", f"Shelf: {rec['Shelf']}"]
+    if rec.get("Category"):
+        lines.append(f"Category: {rec['Category']}")
+    if rec.get("Unit_Price") is not None:
+        lines.append(f"Unit Price: ${rec['Unit_Price']:.2f}")
+    return "\n".join(lines)
+
+def document_hash(doc: Document) -> str:
+    """
+    Content hash of a rendered document, covering both the embedded text and its metadata.
+    """
+    payload = doc.page_content + "\x00" + json.dumps(doc.metadata, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
 
 def load_inventory_documents(path: str) -> list[Document]:
     """
-    Load inventory data from JSONL and convert each record into a LangChain Document.
+    Load inventory data (the Arrow snapshot if fresh, else the JSONL) and convert each record into a LangChain Document.
     Each document's content summarizes the product info and metadata preserves the full record.
     """
-    documents = []
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            rec = json.loads(line.strip())
-            content = (
-                f"Product: {rec.get('Name', 'N/A')}\n"
-                f"Location: {rec.get('Warehouse_Location', 'N/A')}\n"
-                f"Expiration: {rec.get('Expiration_Date', 'N/A')}\n"
-                f"Expiring Soon: {rec.get('Expiring_Soon', False)}\n"
-                f"Stock Quantity: {rec.get('Stock_Quantity', 'N/A')}\n"
-                f"Aisle: {rec.get('Aisle', 'N/A')}\n"
-                f"Shelf: {rec.get('Shelf', 'N/A')}"
-            )
-            documents.append(Document(page_content=content, metadata=rec))
-    return documents
+    return [Document(page_content=render_document(rec), metadata=rec) for rec in load_records(path)]
+
+def unique_documents(documents: list[Document]) -> list[Document]:
+    """
+    One document per Item_ID: a repeated Item_ID keeps its first position and its last row.
+    """
+    return list({doc.metadata["Item_ID"]: doc for doc in documents}.values())
 
 def embed_documents(documents: list[Document]) -> FAISS:
     """
     Create embeddings for documents using HuggingFace embeddings and return a FAISS vectorstore.
+    Documents are stored under their Item_ID so the index can later be synced incrementally
+    (a repeated Item_ID is stored once, from its last row, as sync_vectorstore does).
+    Vectors come from the shared embedding cache, so unchanged products are not re-encoded.
     """
-    embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-    vectorstore = FAISS.from_documents(documents, embeddings)
+    embeddings = get_embeddings()
+    documents = unique_documents(documents)
+    ids = [doc.metadata["Item_ID"] for doc in documents]
+    vectorstore = FAISS.from_documents(documents, embeddings, ids=ids)
     return vectorstore
 
 def save_vectorstore(vectorstore: FAISS, path: str):
     """
-    Save the FAISS vectorstore to a local directory.
+    Save the FAISS vectorstore to a local directory in the mmap store format (see vectorstore/index_store.py).
+    """
+    save_store(vectorstore, path)
+
+def index_version(path: str = VECTOR_INDEX_PATH) -> tuple:
+    """
+    Cheap fingerprint of the saved index (mtime and size of its header, which every save replaces,
+    and of the manifest); changes whenever it is rebuilt.
     """
-    os.makedirs(path, exist_ok=True)
-    vectorstore.save_local(path)
+    version = []
+    for name in (HEADER_FILENAME, LEGACY_PICKLE_FILENAME, MANIFEST_FILENAME):
+        try:
+            st = os.stat(os.path.join(path, name))
+            version.append((name, st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            version.append((name, None, None))
+    return tuple(version)
+
+def load_manifest(path: str) -> dict:
+    """
+    Load the Item_ID -> {hash, row} manifest stored next to the FAISS index.
+    Returns an empty dict when no manifest exists yet.
+    """
+    manifest_path = os.path.join(path, MANIFEST_FILENAME)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(vectorstore: FAISS, hashes: dict, path: str):
+    """
+    Persist the manifest, recording each Item_ID's content hash and its current vector row.
+    Written to a temp file and renamed so a crash never leaves a half-written manifest.
+    """
+    rows = {doc_id: row for row, doc_id in vectorstore.index_to_docstore_id.items()}
+    manifest = {item_id: {"hash": h, "row": rows[item_id]} for item_id, h in hashes.items()}
+    manifest_path = os.path.join(path, MANIFEST_FILENAME)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path)
+
+def apply_changes(vectorstore: FAISS, upserts: list[Document], deletes: list[str], existing: list[str] = ()):
+    """
+    Apply row-level changes to a loaded FAISS vectorstore in place.
+    `upserts` are embedded and stored under their Item_ID; `existing` lists the upserted
+    Item_IDs already present in the index, which are deleted first together with `deletes`.
+    """
+    stale = list(deletes) + list(existing)
+    if not is_flat(vectorstore.index):
+        if upserts or stale:
+            replace_documents(vectorstore, upserts, stale)
+        return
+    if stale:
+        vectorstore.delete(stale)
+    if upserts:
+        vectorstore.add_documents(upserts, ids=[doc.metadata["Item_ID"] for doc in upserts])
+
+def sync_vectorstore(documents: list[Document], path: str, embeddings=None,
+                     index_options: dict | None = None) -> tuple[FAISS, dict]:
+    """
+    Incrementally bring the FAISS index at `path` in line with `documents`, keyed on Item_ID.
+    Only new or changed documents are embedded; documents that disappeared are deleted.
+    Falls back to a full build when there is no index or manifest yet, using `index_options`
+    (index_type plus build_index parameters) for the new index.
+    Returns the updated vectorstore and a dict of added/updated/deleted/unchanged counts.
+    """
+    if embeddings is None:
+        embeddings = get_embeddings()
+
+    desired = {doc.metadata["Item_ID"]: doc for doc in unique_documents(documents)}
+    hashes = {item_id: document_hash(doc) for item_id, doc in desired.items()}
+    manifest = load_manifest(path)
+
+    if not manifest or not store_exists(path):
+        ids = list(desired)
+        vectorstore = FAISS.from_documents([desired[i] for i in ids], embeddings, ids=ids)
+        if index_options:
+            convert_vectorstore(vectorstore, **index_options)
+        stats = {"added": len(ids), "updated": 0, "deleted": 0, "unchanged": 0}
+    else:
+        vectorstore = load_store(path, embeddings, lazy=False)
+        removed = [i for i in manifest if i not in desired]
+        changed = [i for i in desired if i in manifest and manifest[i]["hash"] != hashes[i]]
+        added = [i for i in desired if i not in manifest]
+
+        upserts = changed + added
+        apply_changes(vectorstore, [desired[i] for i in upserts], removed, existing=changed)
+        stats = {
+            "added": len(added),
+            "updated": len(changed),
+            "deleted": len(removed),
+            "unchanged": len(desired) - len(upserts),
+        }
+
+    save_vectorstore(vectorstore, path)
+    save_manifest(vectorstore, hashes, path)
+    return vectorstore, stats
 
 if __name__ == "__main__":
-    print("🔄 Loading inventory documents...")
-    docs = load_inventory_documents(DATA_PATH)
-    print(f"🧠 Creating embeddings for {len(docs)} documents...")
-    vectorstore = embed_documents(docs)
-    print(f"💾 Saving vectorstore to {VECTOR_INDEX_PATH} ...")
-    save_vectorstore(vectorstore, VECTOR_INDEX_PATH)
-    print("✅ Vectorstore saved successfully!")
+    parser = argparse.ArgumentParser(description="Build the FAISS index for inventory documents.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Embed only new/changed records and delete removed ones (keyed on Item_ID).")
+    parser.add_argument("--bulk", action="store_true",
+                        help="Full rebuild with the multi-process batched embedder, streaming the JSONL in chunks.")
+    parser.add_argument("--batch-size", type=int, default=64, help="Encoder batch size for --bulk.")
+    parser.add_argument("--workers", type=int, default=None, help="Encoder processes for --bulk (default: all cores).")
+    parser.add_argument("--chunk-size", type=int, default=2048, help="Documents read per chunk for --bulk.")
+    parser.add_argument("--rebuild-index", action="store_true",
+                        help="Rebuild (and retrain) the saved ANN index over its current rows, after many incremental updates.")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default="flat",
+                        help="FAISS index for full builds: exact flat scan, IVF-Flat, HNSW or IVF-PQ.")
+    parser.add_argument("--nlist", type=int, default=None, help="IVF lists (default: ~4*sqrt(N)).")
+    parser.add_argument("--nprobe", type=int, default=8, help="IVF lists probed per query.")
+    parser.add_argument("--hnsw-m", type=int, default=32, help="HNSW neighbours per node.")
+    parser.add_argument("--ef-search", type=int, default=64, help="HNSW search breadth.")
+    parser.add_argument("--pq-m", type=int, default=48, help="IVF-PQ sub-quantizers (must divide 384).")
+    parser.add_argument("--train-size", type=int, default=50_000, help="Vectors sampled to train IVF variants.")
+    args = parser.parse_args()
+    index_options = {
+        "index_type": args.index_type, "nlist": args.nlist, "nprobe": args.nprobe, "hnsw_m": args.hnsw_m,
+        "ef_search": args.ef_search, "pq_m": args.pq_m, "train_size": args.train_size,
+    }
+
+    if args.rebuild_index:
+        print(f"🔁 Rebuilding the index at {VECTOR_INDEX_PATH} ...")
+        vectorstore = rebuild_vectorstore(load_store(VECTOR_INDEX_PATH, get_embeddings(), lazy=False))
+        save_vectorstore(vectorstore, VECTOR_INDEX_PATH)
+        hashes = {item_id: entry["hash"] for item_id, entry in load_manifest(VECTOR_INDEX_PATH).items()}
+        save_manifest(vectorstore, hashes, VECTOR_INDEX_PATH)
+        print(f"✅ Index rebuilt ({describe_index(vectorstore.index)})")
+    elif args.bulk:
+        from vectorstore.bulk_embedder import bulk_embed
 
+        print(f"🧠 Bulk embedding {DATA_PATH} ...")
+        vectorstore, hashes, stats = bulk_embed(
+            DATA_PATH, batch_size=args.batch_size, workers=args.workers, chunk_size=args.chunk_size,
+            on_progress=lambda done, rate: print(f"   {done} documents embedded ({rate:.1f} docs/sec)"),
+        )
+        convert_vectorstore(vectorstore, **index_options)
+        print(f"💾 Saving vectorstore to {VECTOR_INDEX_PATH} ...")
+        save_vectorstore(vectorstore, VECTOR_INDEX_PATH)
+        save_manifest(vectorstore, hashes, VECTOR_INDEX_PATH)
+        print(f"✅ Embedded {stats['documents']} documents in {stats['seconds']:.1f}s ({stats['docs_per_sec']:.1f} docs/sec)")
+    elif args.incremental:
+        print("🔄 Loading inventory documents...")
+        docs = load_inventory_documents(DATA_PATH)
+        print(f"🔁 Syncing {len(docs)} documents into {VECTOR_INDEX_PATH} ...")
+        vectorstore, stats = sync_vectorstore(docs, VECTOR_INDEX_PATH, index_options=index_options)
+        print(
+            f"✅ Index synced: {stats['added']} added, {stats['updated']} updated, "
+            f"{stats['deleted']} deleted, {stats['unchanged']} unchanged."
+        )
+    else:
+        print("🔄 Loading inventory documents...")
+        docs = unique_documents(load_inventory_documents(DATA_PATH))
+        print(f"🧠 Creating embeddings for {len(docs)} documents...")
+        vectorstore = embed_documents(docs)
+        convert_vectorstore(vectorstore, **index_options)
+        print(f"💾 Saving vectorstore to {VECTOR_INDEX_PATH} ...")
+        save_vectorstore(vectorstore, VECTOR_INDEX_PATH)
+        save_manifest(vectorstore, {doc.metadata["Item_ID"]: document_hash(doc) for doc in docs}, VECTOR_INDEX_PATH)
+        print(f"✅ Vectorstore saved successfully! ({describe_index(vectorstore.index)})")
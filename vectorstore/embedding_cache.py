@@ -0,0 +1,181 @@
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_community.embeddings import HuggingFaceEmbeddings
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+EMBEDDING_DIM = 384
+CACHE_DIR = "vectorstore/embedding_cache"
+DEFAULT_CAPACITY = 100_000
+KEY_BYTES = 32
+
+def text_key(text: str, model_name: str = MODEL_NAME) -> bytes:
+    """
+    Cache key for an embedded text: sha256 over the model name and the exact text.
+    """
+    return hashlib.sha256(f"{model_name}\x00{text}".encode("utf-8")).digest()
+
+class EmbeddingCache:
+    """
+    On-disk, size-bounded LRU cache of embedding vectors, shared by every process that opens
+    the same directory.
+
+    Three memory-mapped files hold one row per slot: the float32 vector, the 32-byte
+    key it belongs to and a last-used timestamp (0 = free); a fourth holds a write counter.
+    Writers take an exclusive flock on cache.lock, pick up other processes' writes (the
+    key -> slot index is rebuilt from the key file whenever the counter has moved), and
+    fill a slot by clearing its key, writing the vector, then setting the key. Readers take
+    no lock: they copy the vector between two checks of the stored key, so a slot being
+    overwritten by another process reads as a miss rather than a wrong vector.
+    """
+
+    def __init__(self, path: str = CACHE_DIR, dim: int = EMBEDDING_DIM, capacity: int = DEFAULT_CAPACITY):
+        os.makedirs(path, exist_ok=True)
+        self.lock_path = os.path.join(path, "cache.lock")
+        self.lock = threading.Lock()
+        meta_path = os.path.join(path, "meta.json")
+        meta = {"dim": dim, "capacity": capacity}
+        with self._locked():
+            fresh = True
+            if os.path.exists(meta_path):
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    fresh = json.load(f) != meta
+            mode = "w+" if fresh else "r+"
+
+            self.capacity = capacity
+            self.vectors = np.memmap(os.path.join(path, "vectors.f32"), dtype=np.float32, mode=mode, shape=(capacity, dim))
+            self.keys = np.memmap(os.path.join(path, "keys.u8"), dtype=np.uint8, mode=mode, shape=(capacity, KEY_BYTES))
+            self.stamps = np.memmap(os.path.join(path, "stamps.f64"), dtype=np.float64, mode=mode, shape=(capacity,))
+            writes_path = os.path.join(path, "writes.u64")
+            # Caches written before the counter existed start it at 0
+            self.writes = np.memmap(writes_path, dtype=np.uint64, mode=mode if os.path.exists(writes_path) else "w+", shape=(1,))
+            if fresh:
+                with open(meta_path, "w", encoding="utf-8") as f:
+                    json.dump(meta, f)
+            self._reload()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.slots)
+
+    @contextmanager
+    def _locked(self):
+        with self.lock, open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _reload(self):
+        # Rebuild the key -> slot index and free list from the files other processes share
+        self.seen_writes = int(self.writes[0])
+        used = np.flatnonzero(self.stamps > 0)
+        self.slots = {self.keys[i].tobytes(): int(i) for i in used}
+        self.slots.pop(bytes(KEY_BYTES), None)
+        self.free = [int(i) for i in np.flatnonzero(self.stamps == 0)[::-1]]
+
+    def _read(self, key: bytes, now: float):
+        slot = self.slots.get(key)
+        if slot is None or self.keys[slot].tobytes() != key:
+            return None
+        vector = np.array(self.vectors[slot])
+        # A writer clears the key before touching the vector, so an unchanged key means an intact copy
+        if self.keys[slot].tobytes() != key:
+            return None
+        self.stamps[slot] = now
+        return vector
+
+    def get_many(self, keys: list[bytes]) -> list:
+        """
+        Look up vectors for `keys`; returns a list with an ndarray per hit and None per miss.
+        """
+        now = time.time()
+        with self.lock:
+            out = [self._read(key, now) for key in keys]
+            if any(v is None for v in out) and int(self.writes[0]) != self.seen_writes:
+                # Another process has written since the index was built; its entries may be the misses
+                self._reload()
+                out = [v if v is not None else self._read(key, now) for key, v in zip(keys, out)]
+            hits = sum(v is not None for v in out)
+            self.hits += hits
+            self.misses += len(out) - hits
+        return out
+
+    def _fill(self, slot: int, key: bytes, vector, now: float):
+        self.keys[slot] = 0
+        self.vectors[slot] = vector
+        self.keys[slot] = np.frombuffer(key, dtype=np.uint8)
+        self.stamps[slot] = now
+
+    def put_many(self, keys: list[bytes], vectors):
+        """
+        Store vectors under `keys`, evicting the least recently used slots when the cache is full.
+        """
+        entries = {}
+        for key, vector in zip(keys, vectors):
+            entries[key] = vector
+        entries = list(entries.items())[-self.capacity:]
+        now = time.time()
+        with self._locked():
+            if int(self.writes[0]) != self.seen_writes:
+                self._reload()
+            new = [(k, v) for k, v in entries if k not in self.slots]
+            for key, vector in entries:
+                if key in self.slots:
+                    self._fill(self.slots[key], key, vector, now)
+            shortfall = len(new) - len(self.free)
+            if shortfall > 0:
+                in_use = np.where(self.stamps > 0, self.stamps, np.inf)
+                for slot in np.argpartition(in_use, shortfall - 1)[:shortfall]:
+                    self.slots.pop(self.keys[slot].tobytes(), None)
+                    self.free.append(int(slot))
+            for key, vector in new:
+                slot = self.free.pop()
+                self._fill(slot, key, vector, now)
+                self.slots[key] = slot
+            self.vectors.flush()
+            self.keys.flush()
+            self.stamps.flush()
+            self.writes[0] += 1
+            self.seen_writes = int(self.writes[0])
+            self.writes.flush()
+
+class CachedEmbeddings(Embeddings):
+    """
+    LangChain Embeddings wrapper that serves vectors from an EmbeddingCache and only
+    sends cache misses to the underlying encoder, in a single batch.
+    """
+
+    def __init__(self, base: Embeddings, cache: EmbeddingCache, model_name: str = MODEL_NAME):
+        self.base = base
+        self.cache = cache
+        self.model_name = model_name
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys = [text_key(t, self.model_name) for t in texts]
+        vectors = self.cache.get_many(keys)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            computed = self.base.embed_documents([texts[i] for i in missing])
+            self.cache.put_many([keys[i] for i in missing], computed)
+            for i, vector in zip(missing, computed):
+                vectors[i] = vector
+        return [np.asarray(v, dtype=np.float32).tolist() for v in vectors]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+def get_embeddings(model_name: str = MODEL_NAME, cache_dir: str = CACHE_DIR) -> CachedEmbeddings:
+    """
+    The MiniLM embedder used by both the indexer and the query path, backed by the shared on-disk cache.
+    """
+    return CachedEmbeddings(HuggingFaceEmbeddings(model_name=model_name), EmbeddingCache(cache_dir), model_name)
@@ -0,0 +1,279 @@
+# vectorstore/index_store.py
+"""
+Versioned on-disk format for the FAISS vector store, replacing LangChain's pickled index.pkl.
+
+    faiss_index/
+      index.<g>.faiss   FAISS index (memory-mapped by readers)
+      docs.<g>.jsonl    one JSON document per row: {"id", "page_content", "metadata"}
+      docs.<g>.offsets  .npy int64 byte offsets into docs.<g>.jsonl (rows + 1 entries)
+      meta.<g>.arrow    the documents' metadata as Arrow columns, row i = FAISS row i
+      store.json        header naming the current generation <g> and its row count
+
+Every save writes a new generation next to the current one and then replaces store.json, the
+only file that is ever overwritten, so a reader that opens the files the header names always
+gets one consistent generation. The previous generation is kept for readers that read the old
+header just before the swap; older ones are removed.
+
+Readers map the files and hydrate a Document only when a search returns its row, so startup
+cost and resident memory no longer grow with the docstore. The lexical and pre-filter indexes
+are built from the metadata columns, without decoding documents. Nothing is unpickled.
+"""
+import json
+import logging
+import os
+import re
+from collections.abc import Mapping, Sequence
+
+import faiss
+import numpy as np
+import pyarrow as pa
+from langchain.docstore.base import Docstore
+from langchain.docstore.document import Document
+from langchain.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+
+STORE_FORMAT = "inventory-faiss-store"
+STORE_VERSION = 2
+HEADER_FILENAME = "store.json"
+# File name patterns of one generation
+GENERATION_FILES = {
+    "index": "index.{}.faiss",
+    "docs": "docs.{}.jsonl",
+    "offsets": "docs.{}.offsets",
+    "meta": "meta.{}.arrow",
+}
+GENERATION_RE = re.compile(r"^(?:index|docs|meta)\.(\d+)\.(?:faiss|jsonl|offsets|arrow)$")
+# Un-generationed files of version 1 stores and LangChain's pickle format
+LEGACY_FILENAMES = ("index.faiss", "docs.jsonl", "docs.offsets")
+LEGACY_PICKLE_FILENAME = "index.pkl"
+# Attempts to open a consistent generation while writers keep replacing it
+LOAD_ATTEMPTS = 3
+# Zero-copy mapping of flat indexes where this FAISS build supports it
+MMAP_FLAG = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+
+class DocumentFile(Sequence):
+    """
+    Read-only, memory-mapped view of docs.jsonl: row i is decoded into a Document on access.
+    """
+
+    def __init__(self, path: str, header: dict):
+        files = store_files(path, header)
+        self.offsets = np.load(files["offsets"], mmap_mode="r")
+        # np.memmap refuses empty files
+        self.data = np.memmap(files["docs"], dtype=np.uint8, mode="r") if os.path.getsize(files["docs"]) else b""
+        self.meta_path = files.get("meta")
+        self._metadata = None
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def record(self, row: int) -> dict:
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return json.loads(bytes(self.data[start:end]))
+
+    def metadata(self) -> pa.Table | None:
+        """
+        The metadata columns of every row (memory-mapped), or None for stores saved without them.
+        """
+        if self._metadata is None and self.meta_path is not None:
+            self._metadata = pa.ipc.open_file(pa.memory_map(self.meta_path, "r")).read_all()
+        return self._metadata
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(len(self)))]
+        rec = self.record(row)
+        return Document(page_content=rec["page_content"], metadata=rec["metadata"])
+
+class LazyDocstore(Docstore):
+    """
+    LangChain docstore over a DocumentFile, keyed by FAISS row.
+    """
+
+    def __init__(self, documents: DocumentFile):
+        self.documents = documents
+
+    def search(self, search):
+        try:
+            return self.documents[int(search)]
+        except (IndexError, ValueError):
+            return f"ID {search} not found."
+
+class RowIds(Mapping):
+    """
+    index_to_docstore_id for a LazyDocstore: every FAISS row is its own docstore key.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+
+    def __getitem__(self, row):
+        if not 0 <= row < self.size:
+            raise KeyError(row)
+        return row
+
+    def __iter__(self):
+        return iter(range(self.size))
+
+    def __len__(self):
+        return self.size
+
+def is_store(path: str) -> bool:
+    return os.path.exists(os.path.join(path, HEADER_FILENAME))
+
+def store_exists(path: str) -> bool:
+    """
+    Whether `path` holds a saved vector store, in this format or LangChain's pickle format.
+    """
+    return is_store(path) or os.path.exists(os.path.join(path, LEGACY_PICKLE_FILENAME))
+
+def read_header(path: str) -> dict:
+    with open(os.path.join(path, HEADER_FILENAME), "r", encoding="utf-8") as f:
+        header = json.load(f)
+    if header.get("format") != STORE_FORMAT or header.get("version", 0) > STORE_VERSION:
+        raise ValueError(f"Unsupported vector store at {path}: {header.get('format')} v{header.get('version')}")
+    return header
+
+def store_files(path: str, header: dict) -> dict:
+    """
+    Paths of the files of the generation `header` names (the fixed names of version 1 stores).
+    """
+    if "generation" not in header:
+        return {key: os.path.join(path, name) for key, name in zip(("index", "docs", "offsets"), LEGACY_FILENAMES)}
+    return {key: os.path.join(path, pattern.format(header["generation"])) for key, pattern in GENERATION_FILES.items()}
+
+def index_file(path: str) -> str:
+    """
+    Path of the FAISS index file of the store's current generation.
+    """
+    return store_files(path, read_header(path))["index"]
+
+def _metadata_table(metadatas: list[dict]) -> pa.Table:
+    fields = list(dict.fromkeys(key for meta in metadatas for key in meta))
+    columns = {}
+    for field in fields:
+        values = [meta.get(field) for meta in metadatas]
+        try:
+            columns[field] = pa.array(values)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Mixed types across documents; keep them as text
+            columns[field] = pa.array([None if v is None else str(v) for v in values], type=pa.string())
+    return pa.table(columns) if columns else pa.table({"_row": pa.nulls(len(metadatas))})
+
+def _prune_generations(path: str, keep: set):
+    for name in os.listdir(path):
+        match = GENERATION_RE.match(name)
+        if (match and int(match.group(1)) not in keep) or name in LEGACY_FILENAMES or name == LEGACY_PICKLE_FILENAME:
+            try:
+                os.remove(os.path.join(path, name))
+            except FileNotFoundError:
+                pass
+
+def save_store(vectorstore: FAISS, path: str):
+    """
+    Write `vectorstore` in the store format as a new generation, then point store.json at it.
+    """
+    os.makedirs(path, exist_ok=True)
+    previous = read_header(path).get("generation", 0) if is_store(path) else 0
+    generation = previous + 1
+    files = store_files(path, {"generation": generation})
+    mapping = vectorstore.index_to_docstore_id
+    offsets = [0]
+    metadatas = []
+    with open(files["docs"], "wb") as f:
+        for row in range(len(mapping)):
+            doc_id = mapping[row]
+            doc = vectorstore.docstore.search(doc_id)
+            line = json.dumps(
+                {"id": doc.metadata.get("Item_ID", doc_id), "page_content": doc.page_content, "metadata": doc.metadata},
+                default=str,
+            ).encode("utf-8") + b"\n"
+            f.write(line)
+            offsets.append(offsets[-1] + len(line))
+            metadatas.append(doc.metadata or {})
+    with open(files["offsets"], "wb") as f:
+        np.save(f, np.asarray(offsets, dtype=np.int64))
+    table = _metadata_table(metadatas)
+    with pa.OSFile(files["meta"], "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    faiss.write_index(vectorstore.index, files["index"])
+
+    header = {
+        "format": STORE_FORMAT,
+        "version": STORE_VERSION,
+        "generation": generation,
+        "count": len(mapping),
+        "dim": vectorstore.index.d,
+        "normalize_L2": bool(vectorstore._normalize_L2),
+        "distance_strategy": str(getattr(vectorstore.distance_strategy, "value", vectorstore.distance_strategy)),
+    }
+    tmp_header = os.path.join(path, HEADER_FILENAME + ".tmp")
+    with open(tmp_header, "w", encoding="utf-8") as f:
+        json.dump(header, f)
+    os.replace(tmp_header, os.path.join(path, HEADER_FILENAME))
+    # Keep the previous generation for readers that opened the old header; the pickle is no longer read
+    _prune_generations(path, {generation, previous})
+
+def _open_generation(path: str, embeddings, lazy: bool) -> FAISS:
+    header = read_header(path)
+    documents = DocumentFile(path, header)
+    if len(documents) != header["count"]:
+        raise StoreChanged(f"{path}: docstore has {len(documents)} rows, header says {header['count']}")
+    kwargs = {"normalize_L2": header.get("normalize_L2", False)}
+    if header.get("distance_strategy"):
+        from langchain_community.vectorstores.utils import DistanceStrategy
+
+        kwargs["distance_strategy"] = DistanceStrategy(header["distance_strategy"])
+    index_path = store_files(path, header)["index"]
+    index = faiss.read_index(index_path, MMAP_FLAG | faiss.IO_FLAG_READ_ONLY) if lazy else faiss.read_index(index_path)
+    if index.ntotal != header["count"]:
+        raise StoreChanged(f"{path}: index has {index.ntotal} rows, header says {header['count']}")
+    if lazy:
+        return FAISS(embeddings, index, LazyDocstore(documents), RowIds(len(documents)), **kwargs)
+    records = [documents.record(row) for row in range(len(documents))]
+    docstore = InMemoryDocstore({
+        rec["id"]: Document(page_content=rec["page_content"], metadata=rec["metadata"]) for rec in records
+    })
+    return FAISS(embeddings, index, docstore, {row: rec["id"] for row, rec in enumerate(records)}, **kwargs)
+
+class StoreChanged(Exception):
+    """
+    The files of a store did not match its header (a generation pruned or replaced mid-open).
+    """
+
+def load_store(path: str, embeddings, lazy: bool = True) -> FAISS:
+    """
+    Open the vector store at `path`.
+
+    lazy=True (query side): the FAISS index is memory-mapped read-only and documents are
+    hydrated per hit. lazy=False (index maintenance): the index and every document are loaded
+    into memory, keyed by Item_ID, so rows can be added and deleted.
+    The files opened are those of the generation store.json names, checked against its row
+    count; if a writer pruned or replaced them mid-open, the header is re-read and the open retried.
+    A store still in LangChain's pickle format is unpickled one last time and migrated to this
+    format in place (kept as loaded if `path` is not writable), with a warning either way.
+    """
+    if not is_store(path):
+        logging.warning(f"{path} is in LangChain's pickle format; unpickling it to migrate to the store format")
+        vectorstore = FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+        try:
+            save_store(vectorstore, path)
+        except OSError as e:
+            logging.warning(f"Could not migrate {path} ({e}); it will be unpickled again on the next load")
+            return vectorstore
+    for attempt in range(LOAD_ATTEMPTS):
+        try:
+            return _open_generation(path, embeddings, lazy)
+        except (FileNotFoundError, StoreChanged):
+            if attempt == LOAD_ATTEMPTS - 1:
+                raise
+
+if __name__ == "__main__":
+    from vectorstore.embed_and_store import VECTOR_INDEX_PATH
+    from vectorstore.embedding_cache import get_embeddings
+
+    print(f"🔁 Converting {VECTOR_INDEX_PATH} to the mmap store format ...")
+    save_store(load_store(VECTOR_INDEX_PATH, get_embeddings(), lazy=False), VECTOR_INDEX_PATH)
+    print("✅ Store written; index.pkl and version 1 files removed.")
@@ -0,0 +1,168 @@
+# vectorstore/sharded_index.py
+"""
+Vector index split into independent shards by Warehouse_Location.
+
+    faiss_shards/
+      shards.json          shard map: strategy, shard count, each shard's locations, and the
+                           BM25 statistics of the whole corpus
+      loc-983-sommers-circle/  (strategy "location": one shard per site)
+      hash-007/                (strategy "hash": sites spread over N shards by crc32)
+
+Every shard is an ordinary store (vectorstore/index_store.py) with its own manifest, built and
+synced with sync_vectorstore, so one site can be rebuilt without touching the others. The
+shard map is written last. qa/shard_router.py searches the shards, scoring every shard's BM25
+with the corpus-wide statistics so lexical hits from different shards can be merged.
+
+Only a question that names a location is routed to a single shard; anything else fans out to
+every shard. With "hash" (the default) each shard mixes many sites, and in the bundled data
+every record has its own address, so in practice nearly all questions fan out: sharding then
+spreads index builds, not query work. "location" keeps each site's products together and is
+the layout to use when sites hold many products and questions name them.
+
+Run from the repo root:
+    python -m vectorstore.sharded_index --strategy hash --num-shards 16
+    python -m vectorstore.sharded_index --only "983 Sommers Circle"    # rebuild one site's shard
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import zlib
+from collections import defaultdict
+
+from qa.hybrid_retriever import lexical_stats, record_tokens
+from vectorstore.embed_and_store import DATA_PATH, index_version, load_inventory_documents, sync_vectorstore
+
+SHARDS_PATH = "vectorstore/faiss_shards"
+SHARD_MAP_FILENAME = "shards.json"
+SHARD_STRATEGIES = ("location", "hash")
+DEFAULT_NUM_SHARDS = 16
+
+def shard_name(location: str, strategy: str = "hash", num_shards: int = DEFAULT_NUM_SHARDS) -> str:
+    """
+    Directory name of the shard holding `location`: its slug, or its crc32 bucket.
+    """
+    key = (location or "").strip().lower()
+    if strategy == "location":
+        return "loc-" + (re.sub(r"[^a-z0-9]+", "-", key).strip("-") or "unknown")
+    if strategy == "hash":
+        return f"hash-{zlib.crc32(key.encode('utf-8')) % num_shards:03d}"
+    raise ValueError(f"Unknown shard strategy {strategy!r}; expected one of {SHARD_STRATEGIES}")
+
+def partition_documents(documents, strategy: str = "hash", num_shards: int = DEFAULT_NUM_SHARDS) -> dict:
+    """
+    Shard name -> documents, by each document's Warehouse_Location.
+    """
+    shards = defaultdict(list)
+    for doc in documents:
+        shards[shard_name(doc.metadata.get("Warehouse_Location", ""), strategy, num_shards)].append(doc)
+    return dict(shards)
+
+def load_shard_map(path: str = SHARDS_PATH) -> dict:
+    """
+    The shard map at `path`, or an empty dict when no sharded index has been built.
+    """
+    map_path = os.path.join(path, SHARD_MAP_FILENAME)
+    if not os.path.exists(map_path):
+        return {}
+    with open(map_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_shard_map(shard_map: dict, path: str):
+    map_path = os.path.join(path, SHARD_MAP_FILENAME)
+    tmp_path = map_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(shard_map, f, indent=2)
+    os.replace(tmp_path, map_path)
+
+def shard_versions(path: str = SHARDS_PATH) -> tuple:
+    """
+    Cheap fingerprint of the sharded index: the shard map plus index_version() of every shard.
+    """
+    try:
+        st = os.stat(os.path.join(path, SHARD_MAP_FILENAME))
+        version = [(SHARD_MAP_FILENAME, st.st_mtime_ns, st.st_size)]
+    except FileNotFoundError:
+        return ((SHARD_MAP_FILENAME, None, None),)
+    for name in sorted(load_shard_map(path).get("shards", {})):
+        version.append((name, index_version(os.path.join(path, name))))
+    return tuple(version)
+
+def build_shards(documents, path: str = SHARDS_PATH, strategy: str = "hash", num_shards: int = DEFAULT_NUM_SHARDS,
+                 only=None, embeddings=None, index_options: dict | None = None, on_shard=None) -> dict:
+    """
+    Build or incrementally sync the shards for `documents`.
+
+    `only` restricts the work to the named shards (every other shard is left as it is on disk),
+    which needs the existing layout: changing the strategy or shard count means a full rebuild.
+    Shards left without documents are deleted. `documents` is always the whole corpus, whose
+    BM25 statistics are recorded in the map. Returns shard name -> sync stats.
+    """
+    shard_map = load_shard_map(path)
+    layout = {"strategy": strategy, "num_shards": num_shards if strategy == "hash" else None}
+    same_layout = shard_map and all(shard_map.get(k) == v for k, v in layout.items())
+    if only is not None and shard_map and not same_layout:
+        raise ValueError(
+            f"{path} is sharded by {shard_map.get('strategy')} ({shard_map.get('num_shards')} shards); "
+            "rebuild every shard to change the layout"
+        )
+    shards = dict(shard_map.get("shards", {})) if same_layout else {}
+    os.makedirs(path, exist_ok=True)
+
+    parts = partition_documents(documents, strategy, num_shards)
+    if only is not None:
+        names = set(only)
+    else:
+        names = set(parts) | set(shards)
+        # A different layout replaces every old shard directory
+        names |= {n for n in os.listdir(path) if os.path.isdir(os.path.join(path, n))}
+    stats = {}
+    for name in sorted(names):
+        shard_path = os.path.join(path, name)
+        docs = parts.get(name)
+        if not docs:
+            shutil.rmtree(shard_path, ignore_errors=True)
+            shards.pop(name, None)
+            continue
+        _, stats[name] = sync_vectorstore(docs, shard_path, embeddings, index_options)
+        shards[name] = {
+            "count": len(docs),
+            "locations": sorted({doc.metadata.get("Warehouse_Location", "") for doc in docs}),
+        }
+        if on_shard:
+            on_shard(name, stats[name])
+
+    lexical = lexical_stats(record_tokens(doc) for doc in documents)
+    save_shard_map({**layout, "shards": shards, "lexical": lexical}, path)
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the per-location sharded FAISS index.")
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--path", default=SHARDS_PATH)
+    parser.add_argument("--strategy", choices=SHARD_STRATEGIES, default=None,
+                        help="One shard per location, or locations hashed into --num-shards (default: current layout, else hash; "
+                             "see the module docstring for when location is the better choice)")
+    parser.add_argument("--num-shards", type=int, default=None, help=f"Shards for --strategy hash (default {DEFAULT_NUM_SHARDS})")
+    parser.add_argument("--only", action="append", metavar="LOCATION",
+                        help="Rebuild only the shard holding this Warehouse_Location (repeatable)")
+    parser.add_argument("--index-type", default="flat", help="FAISS index type per shard (see embed_and_store --index-type)")
+    args = parser.parse_args()
+
+    current = load_shard_map(args.path)
+    strategy = args.strategy or current.get("strategy") or "hash"
+    num_shards = args.num_shards or current.get("num_shards") or DEFAULT_NUM_SHARDS
+    only = {shard_name(loc, strategy, num_shards) for loc in args.only} if args.only else None
+
+    print("🔄 Loading inventory documents...")
+    docs = load_inventory_documents(args.data)
+    target = f"shards {', '.join(sorted(only))}" if only else f"all shards ({strategy})"
+    print(f"🧩 Syncing {target} under {args.path} ...")
+    stats = build_shards(
+        docs, args.path, strategy, num_shards, only=only, index_options={"index_type": args.index_type},
+        on_shard=lambda name, s: print(
+            f"   {name}: {s['added']} added, {s['updated']} updated, {s['deleted']} deleted, {s['unchanged']} unchanged"
+        ),
+    )
+    print(f"✅ {len(stats)} shard(s) synced; map written to {os.path.join(args.path, SHARD_MAP_FILENAME)}")